@@ -0,0 +1,183 @@
+"""
+Acumulados de citas por mes para el tablero de estadísticas.
+
+Las citas se agrupan una vez en contadores por mes (total, profesional,
+área, área y estado, estado) y por atleta. El tablero se arma sumando los
+meses de la ventana, sin recorrer las citas. Los acumulados se conservan
+mientras no cambie la lista de citas normalizadas; cuando el snapshot de
+citas (snapshot_citas) aplica cambios, los acumulados se actualizan
+restando las versiones anteriores de las citas modificadas y sumando las
+nuevas, así que el costo es proporcional a los cambios y no al total.
+
+Los acumulados publicados no se modifican: cada actualización copia los
+meses afectados y el contador por atleta, de modo que una petición en
+curso sigue leyendo una versión consistente. La copia por atleta es
+proporcional al número de atletas, el mismo costo que ya paga cada
+petición al sumar ese contador en el agregador.
+"""
+from collections import Counter
+import logging
+import threading
+
+from .agregaciones import AgregadorCitas
+
+logger = logging.getLogger(__name__)
+
+_ultimos = (None, None)
+_ultimos_lock = threading.Lock()
+
+
+def _mover(contador, clave, signo):
+    contador[clave] += signo
+    if not contador[clave]:
+        del contador[clave]
+
+
+class AcumuladoMes:
+    """
+    Contadores de las citas de un mes.
+    """
+    __slots__ = ('total', 'profesional', 'area', 'area_estado', 'estado')
+
+    def __init__(self):
+        self.total = 0
+        self.profesional = Counter()
+        self.area = Counter()
+        self.area_estado = Counter()
+        self.estado = Counter()
+
+    def copia(self):
+        copia = AcumuladoMes()
+        copia.total = self.total
+        copia.profesional = Counter(self.profesional)
+        copia.area = Counter(self.area)
+        copia.area_estado = Counter(self.area_estado)
+        copia.estado = Counter(self.estado)
+        return copia
+
+    def sumar(self, cita, signo=1):
+        self.total += signo
+        _mover(self.profesional, cita.profesional_id, signo)
+        _mover(self.area, cita.area_id, signo)
+        _mover(self.area_estado, (cita.area_id, cita.estado_clave), signo)
+        _mover(self.estado, cita.estado_clave, signo)
+
+
+class AcumuladosCitas:
+    """
+    Acumulados de una lista de citas normalizadas.
+
+    Attributes:
+        por_atleta (Counter): Citas por atleta, con y sin fecha
+        meses (dict): (año, mes) -> AcumuladoMes
+    """
+
+    def __init__(self, citas=()):
+        self.por_atleta = Counter()
+        self.meses = {}
+        # Carga completa: solo se suma, sin el manejo de ceros de _sumar
+        por_atleta = self.por_atleta
+        meses = self.meses
+        for cita in citas:
+            por_atleta[cita.atleta_id] += 1
+            fecha = cita.fecha
+            if not fecha:
+                continue
+            clave = (fecha.year, fecha.month)
+            mes = meses.get(clave)
+            if mes is None:
+                mes = meses[clave] = AcumuladoMes()
+            mes.total += 1
+            mes.profesional[cita.profesional_id] += 1
+            mes.area[cita.area_id] += 1
+            mes.area_estado[(cita.area_id, cita.estado_clave)] += 1
+            mes.estado[cita.estado_clave] += 1
+
+    def _sumar(self, cita, signo, copiados=None):
+        _mover(self.por_atleta, cita.atleta_id, signo)
+        fecha = cita.fecha
+        if not fecha:
+            return
+        clave = (fecha.year, fecha.month)
+        mes = self.meses.get(clave)
+        if mes is None:
+            mes = self.meses[clave] = AcumuladoMes()
+        elif copiados is not None and clave not in copiados:
+            mes = self.meses[clave] = mes.copia()
+        if copiados is not None:
+            copiados.add(clave)
+        mes.sumar(cita, signo)
+
+    def con_cambios(self, quitadas, agregadas):
+        """
+        Nuevos acumulados con las citas `quitadas` restadas y las
+        `agregadas` sumadas. De los meses solo se copian los afectados; el
+        contador por atleta se copia completo (O(atletas)).
+        """
+        nuevos = AcumuladosCitas()
+        nuevos.por_atleta = Counter(self.por_atleta)
+        nuevos.meses = dict(self.meses)
+        copiados = set()
+        for cita in quitadas:
+            nuevos._sumar(cita, -1, copiados)
+        for cita in agregadas:
+            nuevos._sumar(cita, 1, copiados)
+        return nuevos
+
+
+def acumulados_citas(citas):
+    """
+    Acumulados de una lista de citas normalizadas. Solo se recalculan
+    cuando cambia la lista.
+    """
+    global _ultimos
+    origen, acumulados = _ultimos
+    if origen is citas:
+        return acumulados
+
+    acumulados = AcumuladosCitas(citas)
+    with _ultimos_lock:
+        _ultimos = (citas, acumulados)
+    return acumulados
+
+
+def aplicar_cambios(anteriores, nuevas, quitadas, agregadas):
+    """
+    Traslada los acumulados de la lista `anteriores` a la lista `nuevas`,
+    que difiere de ella en las citas `quitadas` y `agregadas`. Si no hay
+    acumulados de `anteriores` se calcularán completos al pedirlos.
+    """
+    global _ultimos
+    with _ultimos_lock:
+        origen, acumulados = _ultimos
+        if origen is not anteriores:
+            return
+        _ultimos = (nuevas, acumulados.con_cambios(quitadas, agregadas))
+    logger.debug("Acumulados por mes actualizados con %d cambios", len(agregadas))
+
+
+class AgregadorCitasAcumulados(AgregadorCitas):
+    """
+    AgregadorCitas que llena los contadores desde los acumulados por mes.
+    """
+
+    def agregar(self, citas):
+        acumulados = acumulados_citas(citas)
+        self.total_por_atleta.update(acumulados.por_atleta)
+
+        for clave in self.meses:
+            mes = acumulados.meses.get(clave)
+            if mes is None or not mes.total:
+                continue
+            self.total_por_mes[clave] = mes.total
+            self.profesional_por_mes[clave].update(mes.profesional)
+            self.area_por_mes[clave].update(mes.area)
+
+        actual = acumulados.meses.get(self.clave_actual)
+        if actual is not None:
+            self.profesional_mes_actual.update(actual.profesional)
+            self.area_mes_actual.update(actual.area)
+            self.area_estado_mes_actual.update(actual.area_estado)
+            self.estado_mes_actual.update(actual.estado)
+
+        return self
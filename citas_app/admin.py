@@ -1,3 +1,17 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Cita, TrabajoReporte
+
+
+@admin.register(TrabajoReporte)
+class TrabajoReporteAdmin(admin.ModelAdmin):
+    list_display = ('id', 'estado', 'creado_el', 'terminado_el')
+    list_filter = ('estado',)
+    readonly_fields = ('filtros', 'archivo', 'error', 'creado_el', 'iniciado_el', 'terminado_el')
+
+
+@admin.register(Cita)
+class CitaAdmin(admin.ModelAdmin):
+    list_display = ('id_externo', 'creado_el', 'estado_clave', 'atleta_id', 'profesional_id', 'area_id')
+    list_filter = ('estado_clave',)
+    readonly_fields = ('datos',)
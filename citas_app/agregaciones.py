@@ -0,0 +1,210 @@
+from collections import Counter
+from datetime import datetime
+import logging
+
+from django.conf import settings
+
+from .normalizacion import clave_id
+
+logger = logging.getLogger(__name__)
+
+ESTADOS = ['pendiente', 'confirmada', 'completada', 'cancelada']
+
+
+def ventana_meses(mes_actual, año_actual, meses_mostrar=12):
+    """
+    Lista de tuplas (año, mes) de los últimos `meses_mostrar` meses,
+    del más antiguo al mes actual.
+    """
+    meses = []
+    for i in range(meses_mostrar):
+        mes_offset = meses_mostrar - i - 1
+        month = (mes_actual - mes_offset - 1) % 12 + 1
+        year = año_actual - (1 if mes_actual - mes_offset - 1 < 0 else 0)
+        meses.append((year, month))
+    return meses
+
+
+class AgregadorCitas:
+    """
+    Acumula en una sola pasada sobre las citas normalizadas todos los
+    contadores que necesita el tablero de estadísticas y construye la
+    respuesta a partir de ellos.
+    """
+
+    def __init__(self, mes_actual, año_actual, meses_mostrar=12):
+        self.mes_actual = mes_actual
+        self.año_actual = año_actual
+        self.meses = ventana_meses(mes_actual, año_actual, meses_mostrar)
+        self.clave_actual = (año_actual, mes_actual)
+
+        self.total_por_mes = Counter()
+        self.profesional_por_mes = {mes: Counter() for mes in self.meses}
+        self.area_por_mes = {mes: Counter() for mes in self.meses}
+        self.profesional_mes_actual = Counter()
+        self.area_mes_actual = Counter()
+        self.area_estado_mes_actual = Counter()
+        self.estado_mes_actual = Counter()
+        self.total_por_atleta = Counter()
+
+    def agregar(self, citas):
+        """
+        Recorre las citas (CitaNormalizada) una sola vez actualizando los
+        contadores por mes, profesional, área, estado y atleta.
+        """
+        ventana = self.profesional_por_mes.keys()
+
+        for c in citas:
+            self.total_por_atleta[c.atleta_id] += 1
+
+            fecha = c.fecha
+            if not fecha:
+                continue
+
+            clave = (fecha.year, fecha.month)
+            if clave not in ventana:
+                continue
+
+            self.total_por_mes[clave] += 1
+            self.profesional_por_mes[clave][c.profesional_id] += 1
+            self.area_por_mes[clave][c.area_id] += 1
+
+            if clave == self.clave_actual:
+                self.profesional_mes_actual[c.profesional_id] += 1
+                self.area_mes_actual[c.area_id] += 1
+                self.area_estado_mes_actual[(c.area_id, c.estado_clave)] += 1
+                self.estado_mes_actual[c.estado_clave] += 1
+
+        return self
+
+    def _monthly_data_by_profesional(self, profesionales):
+        monthly_data = []
+        for year, month in self.meses:
+            conteos = self.profesional_por_mes[(year, month)]
+            monthly_data.append({
+                'mes': datetime(year, month, 1).strftime('%b'),
+                'mes_numero': month,
+                'ano': year,
+                'profesionales': [
+                    {
+                        'profesional_id': profesional['id'],
+                        'profesional_name': f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}",
+                        'count': conteos[clave_id(profesional['id'])]
+                    }
+                    for profesional in profesionales
+                ],
+                'total': self.total_por_mes[(year, month)]
+            })
+        return monthly_data
+
+    def _monthly_data_by_area(self, areas):
+        monthly_data = []
+        for year, month in self.meses:
+            conteos = self.area_por_mes[(year, month)]
+            areas_data_mes = [
+                {
+                    'area_id': area['id'],
+                    'area_name': area.get('nombre', 'Sin nombre'),
+                    'count': conteos[clave_id(area['id'])]
+                }
+                for area in areas
+            ]
+
+            # Las citas sin área reconocida se asignan a la primera área
+            sum_counts = sum(a['count'] for a in areas_data_mes)
+            total_citas_mes = self.total_por_mes[(year, month)]
+            if sum_counts < total_citas_mes and areas_data_mes:
+                areas_data_mes[0]['count'] += (total_citas_mes - sum_counts)
+
+            monthly_data.append({
+                'mes': datetime(year, month, 1).strftime('%b'),
+                'mes_numero': month,
+                'ano': year,
+                'areas': areas_data_mes,
+                'total': total_citas_mes
+            })
+        return monthly_data
+
+    def construir_respuesta(self, profesionales, atletas, areas):
+        """
+        Construye el cuerpo de respuesta de EstadisticasCitasView a partir
+        de los contadores acumulados y los catálogos.
+        """
+        total_citas = self.total_por_mes[self.clave_actual]
+
+        profesionales_data = []
+        for profesional in profesionales:
+            profesionales_data.append({
+                'nombre': f"{profesional.get('nombre', '')} {profesional.get('apPaterno', '')}",
+                'id': str(profesional['id']),
+                'total': self.profesional_mes_actual[clave_id(profesional['id'])],
+                'especialidad': profesional.get('especialidad', 'Sin especialidad')
+            })
+
+        atletas_data = []
+        for atleta in atletas:
+            atletas_data.append({
+                'nombre': f"{atleta.get('nombre', '')} {atleta.get('apPaterno', '')}",
+                'id': str(atleta['id']),
+                'total': self.total_por_atleta[clave_id(atleta['id'])]
+            })
+        top_atletas = sorted(atletas_data, key=lambda x: x['total'], reverse=True)[:10]
+
+        areas_data = []
+        for area in areas:
+            area_id = clave_id(area['id'])
+            area_data = {
+                'nombre': area.get('nombre', 'Sin nombre'),
+                'id': str(area['id']),
+                'total': self.area_mes_actual[area_id],
+            }
+            for estado in ESTADOS:
+                area_data[estado] = self.area_estado_mes_actual[(area_id, estado)]
+            areas_data.append(area_data)
+
+        estado_distribucion = {
+            estado.capitalize(): self.estado_mes_actual[estado]
+            for estado in ESTADOS
+        }
+
+        monthly_data_by_profesional = self._monthly_data_by_profesional(profesionales)
+
+        citas_completadas = estado_distribucion['Completada']
+        porcentaje_completadas = round((citas_completadas / total_citas) * 100) if total_citas > 0 else 0
+
+        return {
+            'total_citas': total_citas,
+            'citas_mes_actual': total_citas,
+            'citas_completadas': citas_completadas,
+            'porcentaje_completadas': porcentaje_completadas,
+            'estado_distribucion': estado_distribucion,
+            'profesionales_data': profesionales_data,
+            'monthly_data_by_profesional': monthly_data_by_profesional,
+            'monthly_data': [{'mes': m['mes'], 'total': m['total']} for m in monthly_data_by_profesional],
+            'top_atletas': top_atletas,
+            'areas_data': areas_data,
+            'monthly_data_by_area': self._monthly_data_by_area(areas)
+        }
+
+
+def crear_agregador(mes_actual, año_actual):
+    """
+    Agregador según settings.ESTADISTICAS_BACKEND ('acumulados', 'python' o
+    'numpy'). Sin backend configurado se usan los acumulados solo si el
+    snapshot de citas está activo. Si NumPy no está instalado se usa el
+    backend de Python.
+    """
+    backend = settings.ESTADISTICAS_BACKEND
+    if not backend:
+        backend = 'acumulados' if settings.CITAS_SNAPSHOT_INTERVALO > 0 else 'python'
+    if backend == 'acumulados':
+        from .acumulados import AgregadorCitasAcumulados
+        return AgregadorCitasAcumulados(mes_actual, año_actual)
+    if backend == 'numpy':
+        try:
+            from .agregaciones_numpy import AgregadorCitasNumpy
+        except ImportError:
+            logger.warning("NumPy no está instalado; se usa el backend de estadísticas de Python")
+        else:
+            return AgregadorCitasNumpy(mes_actual, año_actual)
+    return AgregadorCitas(mes_actual, año_actual)
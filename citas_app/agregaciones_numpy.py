@@ -0,0 +1,134 @@
+"""
+Backend columnar (NumPy) para las estadísticas de citas.
+
+Las citas normalizadas se cargan una vez en arreglos (índice de mes,
+profesional, área, atleta y estado codificados como enteros) y todas las
+agrupaciones se calculan con `np.bincount`. El resultado llena los mismos
+contadores que AgregadorCitas, por lo que la respuesta es idéntica.
+"""
+from collections import Counter
+import threading
+
+import numpy as np
+
+from .agregaciones import AgregadorCitas
+
+_ultimas_columnas = (None, None)
+_columnas_lock = threading.Lock()
+
+
+def _codificar(valores):
+    """
+    Codifica valores hashables como enteros consecutivos.
+
+    Returns:
+        tuple: (arreglo de códigos, lista de valores por código)
+    """
+    codigos = {}
+    arreglo = np.fromiter(
+        (codigos.setdefault(valor, len(codigos)) for valor in valores),
+        dtype=np.int64,
+        count=len(valores)
+    )
+    return arreglo, list(codigos)
+
+
+class ColumnasCitas:
+    """
+    Citas normalizadas en formato columnar.
+
+    Attributes:
+        mes: year * 12 + month - 1 de la fecha de la cita, o -1 si no tiene
+        profesional, area, atleta, estado: Códigos enteros de cada columna
+        *_valores: Valor original de cada código
+    """
+
+    def __init__(self, citas):
+        self.n = len(citas)
+        self.mes = np.fromiter(
+            (c.fecha.year * 12 + c.fecha.month - 1 if c.fecha else -1 for c in citas),
+            dtype=np.int64,
+            count=self.n
+        )
+        self.profesional, self.profesional_valores = _codificar([c.profesional_id for c in citas])
+        self.area, self.area_valores = _codificar([c.area_id for c in citas])
+        self.atleta, self.atleta_valores = _codificar([c.atleta_id for c in citas])
+        self.estado, self.estado_valores = _codificar([c.estado_clave for c in citas])
+
+
+def columnas_citas(citas):
+    """
+    Columnas de una lista de citas normalizadas. Si es la misma lista que
+    en la llamada anterior se reutilizan las columnas ya construidas.
+    """
+    global _ultimas_columnas
+    origen, columnas = _ultimas_columnas
+    if origen is citas:
+        return columnas
+
+    columnas = ColumnasCitas(citas)
+    with _columnas_lock:
+        _ultimas_columnas = (citas, columnas)
+    return columnas
+
+
+def _contador(conteos, valores):
+    return Counter({valores[i]: int(conteos[i]) for i in np.flatnonzero(conteos)})
+
+
+class AgregadorCitasNumpy(AgregadorCitas):
+    """
+    AgregadorCitas que calcula los contadores con operaciones vectorizadas.
+    """
+
+    def agregar(self, citas):
+        col = columnas_citas(citas)
+        n_meses = len(self.meses)
+        inicio = self.meses[0][0] * 12 + self.meses[0][1] - 1
+        n_prof = len(col.profesional_valores)
+        n_area = len(col.area_valores)
+        n_estado = len(col.estado_valores)
+
+        # Totales por atleta sobre todas las citas
+        self.total_por_atleta.update(
+            _contador(np.bincount(col.atleta, minlength=len(col.atleta_valores)), col.atleta_valores)
+        )
+
+        # Citas dentro de la ventana de meses
+        offset = col.mes - inicio
+        en_ventana = (col.mes >= 0) & (offset >= 0) & (offset < n_meses)
+        mes_v = offset[en_ventana]
+        prof_v = col.profesional[en_ventana]
+        area_v = col.area[en_ventana]
+
+        total_mes = np.bincount(mes_v, minlength=n_meses)
+        prof_mes = np.bincount(mes_v * n_prof + prof_v, minlength=n_meses * n_prof).reshape(n_meses, n_prof)
+        area_mes = np.bincount(mes_v * n_area + area_v, minlength=n_meses * n_area).reshape(n_meses, n_area)
+
+        for i, mes in enumerate(self.meses):
+            if total_mes[i]:
+                self.total_por_mes[mes] = int(total_mes[i])
+            self.profesional_por_mes[mes].update(_contador(prof_mes[i], col.profesional_valores))
+            self.area_por_mes[mes].update(_contador(area_mes[i], col.area_valores))
+
+        # Mes actual
+        actual = mes_v == n_meses - 1
+        prof_a = prof_v[actual]
+        area_a = area_v[actual]
+        estado_a = col.estado[en_ventana][actual]
+
+        self.profesional_mes_actual.update(
+            _contador(np.bincount(prof_a, minlength=n_prof), col.profesional_valores)
+        )
+        self.area_mes_actual.update(
+            _contador(np.bincount(area_a, minlength=n_area), col.area_valores)
+        )
+        self.estado_mes_actual.update(
+            _contador(np.bincount(estado_a, minlength=n_estado), col.estado_valores)
+        )
+        area_estado = np.bincount(area_a * n_estado + estado_a, minlength=n_area * n_estado)
+        for codigo in np.flatnonzero(area_estado):
+            area, estado = divmod(int(codigo), n_estado)
+            self.area_estado_mes_actual[(col.area_valores[area], col.estado_valores[estado])] = int(area_estado[codigo])
+
+        return self
@@ -0,0 +1,70 @@
+"""
+Backend de estadísticas sobre las tablas locales (almacen_local).
+
+Los contadores de AgregadorCitas se llenan con agrupaciones de la base de
+datos (`values().annotate(Count)`) sobre el modelo Cita en lugar de
+recorrer las citas en Python, así que la respuesta es idéntica.
+"""
+from collections import Counter
+
+from django.db.models import Count
+
+from .agregaciones import AgregadorCitas
+from .normalizacion import clave_id
+
+
+def _conteos(consulta, *campos):
+    """
+    Número de citas por combinación de `campos`, con los IDs convertidos a
+    su clave (normalizacion.clave_id).
+
+    Returns:
+        Counter: Tupla de valores (o valor si es un solo campo) -> citas
+    """
+    conteos = Counter()
+    for fila in consulta.order_by().values(*campos).annotate(n=Count('pk')):
+        valores = tuple(
+            clave_id(fila[campo]) if campo.endswith('_id') else fila[campo]
+            for campo in campos
+        )
+        conteos[valores if len(valores) > 1 else valores[0]] += fila['n']
+    return conteos
+
+
+class AgregadorCitasORM(AgregadorCitas):
+    """
+    AgregadorCitas que calcula los contadores con consultas agregadas.
+    """
+
+    def agregar(self, citas):
+        """
+        Args:
+            citas (QuerySet): Citas del modelo Cita
+        """
+        inicio = self.meses[0][0] * 12 + self.meses[0][1] - 1
+        fin = self.meses[-1][0] * 12 + self.meses[-1][1] - 1
+
+        def periodo(mes):
+            año, indice = divmod(mes, 12)
+            return (año, indice + 1)
+
+        # Totales por atleta sobre todas las citas
+        self.total_por_atleta.update(_conteos(citas, 'atleta_id'))
+
+        # Citas dentro de la ventana de meses
+        ventana = citas.filter(mes__gte=inicio, mes__lte=fin)
+        for mes, n in _conteos(ventana, 'mes').items():
+            self.total_por_mes[periodo(mes)] = n
+        for (mes, profesional), n in _conteos(ventana, 'mes', 'profesional_id').items():
+            self.profesional_por_mes[periodo(mes)][profesional] = n
+        for (mes, area), n in _conteos(ventana, 'mes', 'area_id').items():
+            self.area_por_mes[periodo(mes)][area] = n
+
+        # Mes actual
+        actual = citas.filter(mes=fin)
+        self.profesional_mes_actual.update(_conteos(actual, 'profesional_id'))
+        self.area_mes_actual.update(_conteos(actual, 'area_id'))
+        self.estado_mes_actual.update(_conteos(actual, 'estado_clave'))
+        self.area_estado_mes_actual.update(_conteos(actual, 'area_id', 'estado_clave'))
+
+        return self
@@ -0,0 +1,150 @@
+"""
+Copia local de las citas y los catálogos en la base de datos del proyecto.
+
+`sincronizar()` descarga las colecciones del backend y reemplaza las
+tablas en una sola transacción (las lecturas ven la copia anterior hasta
+que termina). Se ejecuta con `python manage.py sincronizar_citas`, por
+ejemplo desde cron. Con settings.CITAS_ALMACEN_LOCAL las vistas leen de
+estas tablas en lugar de consultar el backend en cada petición.
+"""
+from datetime import datetime, timedelta, timezone as tz
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cliente_api import CATALOGOS, Catalogo, obtener_colecciones, version_datos
+from .indices import DIMENSIONES
+from .models import Area, Atleta, Cita, Consultorio, ProfesionalSalud, Sincronizacion
+from .normalizacion import CitaNormalizada, clave_id, id_vacio
+
+logger = logging.getLogger(__name__)
+
+MODELOS_CATALOGO = {
+    'atletas': Atleta,
+    'areas': Area,
+    'consultorios': Consultorio,
+    'profesionales': ProfesionalSalud,
+}
+
+LOTE = 1000
+
+
+def _texto_id(clave):
+    return None if id_vacio(clave) else str(clave)
+
+
+def _con_zona(fecha):
+    # `creado_el` se parsea sin zona; se guarda tal cual marcándolo como UTC
+    return None if fecha is None else fecha.replace(tzinfo=tz.utc)
+
+
+def _fila_cita(orden, cita):
+    normalizada = CitaNormalizada(cita)
+    fecha = normalizada.fecha
+    return Cita(
+        id_externo=_texto_id(clave_id(normalizada.id)),
+        orden=orden,
+        creado_el=_con_zona(normalizada.creado_el),
+        mes=fecha.year * 12 + fecha.month - 1 if fecha else None,
+        estado_clave=normalizada.estado_clave,
+        atleta_id=_texto_id(normalizada.atleta_id),
+        area_id=_texto_id(normalizada.area_id),
+        consultorio_id=_texto_id(normalizada.consultorio_id),
+        profesional_id=_texto_id(normalizada.profesional_id),
+        datos=cita
+    )
+
+
+def sincronizar(timeout=30):
+    """
+    Reemplaza las citas y los catálogos locales por los del backend.
+
+    Returns:
+        dict: Nombre de la colección -> elementos guardados
+
+    Raises:
+        ErrorServicioExterno: Si falla alguna descarga (no se modifica nada)
+    """
+    colecciones = obtener_colecciones(['citas'] + CATALOGOS, timeout)
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        for nombre, modelo in MODELOS_CATALOGO.items():
+            modelo.objects.all().delete()
+            modelo.objects.bulk_create(
+                (
+                    modelo(id_externo=_texto_id(clave_id(elemento.get('id'))), orden=orden, datos=elemento)
+                    for orden, elemento in enumerate(colecciones[nombre])
+                ),
+                batch_size=LOTE
+            )
+
+        Cita.objects.all().delete()
+        Cita.objects.bulk_create(
+            (_fila_cita(orden, cita) for orden, cita in enumerate(colecciones['citas'])),
+            batch_size=LOTE
+        )
+
+        for nombre, elementos in colecciones.items():
+            Sincronizacion.objects.update_or_create(
+                coleccion=nombre,
+                defaults={
+                    'version': version_datos(elementos),
+                    'elementos': len(elementos),
+                    'sincronizado_el': ahora,
+                }
+            )
+
+    resultado = {nombre: len(elementos) for nombre, elementos in colecciones.items()}
+    logger.info("Tablas locales sincronizadas: %s", resultado)
+    return resultado
+
+
+def activo():
+    """
+    Indica si las vistas deben leer de las tablas locales: están
+    habilitadas en settings.CITAS_ALMACEN_LOCAL y ya se sincronizaron.
+    """
+    if not settings.CITAS_ALMACEN_LOCAL:
+        return False
+    if not Sincronizacion.objects.filter(coleccion='citas').exists():
+        logger.warning("Tablas locales sin sincronizar; se consulta el backend")
+        return False
+    return True
+
+
+def versiones():
+    return dict(Sincronizacion.objects.values_list('coleccion', 'version'))
+
+
+def catalogo(nombre, version=None):
+    """
+    Catálogo local con el mismo formato que cliente_api.obtener_catalogo.
+    """
+    return Catalogo(MODELOS_CATALOGO[nombre].objects.values_list('datos', flat=True), version)
+
+
+def citas_reporte(filtros):
+    """
+    Citas locales que pueden cumplir los filtros de un reporte (todas si no
+    se indican), en el orden del backend. El corte exacto por fecha lo hace
+    después el índice de citas, igual que con las citas descargadas.
+
+    Returns:
+        list: JSON original de cada cita
+    """
+    if not filtros:
+        return list(Cita.objects.values_list('datos', flat=True))
+
+    fecha_inicio = _con_zona(datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d'))
+    fecha_fin = _con_zona(datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d'))
+    consulta = Cita.objects.filter(
+        creado_el__gte=fecha_inicio,
+        creado_el__lt=fecha_fin + timedelta(days=1)
+    )
+    for dimension in DIMENSIONES:
+        if dimension in filtros and filtros[dimension] not in [None, "todos", ""]:
+            consulta = consulta.filter(**{dimension: str(filtros[dimension])})
+    return list(consulta.values_list('datos', flat=True))
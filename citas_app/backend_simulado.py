@@ -0,0 +1,137 @@
+"""
+Backend HTTP local con colecciones fijas, para medir las vistas sin
+depender del servicio real.
+
+`BackendSimulado` levanta un servidor en 127.0.0.1 (puerto libre) que
+responde en las mismas rutas que settings.API_* con el JSON de cada
+colección. Si la petición trae `limit`, responde con paginación
+limit/offset ({'count', 'next', 'previous', 'results'}), igual que el
+backend con API_CITAS_PAGINA. `ajustes()` devuelve los settings que
+apuntan el servicio al servidor, para usarlos con override_settings.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from django.conf import settings
+
+from .cliente_api import endpoints
+
+
+class _Manejador(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Cabeceras y cuerpo salen en escrituras separadas; con Nagle cada
+    # respuesta esperaría el ACK retrasado del cliente
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        backend = self.server.backend
+        partes = urlsplit(self.path)
+        nombre = backend.rutas.get(partes.path)
+        if nombre is None:
+            self._responder(404, b'{"detail":"No encontrado"}')
+            return
+
+        backend.registrar(nombre)
+        params = parse_qs(partes.query)
+        limite = int(params.get('limit', ['0'])[0] or 0)
+        if limite <= 0:
+            self._responder(200, backend.cuerpos[nombre])
+            return
+
+        elementos = backend.colecciones[nombre]
+        inicio = int(params.get('offset', ['0'])[0] or 0)
+        siguiente = None
+        if inicio + limite < len(elementos):
+            params['offset'] = [str(inicio + limite)]
+            siguiente = f'{backend.url}{partes.path}?{urlencode(params, doseq=True)}'
+        self._responder(200, json.dumps({
+            'count': len(elementos),
+            'next': siguiente,
+            'previous': None,
+            'results': elementos[inicio:inicio + limite],
+        }).encode('utf-8'))
+
+    def _responder(self, estado, cuerpo):
+        self.send_response(estado)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class BackendSimulado:
+    """
+    Servidor HTTP con las colecciones indicadas. Se usa como context
+    manager: el servidor corre en un hilo mientras dura el bloque.
+
+    Args:
+        colecciones (dict): Nombre de la colección de cliente_api.endpoints()
+            -> lista de elementos
+
+    Attributes:
+        peticiones (dict): Peticiones recibidas por colección
+    """
+
+    def __init__(self, colecciones):
+        self.colecciones = colecciones
+        # Las respuestas completas se serializan una sola vez
+        self.cuerpos = {
+            nombre: json.dumps(elementos).encode('utf-8')
+            for nombre, elementos in colecciones.items()
+        }
+        self.rutas = {
+            urlsplit(url).path: nombre
+            for nombre, url in endpoints().items()
+            if nombre in colecciones
+        }
+        self.peticiones = {nombre: 0 for nombre in colecciones}
+        self._lock = threading.Lock()
+        self._servidor = None
+        self._hilo = None
+
+    def __enter__(self):
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', 0), _Manejador)
+        self._servidor.daemon_threads = True
+        self._servidor.backend = self
+        self._hilo = threading.Thread(
+            target=self._servidor.serve_forever,
+            name='backend-simulado',
+            daemon=True
+        )
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+        self._hilo.join()
+
+    @property
+    def url(self):
+        host, puerto = self._servidor.server_address[:2]
+        return f'http://{host}:{puerto}'
+
+    def registrar(self, nombre):
+        with self._lock:
+            self.peticiones[nombre] += 1
+
+    def ajustes(self):
+        """
+        Settings que dirigen las descargas del servicio a este servidor.
+        """
+        host, puerto = self._servidor.server_address[:2]
+        return {
+            'BACKEND_PROTOCOL': 'http',
+            'BACKEND_HOST': host,
+            'BACKEND_PORT': str(puerto),
+            'API_CITAS': f'{self.url}{urlsplit(settings.API_CITAS).path}',
+            'API_PROFESIONALES': f'{self.url}{urlsplit(settings.API_PROFESIONALES).path}',
+            'API_ATLETAS': f'{self.url}{urlsplit(settings.API_ATLETAS).path}',
+            'API_AREAS': f'{self.url}{urlsplit(settings.API_AREAS).path}',
+            'API_CONSULTORIOS': f'{self.url}{urlsplit(settings.API_CONSULTORIOS).path}',
+        }
@@ -0,0 +1,533 @@
+"""
+Micro-benchmarks de las rutas críticas del servicio.
+
+Se ejecutan con `python manage.py benchmark [nombre ...]`. Cada benchmark
+devuelve una lista de filas {'caso', 'n', 'segundos', 'us_por_elemento'} y,
+si mide memoria, 'memoria_mb' con el pico de memoria asignada. Las filas
+de peticiones HTTP agregan las latencias (ver fila_peticiones). Con
+`--json` los resultados se guardan para compararlos entre commits.
+"""
+from datetime import datetime, timedelta
+import math
+import random
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from .agregaciones import AgregadorCitas
+from .fechas import parse_fecha, parse_fecha_formatos
+from .normalizacion import normalizar_citas
+from .tablas_pdf import ENCABEZADOS_DETALLE
+
+BENCHMARKS = {}
+
+
+def benchmark(nombre):
+    def registrar(funcion):
+        BENCHMARKS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def medir(funcion, repeticiones=3):
+    """
+    Mejor tiempo (en segundos) de `repeticiones` ejecuciones de `funcion`.
+    """
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor
+
+
+def pico_memoria(funcion):
+    """
+    Pico de memoria (en MB) asignada durante una ejecución de `funcion`.
+    """
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / 1e6
+
+
+def fila(caso, n, segundos, memoria_mb=None):
+    resultado = {
+        'caso': caso,
+        'n': n,
+        'segundos': round(segundos, 6),
+        'us_por_elemento': round(segundos / n * 1e6, 3) if n else 0,
+    }
+    if memoria_mb is not None:
+        resultado['memoria_mb'] = round(memoria_mb, 2)
+    return resultado
+
+
+def percentil(valores, p):
+    """
+    Percentil `p` (0-100) de `valores` por rango más cercano.
+    """
+    ordenados = sorted(valores)
+    return ordenados[max(math.ceil(len(ordenados) * p / 100.0) - 1, 0)]
+
+
+def fila_peticiones(caso, n, latencias, memoria_mb=None, etapas_ms=None):
+    """
+    Fila de un caso medido por peticiones: 'segundos' es la latencia
+    mediana y se agregan el número de peticiones, las peticiones por
+    segundo (en serie), los percentiles 50/95/99 en milisegundos y, si se
+    indican, los milisegundos promedio de cada etapa de Server-Timing.
+    """
+    resultado = fila(caso, n, percentil(latencias, 50), memoria_mb)
+    resultado.update({
+        'peticiones': len(latencias),
+        'peticiones_por_segundo': round(len(latencias) / sum(latencias), 3),
+        'p50_ms': round(percentil(latencias, 50) * 1000, 3),
+        'p95_ms': round(percentil(latencias, 95) * 1000, 3),
+        'p99_ms': round(percentil(latencias, 99) * 1000, 3),
+    })
+    if etapas_ms is not None:
+        resultado['etapas_ms'] = etapas_ms
+    return resultado
+
+
+def fechas_sinteticas(n, semilla=0):
+    """
+    Marcas de tiempo en los formatos que devuelve el backend.
+    """
+    rnd = random.Random(semilla)
+    base = datetime(2025, 1, 1)
+    formatos = [
+        '%Y-%m-%dT%H:%M:%S.%fZ',
+        '%Y-%m-%dT%H:%M:%S.%f-06:00',
+        '%Y-%m-%dT%H:%M:%SZ',
+        '%Y-%m-%dT%H:%M:%S.%f',
+    ]
+    return [
+        (base + timedelta(seconds=rnd.randint(0, 365 * 86400), microseconds=rnd.randint(0, 999999)))
+        .strftime(formatos[i % len(formatos)])
+        for i in range(n)
+    ]
+
+
+def citas_sinteticas(n, semilla=0, profesionales=40, atletas=2000, areas=8, consultorios=12):
+    """
+    Citas con la forma que devuelve /Modulos/Citas/, repartidas en los
+    últimos 18 meses.
+    """
+    rnd = random.Random(semilla)
+    ahora = datetime.now()
+    estados = ['Pendiente', 'Confirmada', 'Completada', 'Cancelada']
+    return [
+        {
+            'id': i,
+            'creado_el': (ahora - timedelta(seconds=rnd.randint(0, 540 * 86400))).strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+            'estado': estados[rnd.randrange(4)],
+            'atleta_id': rnd.randint(1, atletas),
+            'area_id': rnd.randint(1, areas),
+            'consultorio_id': rnd.randint(1, consultorios),
+            'profesional_salud_id': rnd.randint(1, profesionales),
+        }
+        for i in range(n)
+    ]
+
+
+def catalogos_sinteticos(profesionales=40, atletas=2000, areas=8, consultorios=12):
+    """
+    Catálogos con la forma que devuelve /Catalogos/, con los mismos rangos
+    de IDs que citas_sinteticas.
+    """
+    especialidades = ['Medicina del deporte', 'Fisioterapia', 'Nutrición', 'Psicología']
+    return {
+        'profesionales': [
+            {
+                'id': i,
+                'nombre': f'Profesional {i}',
+                'apPaterno': 'Apellido',
+                'apMaterno': 'Materno',
+                'especialidad': especialidades[i % len(especialidades)],
+            }
+            for i in range(1, profesionales + 1)
+        ],
+        'atletas': [
+            {'id': i, 'nombre': f'Atleta {i}', 'apPaterno': 'Apellido', 'apMaterno': 'Materno'}
+            for i in range(1, atletas + 1)
+        ],
+        'areas': [{'id': i, 'nombre': f'Área {i}'} for i in range(1, areas + 1)],
+        'consultorios': [{'id': i, 'nombre': f'Consultorio {i}'} for i in range(1, consultorios + 1)],
+    }
+
+
+def colecciones_sinteticas(n, semilla=0):
+    """
+    Las cinco colecciones del backend con `n` citas.
+    """
+    return {'citas': citas_sinteticas(n, semilla), **catalogos_sinteticos()}
+
+
+def citas_reporte_sinteticas(n, semilla=0):
+    """
+    Citas ya enriquecidas, como las recibe _generar_pdf.
+    """
+    rnd = random.Random(semilla)
+    estados = ['Pendiente', 'Confirmada', 'Completada', 'Cancelada']
+    return [
+        {
+            'fecha_formateada': f'{rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2025',
+            'hora_formateada': f'{rnd.randint(7, 20):02d}:{rnd.choice(["00", "30"])}',
+            'atleta_nombre': f'Atleta {rnd.randint(1, 2000)} Apellido',
+            'profesional_nombre': f'Profesional {rnd.randint(1, 40)}',
+            'profesional_especialidad': 'Medicina del deporte',
+            'consultorio_nombre': f'Consultorio {rnd.randint(1, 12)}',
+            'estado': estados[rnd.randrange(4)],
+        }
+        for _ in range(n)
+    ]
+
+
+@benchmark('fechas')
+def benchmark_fechas(n=50000, repeticiones=3):
+    """
+    Compara el parseo por lista de formatos (implementación anterior) con
+    el camino rápido, sin memoria y con memoria caliente.
+    """
+    cadenas = fechas_sinteticas(n)
+    sin_cache = parse_fecha.__wrapped__
+
+    def formatos():
+        for cadena in cadenas:
+            parse_fecha_formatos(cadena)
+
+    def rapido():
+        for cadena in cadenas:
+            sin_cache(cadena)
+
+    def memorizado():
+        for cadena in cadenas:
+            parse_fecha(cadena)
+
+    parse_fecha.cache_clear()
+    memorizado()
+    return [
+        fila('strptime por formatos', n, medir(formatos, repeticiones)),
+        fila('ruta rápida ISO', n, medir(rapido, repeticiones)),
+        fila('ruta rápida memorizada', n, medir(memorizado, repeticiones)),
+    ]
+
+
+@benchmark('estadisticas')
+def benchmark_estadisticas(n=None, repeticiones=3):
+    """
+    Agregación de estadísticas con el backend de Python, el columnar
+    (NumPy) y el de acumulados por mes, sobre citas ya normalizadas.
+    """
+    from .acumulados import AcumuladosCitas, AgregadorCitasAcumulados
+    from .agregaciones_numpy import AgregadorCitasNumpy, ColumnasCitas
+
+    ahora = datetime.now()
+    filas = []
+    for tamaño in ([n] if n else [10_000, 100_000, 1_000_000]):
+        citas = citas_sinteticas(tamaño)
+        normalizadas = normalizar_citas(citas)
+
+        python = medir(lambda: AgregadorCitas(ahora.month, ahora.year).agregar(normalizadas), repeticiones)
+        carga = medir(lambda: ColumnasCitas(normalizadas), 1)
+        AgregadorCitasNumpy(ahora.month, ahora.year).agregar(normalizadas)
+        numpy = medir(lambda: AgregadorCitasNumpy(ahora.month, ahora.year).agregar(normalizadas), repeticiones)
+
+        acumulados = AcumuladosCitas(normalizadas)
+        carga_acumulados = medir(lambda: AcumuladosCitas(normalizadas), 1)
+        AgregadorCitasAcumulados(ahora.month, ahora.year).agregar(normalizadas)
+        en_cache = medir(lambda: AgregadorCitasAcumulados(ahora.month, ahora.year).agregar(normalizadas), repeticiones)
+        cambios = normalizadas[:100]
+        actualizacion = medir(lambda: acumulados.con_cambios(cambios, cambios), repeticiones)
+
+        filas.append(fila('python', tamaño, python))
+        filas.append(fila('numpy (carga columnar)', tamaño, carga))
+        filas.append(fila('numpy (columnas en caché)', tamaño, numpy))
+        filas.append(fila('acumulados (carga)', tamaño, carga_acumulados))
+        filas.append(fila('acumulados (en caché)', tamaño, en_cache))
+        filas.append(fila('acumulados (100 cambios)', tamaño, actualizacion))
+        del citas, normalizadas
+    return filas
+
+
+@benchmark('pdf')
+def benchmark_pdf(n=None, repeticiones=1):
+    """
+    Tiempo y pico de memoria de _generar_pdf con el detalle en una sola
+    tabla (implementación anterior), en tablas por bloques, dibujado en
+    el canvas y, si pdf_paralelo está disponible, con las tablas por
+    bloques repartidas en el pool de procesos. La tabla única crece de
+    forma superlineal, así que solo se mide hasta 10k filas. La memoria
+    del caso en paralelo es solo la del proceso de la petición.
+    """
+    from . import pdf_paralelo
+
+    filtros = {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31'}
+    casos = [
+        ('tabla única', None, 0),
+        (f'bloques de {settings.REPORTES_FILAS_POR_TABLA} filas', settings.REPORTES_FILAS_POR_TABLA, 0),
+        ('canvas', settings.REPORTES_FILAS_POR_TABLA, 1),
+    ]
+    procesos = settings.REPORTES_PROCESOS
+    paralelo = pdf_paralelo.PdfWriter is not None and procesos > 0
+    filas = []
+    for tamaño in ([n] if n else [1_000, 10_000, 50_000]):
+        citas = citas_reporte_sinteticas(tamaño)
+        for caso, filas_por_tabla, umbral in casos:
+            if filas_por_tabla is None:
+                if tamaño > 10_000:
+                    continue
+                filas_por_tabla = tamaño
+
+            with override_settings(
+                REPORTES_FILAS_POR_TABLA=filas_por_tabla,
+                REPORTES_CANVAS_UMBRAL=umbral,
+                REPORTES_PROCESOS=0
+            ):
+                filas.append(_medir_pdf(caso, citas, filtros, repeticiones))
+
+        if paralelo:
+            with override_settings(
+                REPORTES_CANVAS_UMBRAL=0,
+                REPORTES_PARALELO_MIN_FILAS=max(tamaño // (procesos + 1), 1)
+            ):
+                # Arranca los procesos del pool antes de medir
+                executor = pdf_paralelo._get_executor()
+                for futuro in [
+                    executor.submit(pdf_paralelo.renderizar_detalle, [ENCABEZADOS_DETALLE], 1, 0, False)
+                    for _ in range(procesos)
+                ]:
+                    futuro.result()
+                caso = f'bloques en paralelo ({procesos} procesos)'
+                filas.append(_medir_pdf(caso, citas, filtros, repeticiones))
+    return filas
+
+
+def _medir_pdf(caso, citas, filtros, repeticiones):
+    from .views import GenerarReportePDFView
+
+    def generar():
+        GenerarReportePDFView()._generar_pdf(citas, filtros).close()
+
+    segundos = medir(generar, repeticiones)
+    return fila(caso, len(citas), segundos, pico_memoria(generar))
+
+
+@benchmark('pdf_plantilla')
+def benchmark_pdf_plantilla(n=10, repeticiones=200):
+    """
+    Costo fijo por petición de un reporte pequeño: construir estilos,
+    estilos de tabla y párrafos fijos en cada llamada (implementación
+    anterior) frente a copiarlos de plantilla_pdf, y el reporte completo.
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, TableStyle
+
+    from . import plantilla_pdf
+    from .views import GenerarReportePDFView
+
+    def por_peticion():
+        styles = getSampleStyleSheet()
+        [
+            Paragraph("Reporte de Citas Médicas", styles['Heading1']),
+            Paragraph("Filtros Aplicados:", styles['Heading2']),
+            Paragraph("Resumen Estadístico:", styles['Heading2']),
+            Paragraph("Detalle de Citas:", styles['Heading2']),
+            Paragraph(plantilla_pdf.PIE, styles['BodyText']),
+        ]
+        for color_fondo in ['#EFF6FF', '#FFFFFF']:
+            TableStyle([
+                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#3B82F6')),
+                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+                ('FONTSIZE', (0, 0), (-1, 0), 10),
+                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+                ('BACKGROUND', (0, 1), (-1, -1), colors.HexColor(color_fondo)),
+                ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#BFDBFE')),
+            ])
+
+    def plantilla():
+        for nombre in ['titulo', 'filtros', 'resumen', 'detalle', 'pie']:
+            plantilla_pdf.fijo(nombre)
+
+    citas = citas_reporte_sinteticas(n)
+    filtros = {'fecha_inicio': '2025-01-01', 'fecha_fin': '2025-12-31'}
+
+    def reporte():
+        GenerarReportePDFView()._generar_pdf(citas, filtros).close()
+
+    def veces(funcion):
+        return lambda: [funcion() for _ in range(repeticiones)]
+
+    return [
+        fila('preparación por petición (anterior)', repeticiones, medir(veces(por_peticion))),
+        fila('preparación con plantilla_pdf', repeticiones, medir(veces(plantilla))),
+        fila(f'reporte completo de {n} citas', repeticiones, medir(veces(reporte))),
+    ]
+
+
+def _modos_cache():
+    """
+    Settings de cada modo del benchmark de vistas. 'sin caché' apaga las
+    cachés, el tablero precalculado, el snapshot y las tablas locales, así
+    que cada petición descarga y procesa todo. 'con caché' usa las cachés
+    del servicio (la compartida en memoria del proceso y los reportes en un
+    directorio temporal) y un intervalo del tablero que no vence durante la
+    medición.
+    """
+    comunes = {'CITAS_SNAPSHOT_INTERVALO': 0, 'CITAS_ALMACEN_LOCAL': False}
+    return {
+        'sin caché': {
+            **comunes,
+            'API_CACHE_TTL': {nombre: 0 for nombre in settings.API_CACHE_TTL},
+            'CATALOGOS_CACHE_TTL': 0,
+            'REPORTES_CACHE_MAX_BYTES': 0,
+            'ESTADISTICAS_INTERVALO': 0,
+        },
+        'con caché': {
+            **comunes,
+            'CACHES': {
+                **settings.CACHES,
+                'upstream': {
+                    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                    'LOCATION': 'benchmark-vistas',
+                },
+            },
+            'REPORTES_CACHE_DIR': tempfile.mkdtemp(prefix='benchmark_reportes_'),
+            'ESTADISTICAS_INTERVALO': 3600,
+        },
+    }
+
+
+def _etapas(server_timing):
+    etapas = {}
+    for parte in server_timing.split(','):
+        nombre, _, duracion = parte.strip().partition(';dur=')
+        if duracion:
+            etapas[nombre] = float(duracion)
+    return etapas
+
+
+def _medir_vista(caso, n, cliente, ruta, params, repeticiones):
+    def peticion():
+        response = cliente.get(ruta, params)
+        if response.status_code != 200:
+            raise RuntimeError(f"{ruta} respondió {response.status_code}")
+        # Consume también las respuestas por bloques (PDF)
+        response.getvalue()
+        response.close()
+        return response
+
+    # Conexiones, importaciones y, en modo con caché, las cachés
+    peticion()
+    latencias = []
+    etapas = {}
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        response = peticion()
+        latencias.append(time.perf_counter() - inicio)
+        for nombre, ms in _etapas(response.get('Server-Timing', '')).items():
+            etapas[nombre] = etapas.get(nombre, 0.0) + ms
+    etapas_ms = {nombre: round(ms / repeticiones, 3) for nombre, ms in etapas.items()}
+    return fila_peticiones(caso, n, latencias, pico_memoria(peticion), etapas_ms)
+
+
+@benchmark('vistas')
+def benchmark_vistas(n=None, repeticiones=10):
+    """
+    Latencias, peticiones por segundo y pico de memoria de
+    EstadisticasCitasView, FiltrosCitasView y GenerarReportePDFView (con
+    el último mes de citas) a través del stack completo de Django, con el
+    backend reemplazado por un servidor local (backend_simulado) que sirve
+    colecciones sintéticas de n citas. Cada caso se mide en los modos de
+    _modos_cache(); la memoria es la de una petición más.
+    """
+    from . import tablero
+    from .backend_simulado import BackendSimulado
+    from .cliente_api import invalidar_catalogos
+
+    hoy = datetime.now().date()
+    vistas = [
+        ('estadisticas', reverse('estadisticas-citas'), {}),
+        ('filtros', reverse('filtros-citas'), {}),
+        ('reporte pdf (1 mes)', reverse('generar-reporte-pdf'), {
+            'fecha_inicio': (hoy - timedelta(days=30)).isoformat(),
+            'fecha_fin': hoy.isoformat(),
+        }),
+    ]
+    cliente = Client()
+    filas = []
+    for tamaño in ([n] if n else [1_000, 10_000, 100_000]):
+        with BackendSimulado(colecciones_sinteticas(tamaño)) as backend:
+            for modo, ajustes in _modos_cache().items():
+                with override_settings(**backend.ajustes(), **ajustes):
+                    # Nada de lo guardado con otro tamaño o modo se reutiliza
+                    invalidar_catalogos()
+                    tablero.descartar()
+                    for caso, ruta, params in vistas:
+                        filas.append(_medir_vista(f'{caso} ({modo})', tamaño, cliente, ruta, params, repeticiones))
+    return filas
+
+
+@benchmark('json')
+def benchmark_json(n=None, repeticiones=3):
+    """
+    Descarga y decodificación de la colección de citas desde el backend
+    simulado, sin caché: response.json() (implementación anterior), json
+    de la biblioteca estándar, orjson si está instalado y la proyección
+    por trozos de API_CITAS_PROYECCION. Las citas llevan además campos de
+    texto que el servicio no usa, como las del backend.
+    """
+    from . import decodificacion
+    from .backend_simulado import BackendSimulado
+    from .cliente_api import get_session, obtener_coleccion
+
+    sin_cache = {'API_CACHE_TTL': {}, 'API_CITAS_PAGINA': 0, 'CITAS_SNAPSHOT_INTERVALO': 0}
+    filas = []
+    for tamaño in ([n] if n else [10_000, 100_000]):
+        citas = citas_sinteticas(tamaño)
+        for cita in citas:
+            cita.update({
+                'motivo': 'Valoración de seguimiento',
+                'observaciones': 'Sin observaciones adicionales',
+                'actualizado_el': cita['creado_el'],
+            })
+
+        with BackendSimulado({'citas': citas}) as backend:
+            with override_settings(**backend.ajustes(), **sin_cache):
+                def anterior():
+                    get_session().get(settings.API_CITAS, timeout=30).json()
+
+                def descargar():
+                    obtener_coleccion('citas', 30)
+
+                orjson = decodificacion.orjson
+                casos = [
+                    ('response.json() (anterior)', anterior, orjson, False),
+                    ('json estándar', descargar, None, False),
+                ]
+                if orjson is not None:
+                    casos.append(('orjson', descargar, orjson, False))
+                casos.append(('proyección por trozos', descargar, orjson, True))
+
+                for caso, funcion, modulo, proyeccion in casos:
+                    decodificacion.orjson = modulo
+                    try:
+                        with override_settings(API_CITAS_PROYECCION=proyeccion):
+                            funcion()
+                            filas.append(fila(caso, tamaño, medir(funcion, repeticiones), pico_memoria(funcion)))
+                    finally:
+                        decodificacion.orjson = orjson
+    return filas
@@ -0,0 +1,178 @@
+"""
+Caché de respuestas del backend compartida entre workers de gunicorn.
+
+Usa el framework de caché de Django (alias `upstream` en settings.CACHES),
+de modo que con un backend de archivos o de red todos los procesos
+aprovechan las descargas de los demás. Los payloads se guardan como JSON
+compacto comprimido con zlib, junto con los validadores HTTP (`ETag`,
+`Last-Modified`) para revalidar con peticiones condicionales.
+
+Cada entrada lleva una `version` derivada de su contenido, que viaja con
+el payload decodificado (decodificacion.Coleccion). Los últimos payloads
+decodificados se conservan en memoria del proceso, en una caché LRU de
+settings.API_CACHE_DECODIFICADOS entradas, y se reutilizan mientras la
+versión no cambie.
+"""
+import hashlib
+import json
+import logging
+import time
+import zlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from . import decodificacion, telemetria
+from .cache_local import CacheTTL
+
+logger = logging.getLogger(__name__)
+
+ALIAS = 'upstream'
+
+# (versión, payload) por entrada; se descartan como las entradas de la
+# caché compartida, tras la vigencia más la ventana de revalidación
+_decodificados = CacheTTL(
+    ttl=max(settings.API_CACHE_TTL.values(), default=0) + settings.API_CACHE_REVALIDACION,
+    max_entradas=settings.API_CACHE_DECODIFICADOS
+)
+
+
+def ttl(nombre):
+    """
+    Segundos de vigencia configurados para una colección (0 = sin caché).
+    """
+    return settings.API_CACHE_TTL.get(nombre, 0)
+
+
+def _clave(nombre, url):
+    return f'{nombre}:{hashlib.sha1(url.encode("utf-8")).hexdigest()[:16]}'
+
+
+def serializar(payload):
+    datos = json.dumps(payload, separators=(',', ':'), ensure_ascii=False)
+    return zlib.compress(datos.encode('utf-8'), 6)
+
+
+def deserializar(datos):
+    return decodificacion.loads(zlib.decompress(datos))
+
+
+def vigente(entrada):
+    return entrada is not None and time.time() < entrada['vigente_hasta']
+
+
+def validadores(entrada):
+    """
+    Cabeceras para una petición condicional a partir de una entrada.
+    """
+    headers = {}
+    if entrada is None:
+        return headers
+    if entrada.get('etag'):
+        headers['If-None-Match'] = entrada['etag']
+    if entrada.get('last_modified'):
+        headers['If-Modified-Since'] = entrada['last_modified']
+    return headers
+
+
+def leer(nombre, url):
+    """
+    Devuelve la entrada guardada para la colección (vigente o pendiente de
+    revalidar) o None si no hay.
+    """
+    if ttl(nombre) <= 0:
+        return None
+    try:
+        return caches[ALIAS].get(_clave(nombre, url))
+    except Exception as e:
+        logger.warning("No se pudo leer la caché compartida de %s: %s", nombre, str(e))
+        return None
+
+
+def _escribir(nombre, url, entrada):
+    segundos = ttl(nombre)
+    entrada['vigente_hasta'] = time.time() + segundos
+    try:
+        caches[ALIAS].set(
+            _clave(nombre, url),
+            entrada,
+            segundos + settings.API_CACHE_REVALIDACION
+        )
+    except Exception as e:
+        logger.warning("No se pudo guardar en la caché compartida %s: %s", nombre, str(e))
+
+
+def guardar(nombre, url, payload, etag=None, last_modified=None):
+    """
+    Guarda un payload recién descargado junto con sus validadores HTTP.
+
+    Returns:
+        El payload con la versión de la entrada (ver decodificacion.con_version)
+    """
+    if ttl(nombre) <= 0:
+        return payload
+    datos = serializar(payload)
+    version = getattr(payload, 'version', None) or hashlib.sha1(datos).hexdigest()[:16]
+    payload = decodificacion.con_version(payload, version)
+    _decodificados.guardar(_clave(nombre, url), (version, payload))
+    _escribir(nombre, url, {
+        'datos': datos,
+        'version': version,
+        'etag': etag,
+        'last_modified': last_modified,
+    })
+    return payload
+
+
+def renovar(nombre, url, entrada):
+    """
+    Extiende la vigencia de una entrada tras una respuesta 304.
+    """
+    _escribir(nombre, url, entrada)
+
+
+def payload(nombre, url, entrada):
+    """
+    Payload decodificado de una entrada. Si el proceso ya decodificó esa
+    misma versión se reutiliza sin descomprimir ni parsear de nuevo.
+    """
+    clave = _clave(nombre, url)
+    version, decodificado = _decodificados.consultar(clave) or (None, None)
+    if version == entrada['version']:
+        return decodificado
+
+    with telemetria.etapa('decodificar'):
+        decodificado = decodificacion.con_version(deserializar(entrada['datos']), entrada['version'])
+    _decodificados.guardar(clave, (entrada['version'], decodificado))
+    return decodificado
+
+
+def version(payload):
+    """
+    Versión del contenido de un payload que no la trae en `version` (los
+    descargados del backend ya la traen).
+    """
+    return hashlib.sha1(serializar(payload)).hexdigest()[:16]
+
+
+def caducar(nombre, url):
+    """
+    Da por caducada una entrada sin descartarla: la próxima lectura la
+    revalida con el backend usando sus validadores HTTP.
+    """
+    entrada = leer(nombre, url)
+    if entrada is None:
+        return
+    entrada['vigente_hasta'] = 0
+    try:
+        caches[ALIAS].set(_clave(nombre, url), entrada, settings.API_CACHE_REVALIDACION)
+    except Exception as e:
+        logger.warning("No se pudo caducar la caché compartida de %s: %s", nombre, str(e))
+
+
+def invalidar(nombre, url):
+    _decodificados.invalidar(_clave(nombre, url))
+    try:
+        caches[ALIAS].delete(_clave(nombre, url))
+    except Exception as e:
+        logger.warning("No se pudo invalidar la caché compartida de %s: %s", nombre, str(e))
@@ -0,0 +1,112 @@
+"""
+Caché en memoria del proceso con expiración (TTL) y tamaño acotado (LRU).
+"""
+from collections import OrderedDict
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class _Entrada:
+    __slots__ = ('valor', 'expira')
+
+    def __init__(self, valor, expira):
+        self.valor = valor
+        self.expira = expira
+
+
+class CacheTTL:
+    """
+    Caché LRU con TTL y refresco stale-while-revalidate.
+
+    Una entrada vigente se devuelve directamente. Una entrada caducada pero
+    dentro de la ventana `stale` también se devuelve, y se lanza un refresco
+    en segundo plano para la siguiente petición. Fuera de esa ventana el
+    valor se vuelve a cargar de forma síncrona.
+    """
+
+    def __init__(self, ttl, max_entradas, stale=0):
+        self.ttl = ttl
+        self.stale = stale
+        self.max_entradas = max_entradas
+        self._datos = OrderedDict()
+        self._refrescando = set()
+        self._lock = threading.Lock()
+
+    @property
+    def activa(self):
+        return self.ttl > 0 and self.max_entradas > 0
+
+    def consultar(self, clave):
+        """
+        Devuelve el valor en caché (vigente o dentro de la ventana stale) o
+        None si no hay ninguno utilizable. No dispara cargas ni refrescos.
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or time.monotonic() >= entrada.expira + self.stale:
+                return None
+            self._datos.move_to_end(clave)
+            return entrada.valor
+
+    def guardar(self, clave, valor):
+        if not self.activa:
+            return
+        with self._lock:
+            self._datos[clave] = _Entrada(valor, time.monotonic() + self.ttl)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.max_entradas:
+                self._datos.popitem(last=False)
+
+    def obtener(self, clave, cargar):
+        """
+        Devuelve el valor asociado a `clave`, usando `cargar()` para
+        obtenerlo cuando no está en caché o ya no es utilizable.
+        """
+        if not self.activa:
+            return cargar()
+
+        with self._lock:
+            entrada = self._datos.get(clave)
+            ahora = time.monotonic()
+            if entrada is not None:
+                if ahora < entrada.expira:
+                    self._datos.move_to_end(clave)
+                    return entrada.valor
+                if ahora < entrada.expira + self.stale:
+                    self._datos.move_to_end(clave)
+                    self._refrescar_en_segundo_plano(clave, cargar)
+                    return entrada.valor
+
+        valor = cargar()
+        self.guardar(clave, valor)
+        return valor
+
+    def _refrescar_en_segundo_plano(self, clave, cargar):
+        # Se llama con self._lock tomado
+        if clave in self._refrescando:
+            return
+        self._refrescando.add(clave)
+
+        def refrescar():
+            try:
+                self.guardar(clave, cargar())
+            except Exception as e:
+                logger.warning("No se pudo refrescar la caché para %s: %s", clave, str(e))
+            finally:
+                with self._lock:
+                    self._refrescando.discard(clave)
+
+        threading.Thread(target=refrescar, name=f'refresco-{clave}', daemon=True).start()
+
+    def invalidar(self, clave=None):
+        """
+        Elimina una entrada, o todas si no se indica `clave`.
+        """
+        with self._lock:
+            if clave is None:
+                self._datos.clear()
+            else:
+                self._datos.pop(clave, None)
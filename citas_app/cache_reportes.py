@@ -0,0 +1,172 @@
+"""
+Caché en disco de reportes PDF ya generados.
+
+Cada PDF se guarda bajo una clave derivada de los filtros normalizados y
+de la versión de los datos con los que se generó (citas y catálogos), de
+modo que el mismo reporte sobre los mismos datos se sirve sin volver a
+renderizarlo y cualquier cambio en el backend produce una clave nueva. La
+misma clave se usa como ETag de la respuesta. El PDF lleva la hora en que
+se generó, así que el ETag solo es fuerte con la caché activa, cuando todas
+las respuestas con esa clave sirven los mismos bytes.
+
+El tamaño total del directorio se limita a settings.REPORTES_CACHE_MAX_BYTES
+descartando primero los reportes usados hace más tiempo.
+"""
+from datetime import datetime
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.utils.http import quote_etag
+
+from .indices import DIMENSIONES
+from .normalizacion import clave_id
+
+logger = logging.getLogger(__name__)
+
+# Se incrementa cuando cambia el contenido o el diseño del PDF, para no
+# servir reportes generados con el formato anterior
+VERSION_FORMATO = 4
+
+EXTENSION = '.pdf'
+
+
+def activa():
+    return settings.REPORTES_CACHE_MAX_BYTES > 0
+
+
+def filtros_normalizados(filtros):
+    """
+    Filtros que determinan el contenido del reporte, en forma canónica:
+    fechas en ISO y solo los filtros por ID que se especificaron.
+    """
+    normalizados = {
+        'fecha_inicio': datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d').date().isoformat(),
+        'fecha_fin': datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d').date().isoformat(),
+    }
+    for dimension in DIMENSIONES:
+        if dimension in filtros and filtros[dimension] not in [None, "todos", ""]:
+            normalizados[dimension] = clave_id(filtros[dimension])
+    return normalizados
+
+
+def clave(filtros, versiones):
+    """
+    Clave de un reporte.
+
+    Args:
+        filtros (dict): Parámetros del reporte
+        versiones (dict): Versión de cada colección usada
+
+    Returns:
+        str: Hash hexadecimal
+    """
+    contenido = json.dumps(
+        {
+            'formato': VERSION_FORMATO,
+            'filtros': filtros_normalizados(filtros),
+            'datos': versiones,
+        },
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()[:32]
+
+
+def etag(clave_reporte):
+    """
+    ETag de un reporte: débil si la caché está desactivada, porque cada
+    generación lleva su propia hora aunque el contenido sea el mismo.
+    """
+    valor = quote_etag(clave_reporte)
+    return valor if activa() else 'W/' + valor
+
+
+def _ruta(clave_reporte):
+    return os.path.join(settings.REPORTES_CACHE_DIR, clave_reporte + EXTENSION)
+
+
+def abrir(clave_reporte):
+    """
+    Abre el PDF guardado para una clave y lo marca como usado.
+
+    Returns:
+        file: Archivo abierto en modo binario, o None si no está en caché
+    """
+    if not activa():
+        return None
+    ruta = _ruta(clave_reporte)
+    try:
+        archivo = open(ruta, 'rb')
+    except FileNotFoundError:
+        return None
+    try:
+        os.utime(ruta)
+    except OSError:
+        pass
+    logger.info("Reporte %s servido desde la caché", clave_reporte)
+    return archivo
+
+
+def guardar(clave_reporte, archivo):
+    """
+    Copia un PDF recién generado a la caché y devuelve `archivo` de nuevo
+    posicionado al inicio.
+    """
+    if not activa():
+        return archivo
+    try:
+        os.makedirs(settings.REPORTES_CACHE_DIR, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(dir=settings.REPORTES_CACHE_DIR, suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, 'wb') as salida:
+                shutil.copyfileobj(archivo, salida)
+            # Reemplazo atómico: otro worker nunca lee un PDF a medio escribir
+            os.replace(temporal, _ruta(clave_reporte))
+        except BaseException:
+            os.remove(temporal)
+            raise
+        recortar()
+    except OSError as e:
+        logger.warning("No se pudo guardar el reporte %s en la caché: %s", clave_reporte, str(e))
+    archivo.seek(0)
+    return archivo
+
+
+def recortar():
+    """
+    Elimina los reportes usados hace más tiempo hasta que el directorio
+    quede por debajo de settings.REPORTES_CACHE_MAX_BYTES.
+    """
+    reportes = []
+    with os.scandir(settings.REPORTES_CACHE_DIR) as entradas:
+        for entrada in entradas:
+            if not entrada.name.endswith(EXTENSION):
+                continue
+            try:
+                info = entrada.stat()
+            except FileNotFoundError:
+                continue
+            reportes.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamaño for _, tamaño, _ in reportes)
+    reportes.sort()
+    for _, tamaño, ruta in reportes:
+        if total <= settings.REPORTES_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(ruta)
+        except FileNotFoundError:
+            pass
+        total -= tamaño
+
+
+def invalidar():
+    """
+    Descarta todos los reportes guardados.
+    """
+    shutil.rmtree(settings.REPORTES_CACHE_DIR, ignore_errors=True)
@@ -0,0 +1,503 @@
+"""
+Cliente compartido para los servicios del backend principal.
+
+Centraliza las URLs de las colecciones que consumen las vistas y permite
+descargarlas de forma concurrente, de modo que una vista espera por la
+respuesta más lenta y no por la suma de todas.
+
+Las citas se pueden pedir solo para un rango de fechas (y los IDs
+filtrados) si el backend lo soporta (settings.API_CITAS_FILTROS), y en
+páginas si settings.API_CITAS_PAGINA es mayor que 0. Si el backend
+devuelve citas fuera de lo pedido, los filtros se dejan de enviar y se
+vuelve a la descarga completa. Con el snapshot de citas activo
+(snapshot_citas) las citas se leen de él en lugar de descargarse.
+
+El JSON se decodifica con decodificacion (orjson si está instalado). Con
+settings.API_CITAS_PROYECCION las citas se decodifican conforme llegan y
+solo se conservan los campos que usa el servicio.
+"""
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+import hashlib
+import logging
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from . import cache_compartida, decodificacion, telemetria
+from .cache_local import CacheTTL
+from .indices import DIMENSIONES
+from .normalizacion import CAMPOS_CITA, clave_id, id_vacio, normalizar_citas
+
+logger = logging.getLogger(__name__)
+
+TIMEOUT = 10  # segundos
+
+CATALOGOS = ['atletas', 'areas', 'consultorios', 'profesionales']
+
+_executor = None
+_executor_lock = threading.Lock()
+_session = None
+_session_lock = threading.Lock()
+
+_metricas = Counter()
+_metricas_lock = threading.Lock()
+
+# Momento (time.monotonic) en que el backend demostró que ignora los
+# filtros de citas; no se vuelven a enviar hasta pasado
+# settings.API_CITAS_FILTROS_REINTENTO
+_filtros_ignorados_el = None
+
+_cache_catalogos = CacheTTL(
+    ttl=settings.CATALOGOS_CACHE_TTL,
+    max_entradas=settings.CATALOGOS_CACHE_MAX,
+    stale=settings.CATALOGOS_CACHE_STALE
+)
+
+
+class ErrorServicioExterno(requests.exceptions.RequestException):
+    """
+    Error al descargar una colección del backend. Conserva el nombre de la
+    colección para que cada vista pueda construir su respuesta de error.
+    """
+
+    def __init__(self, coleccion, error):
+        super().__init__(str(error), request=getattr(error, 'request', None),
+                         response=getattr(error, 'response', None))
+        self.coleccion = coleccion
+        self.error = error
+
+
+class Catalogo(list):
+    """
+    Lista de elementos de un catálogo tal como la devuelve el backend, con
+    un índice `por_id` (clave de normalizacion.clave_id) construido una
+    sola vez y la `version` de su contenido.
+    """
+
+    def __init__(self, elementos, version=None):
+        super().__init__(elementos)
+        self.version = version
+        self.por_id = {clave_id(elemento['id']): elemento for elemento in self}
+
+
+def url_catalogos():
+    return f'{settings.BACKEND_PROTOCOL}://{settings.BACKEND_HOST}:{settings.BACKEND_PORT}/Catalogos/'
+
+
+def endpoints():
+    """
+    URLs de cada colección según la configuración del settings.py
+    """
+    return {
+        'citas': settings.API_CITAS,
+        'profesionales': settings.API_PROFESIONALES,
+        'atletas': settings.API_ATLETAS,
+        'areas': settings.API_AREAS,
+        'consultorios': settings.API_CONSULTORIOS,
+    }
+
+
+def _crear_session():
+    """
+    Sesión con pool de conexiones persistentes (keep-alive), reintentos con
+    backoff exponencial para GET y respuestas comprimidas con gzip.
+    """
+    retry = Retry(
+        total=settings.API_REINTENTOS,
+        backoff_factor=settings.API_BACKOFF,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(
+        pool_connections=settings.API_POOL_SIZE,
+        pool_maxsize=settings.API_POOL_SIZE,
+        max_retries=retry
+    )
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({
+        'Accept': 'application/json',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+    })
+    return session
+
+
+def get_session():
+    """
+    Sesión HTTP compartida por todo el proceso. Se crea de forma perezosa
+    para que cada worker de gunicorn abra su propio pool tras el fork.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _crear_session()
+    return _session
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.API_MAX_CONCURRENCIA,
+                    thread_name_prefix='cliente-api'
+                )
+    return _executor
+
+
+def registrar_metrica(nombre, cantidad=1):
+    with _metricas_lock:
+        _metricas[nombre] += cantidad
+
+
+def metricas():
+    """
+    Contadores del cliente en este proceso: aciertos de caché, descargas
+    completas y revalidaciones condicionales (y cuántas respondieron 304).
+    """
+    with _metricas_lock:
+        return dict(_metricas)
+
+
+def campos_citas():
+    """
+    Campos que se conservan de cada cita al decodificarla, o None si se
+    conservan todos (settings.API_CITAS_PROYECCION desactivado).
+    """
+    if not settings.API_CITAS_PROYECCION:
+        return None
+    return CAMPOS_CITA + [settings.CITAS_SNAPSHOT_CAMPO]
+
+
+def _get(url, timeout, campos=None, **kwargs):
+    """
+    GET al backend. Si se van a proyectar campos el cuerpo no se descarga
+    aquí sino al decodificarlo, así que su transferencia cuenta como
+    'decodificar'; la respuesta se debe cerrar (`with response:`).
+    """
+    return get_session().get(url, timeout=timeout, stream=campos is not None, **kwargs)
+
+
+def _descargar_paginas(url, timeout):
+    """
+    Descarga una colección página por página siguiendo el enlace `next`
+    (paginación limit/offset, por número de página o por cursor). Si el
+    backend no pagina y responde con la lista completa, se usa tal cual.
+
+    Returns:
+        Coleccion: Elementos de todas las páginas, con la versión de todos
+        los cuerpos recibidos
+    """
+    elementos = []
+    resumen = hashlib.sha1()
+    siguiente = url
+    params = {'limit': settings.API_CITAS_PAGINA, 'offset': 0}
+    campos = campos_citas()
+    paginas = 0
+    while siguiente:
+        with telemetria.etapa('backend.citas'):
+            response = _get(siguiente, timeout, campos, params=params)
+        with response:
+            response.raise_for_status()
+            with telemetria.etapa('decodificar'):
+                datos = decodificacion.decodificar_respuesta(response, campos, resumen)
+        paginas += 1
+        if isinstance(datos, list):
+            elementos.extend(datos)
+            break
+
+        resultados = datos.get('results', [])
+        elementos.extend(resultados)
+        anterior, siguiente = siguiente, datos.get('next')
+        # El enlace `next` ya trae los parámetros de la página siguiente
+        params = None
+        if not resultados or siguiente == anterior:
+            break
+
+    registrar_metrica('paginas', paginas)
+    return decodificacion.Coleccion(elementos, decodificacion.version(resumen))
+
+
+def _clave_cache(url, campos):
+    # Las citas proyectadas se guardan aparte de las completas
+    return url if campos is None else f"{url}#campos={','.join(campos)}"
+
+
+def obtener_coleccion(nombre, timeout=TIMEOUT, params=None):
+    """
+    Descarga una colección del backend y devuelve el JSON decodificado,
+    pasando antes por la caché compartida entre workers.
+
+    Si la entrada en caché ya caducó pero tiene `ETag`/`Last-Modified`, se
+    hace una petición condicional; un 304 reutiliza el payload guardado.
+
+    Args:
+        nombre (str): Colección de endpoints()
+        timeout (int): Segundos por petición
+        params (dict): Parámetros de consulta; cada combinación se guarda
+            en la caché como una entrada distinta
+
+    Raises:
+        ErrorServicioExterno: Si la petición falla o responde con error
+    """
+    url = endpoints()[nombre]
+    if params:
+        url = f'{url}?{urlencode(sorted(params.items()))}'
+    paginar = nombre == 'citas' and settings.API_CITAS_PAGINA > 0
+    campos = campos_citas() if nombre == 'citas' else None
+    clave = _clave_cache(url, campos)
+
+    entrada = cache_compartida.leer(nombre, clave)
+    if cache_compartida.vigente(entrada):
+        registrar_metrica('cache_hits')
+        return cache_compartida.payload(nombre, clave, entrada)
+
+    # Las colecciones paginadas no tienen un validador único
+    headers = {} if paginar else cache_compartida.validadores(entrada)
+    if headers:
+        registrar_metrica('revalidaciones')
+
+    try:
+        if paginar:
+            payload = _descargar_paginas(url, timeout)
+            etag = last_modified = None
+        else:
+            with telemetria.etapa(f'backend.{nombre}'):
+                response = _get(url, timeout, campos, headers=headers)
+            # Con stream=True la conexión solo vuelve al pool al leer todo el
+            # cuerpo o cerrar la respuesta, también si hay un error
+            with response:
+                if response.status_code == 304 and entrada is not None:
+                    registrar_metrica('revalidaciones_304')
+                    logger.debug("Colección %s sin cambios (304), se reutiliza la caché", nombre)
+                    cache_compartida.renovar(nombre, clave, entrada)
+                    return cache_compartida.payload(nombre, clave, entrada)
+                response.raise_for_status()
+                with telemetria.etapa('decodificar'):
+                    payload = decodificacion.decodificar_respuesta(response, campos)
+                etag = response.headers.get('ETag')
+                last_modified = response.headers.get('Last-Modified')
+    except requests.exceptions.RequestException as e:
+        raise ErrorServicioExterno(nombre, e) from e
+
+    registrar_metrica('descargas_completas')
+    return cache_compartida.guardar(nombre, clave, payload, etag=etag, last_modified=last_modified)
+
+
+def descargar_citas(params, timeout=TIMEOUT):
+    """
+    Descarga citas con parámetros de consulta sin pasar por la caché
+    compartida (por ejemplo, los cambios desde una sincronización).
+
+    Raises:
+        ErrorServicioExterno: Si la petición falla o responde con error
+    """
+    url = f"{endpoints()['citas']}?{urlencode(sorted(params.items()))}"
+    try:
+        if settings.API_CITAS_PAGINA > 0:
+            return _descargar_paginas(url, timeout)
+        campos = campos_citas()
+        with telemetria.etapa('backend.citas'):
+            response = _get(url, timeout, campos)
+        with response:
+            response.raise_for_status()
+            with telemetria.etapa('decodificar'):
+                return decodificacion.decodificar_respuesta(response, campos)
+    except requests.exceptions.RequestException as e:
+        raise ErrorServicioExterno('citas', e) from e
+
+
+def parametros_citas(filtros):
+    """
+    Parámetros de consulta para pedir al backend solo las citas de un
+    reporte: rango de `creado_el` y, si settings.API_CITAS_FILTROS_ID, los
+    filtros por ID especificados.
+
+    Returns:
+        dict: Parámetros, vacío si no se deben enviar filtros
+    """
+    if not filtros or not settings.API_CITAS_FILTROS or _filtros_ignorados():
+        return {}
+    params = {
+        settings.API_CITAS_PARAM_DESDE: datetime.strptime(filtros['fecha_inicio'], '%Y-%m-%d').date().isoformat(),
+        settings.API_CITAS_PARAM_HASTA: datetime.strptime(filtros['fecha_fin'], '%Y-%m-%d').date().isoformat(),
+    }
+    if settings.API_CITAS_FILTROS_ID:
+        for dimension in DIMENSIONES:
+            if dimension in filtros and filtros[dimension] not in [None, "todos", ""]:
+                params[dimension] = str(filtros[dimension])
+    return params
+
+
+def _filtros_ignorados():
+    """
+    Indica si el backend ignoró los filtros de citas hace menos de
+    settings.API_CITAS_FILTROS_REINTENTO minutos. Pasado ese tiempo se
+    vuelven a probar, por si el backend se actualizó.
+    """
+    ignorados_el = _filtros_ignorados_el
+    if ignorados_el is None:
+        return False
+    return time.monotonic() - ignorados_el < settings.API_CITAS_FILTROS_REINTENTO * 60
+
+
+def _respeta_filtros(citas, params):
+    """
+    Indica si todas las citas recibidas cumplen los parámetros enviados.
+    Las citas sin `creado_el` válido o sin ID no sirven para comprobarlo.
+    """
+    desde = datetime.strptime(params[settings.API_CITAS_PARAM_DESDE], '%Y-%m-%d')
+    hasta = datetime.strptime(params[settings.API_CITAS_PARAM_HASTA], '%Y-%m-%d').replace(
+        hour=23, minute=59, second=59, microsecond=999999
+    )
+    criterios = [
+        (dimension, clave_id(params[dimension]))
+        for dimension in DIMENSIONES
+        if dimension in params
+    ]
+    for cita in normalizar_citas(citas):
+        if cita.creado_el is not None and not desde <= cita.creado_el <= hasta:
+            return False
+        for dimension, clave in criterios:
+            valor = getattr(cita, dimension)
+            if not id_vacio(valor) and valor != clave:
+                return False
+    return True
+
+
+def obtener_citas(filtros=None, timeout=TIMEOUT):
+    """
+    Descarga las citas necesarias para unos filtros de reporte o, si no se
+    indican o el backend no soporta filtrar, la colección completa. Con el
+    snapshot de citas activo devuelve el snapshot. Las citas devueltas se
+    deben filtrar igualmente en local.
+
+    Raises:
+        ErrorServicioExterno: Si la petición falla o responde con error
+    """
+    global _filtros_ignorados_el
+    if settings.CITAS_SNAPSHOT_INTERVALO > 0:
+        # Importación diferida: snapshot_citas descarga con este módulo
+        from . import snapshot_citas
+        return snapshot_citas.obtener_citas()
+
+    params = parametros_citas(filtros)
+    if not params:
+        return obtener_coleccion('citas', timeout)
+
+    citas = obtener_coleccion('citas', timeout, params)
+    if _respeta_filtros(citas, params):
+        registrar_metrica('descargas_filtradas')
+        return citas
+
+    logger.warning(
+        "El backend ignora los filtros de citas (%s); se vuelve a la descarga completa",
+        ', '.join(sorted(params))
+    )
+    _filtros_ignorados_el = time.monotonic()
+    return obtener_coleccion('citas', timeout)
+
+
+def obtener_catalogo(nombre, timeout=TIMEOUT):
+    """
+    Devuelve un catálogo desde la caché del proceso, descargándolo del
+    backend si no está o ya caducó.
+
+    Returns:
+        Catalogo: Lista de elementos con índice por ID
+    """
+    def cargar():
+        elementos = obtener_coleccion(nombre, timeout)
+        return Catalogo(elementos, version_datos(elementos))
+
+    return _cache_catalogos.obtener(nombre, cargar)
+
+
+def version_datos(datos):
+    """
+    Versión del contenido de una colección devuelta por este módulo. Dos
+    descargas con el mismo contenido tienen la misma versión. Las
+    colecciones descargadas ya la traen, calculada al leer la respuesta.
+    """
+    return getattr(datos, 'version', None) or cache_compartida.version(datos)
+
+
+def invalidar_catalogos(nombre=None):
+    """
+    Descarta de las cachés un catálogo, o todos si no se indica `nombre`.
+    """
+    _cache_catalogos.invalidar(nombre)
+    for catalogo in ([nombre] if nombre else CATALOGOS):
+        cache_compartida.invalidar(catalogo, endpoints()[catalogo])
+
+
+def revalidar_colecciones(nombres):
+    """
+    Hace que la próxima descarga de las colecciones (sin parámetros)
+    consulte al backend: los catálogos salen de la caché del proceso y las
+    entradas de la caché compartida se dan por caducadas, conservando sus
+    validadores para una petición condicional.
+    """
+    for nombre in nombres:
+        if nombre in CATALOGOS:
+            _cache_catalogos.invalidar(nombre)
+        campos = campos_citas() if nombre == 'citas' else None
+        cache_compartida.caducar(nombre, _clave_cache(endpoints()[nombre], campos))
+
+
+def iniciar_descargas(nombres, timeout=TIMEOUT, filtros_citas=None):
+    """
+    Lanza en paralelo la descarga de las colecciones indicadas. Los
+    catálogos que ya están en caché se resuelven sin tocar el pool. Los
+    tiempos de cada descarga cuentan para la petición en curso.
+
+    Args:
+        nombres (list): Colecciones a descargar
+        timeout (int): Segundos por petición
+        filtros_citas (dict): Filtros de reporte para pedir solo las citas
+            necesarias (ver obtener_citas)
+
+    Returns:
+        dict: Nombre de la colección -> Future con el JSON decodificado
+    """
+    executor = _get_executor()
+    futuros = {}
+    for nombre in nombres:
+        if nombre in CATALOGOS:
+            if _cache_catalogos.consultar(nombre) is not None:
+                futuro = Future()
+                futuro.set_result(obtener_catalogo(nombre, timeout))
+            else:
+                futuro = executor.submit(telemetria.en_contexto(obtener_catalogo), nombre, timeout)
+        elif nombre == 'citas':
+            futuro = executor.submit(telemetria.en_contexto(obtener_citas), filtros_citas, timeout)
+        else:
+            futuro = executor.submit(telemetria.en_contexto(obtener_coleccion), nombre, timeout)
+        futuros[nombre] = futuro
+    return futuros
+
+
+def obtener_colecciones(nombres, timeout=TIMEOUT):
+    """
+    Descarga concurrentemente las colecciones indicadas.
+
+    Los errores se reportan en el orden de `nombres`, igual que si las
+    peticiones se hubieran hecho una tras otra.
+
+    Returns:
+        dict: Nombre de la colección -> JSON decodificado
+    """
+    futuros = iniciar_descargas(nombres, timeout)
+    return {nombre: futuro.result() for nombre, futuro in futuros.items()}
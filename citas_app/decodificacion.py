@@ -0,0 +1,238 @@
+"""
+Decodificación del JSON que devuelve el backend.
+
+`loads()` usa orjson si está instalado y, si no, el módulo json de la
+biblioteca estándar; ambos devuelven los mismos objetos.
+
+`decodificar_respuesta()` decodifica una respuesta de requests. Si se le
+indican campos y el cuerpo es un arreglo, lo lee por trozos conforme llega
+y decodifica los elementos uno a uno, conservando de cada uno solo esos
+campos. Así nunca están en memoria el cuerpo completo ni los elementos
+completos, y las cachés, el snapshot y el enriquecimiento trabajan con
+diccionarios más chicos. Las respuestas que no son arreglos (por ejemplo
+una página {'results': [...]}) se decodifican completas y se proyecta su
+lista `results`.
+
+Los bytes del cuerpo se resumen con SHA-1 conforme se leen: las listas se
+devuelven como Coleccion con la `version` de su contenido, sin volver a
+serializarlas después para calcularla.
+"""
+import codecs
+import hashlib
+import json
+from json.decoder import WHITESPACE
+from json.scanner import make_scanner
+
+import requests
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Bytes por lectura del cuerpo; con trozos chicos domina el costo de cada
+# lectura de urllib3
+TROZO = 1024 * 1024
+
+# Decodifica el valor JSON que empieza en una posición de un texto
+_escanear = make_scanner(json.JSONDecoder())
+
+
+class Coleccion(list):
+    """
+    Lista decodificada de una colección con la `version` de su contenido,
+    para no volver a calcularla cada vez que se necesita.
+    """
+
+    def __init__(self, elementos, version):
+        super().__init__(elementos)
+        self.version = version
+
+
+def con_version(datos, version):
+    """
+    `datos` como Coleccion con su versión si es una lista; cualquier otro
+    documento se devuelve tal cual.
+    """
+    if isinstance(datos, list):
+        return Coleccion(datos, version)
+    return datos
+
+
+def version(resumen):
+    """
+    Versión a partir del resumen (hashlib.sha1) de uno o más cuerpos.
+    """
+    return resumen.hexdigest()[:16]
+
+
+def loads(datos):
+    """
+    Decodifica un documento JSON (bytes en UTF-8 o str).
+    """
+    if orjson is not None:
+        return orjson.loads(datos)
+    return json.loads(datos)
+
+
+def proyectar(elemento, campos):
+    """
+    Copia de `elemento` con solo los `campos` (un conjunto) que tenga.
+    """
+    if not isinstance(elemento, dict):
+        return elemento
+    return {campo: valor for campo, valor in elemento.items() if campo in campos}
+
+
+class _LectorJSON:
+    """
+    Texto de un documento JSON que llega por trozos de bytes. Solo se
+    conserva el texto desde la posición actual.
+    """
+
+    def __init__(self, trozos):
+        self._trozos = iter(trozos)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.texto = ''
+        self.pos = 0
+
+    def leer(self):
+        """
+        Agrega el siguiente trozo al texto.
+
+        Returns:
+            bool: False si ya no quedaban trozos
+        """
+        for trozo in self._trozos:
+            nuevo = self._utf8.decode(trozo)
+            if nuevo:
+                self.texto = self.texto[self.pos:] + nuevo
+                self.pos = 0
+                return True
+        self._utf8.decode(b'', final=True)
+        return False
+
+    def siguiente(self):
+        """
+        Salta los espacios y devuelve el siguiente carácter sin consumirlo
+        ('' al final del documento).
+        """
+        caracter = self.texto[self.pos:self.pos + 1]
+        if caracter and not caracter.isspace():
+            return caracter
+        while True:
+            self.pos = WHITESPACE.match(self.texto, self.pos).end()
+            if self.pos < len(self.texto):
+                return self.texto[self.pos]
+            if not self.leer():
+                return ''
+
+    def resto(self):
+        while self.leer():
+            pass
+        return self.texto[self.pos:]
+
+
+def _terminar(lector, elementos):
+    # Tras el ']' final solo pueden quedar espacios, igual que con json.loads
+    if lector.siguiente() != '':
+        raise json.JSONDecodeError("Datos adicionales tras el documento JSON", lector.texto, lector.pos)
+    return elementos
+
+
+def decodificar_por_trozos(trozos, campos):
+    """
+    Decodifica un documento JSON recibido por trozos de bytes conservando
+    solo `campos` de cada elemento de la colección.
+
+    Raises:
+        ValueError: Si el documento no es JSON válido
+    """
+    campos = frozenset(campos)
+    lector = _LectorJSON(trozos)
+    if lector.siguiente() != '[':
+        datos = loads(lector.resto())
+        if isinstance(datos, dict) and isinstance(datos.get('results'), list):
+            datos['results'] = [proyectar(elemento, campos) for elemento in datos['results']]
+        return datos
+
+    lector.pos += 1
+    elementos = []
+    if lector.siguiente() == ']':
+        lector.pos += 1
+        return _terminar(lector, elementos)
+
+    while True:
+        # Se decodifican los elementos completos del texto ya leído; uno que
+        # quedó cortado, o cuyo separador aún no llega, se vuelve a
+        # decodificar con el siguiente trozo
+        texto = lector.texto
+        pos = WHITESPACE.match(texto, lector.pos).end()
+        while True:
+            try:
+                elemento, fin = _escanear(texto, pos)
+            except (StopIteration, json.JSONDecodeError):
+                break
+            separador = texto[fin:fin + 1]
+            if separador.isspace():
+                fin = WHITESPACE.match(texto, fin).end()
+                separador = texto[fin:fin + 1]
+            if separador == ',':
+                elementos.append(proyectar(elemento, campos))
+                pos = WHITESPACE.match(texto, fin + 1).end()
+            elif separador == ']':
+                elementos.append(proyectar(elemento, campos))
+                lector.pos = fin + 1
+                return _terminar(lector, elementos)
+            elif separador and isinstance(elemento, (dict, list, str)):
+                raise json.JSONDecodeError("Se esperaba ',' o ']'", texto, fin)
+            else:
+                # Fin del texto, o un número o literal que puede estar
+                # cortado ('2.' de '2.5')
+                break
+        lector.pos = pos
+        if not lector.leer():
+            raise json.JSONDecodeError("Documento JSON incompleto o inválido", lector.texto, lector.pos)
+
+
+def _resumir(trozos, resumen):
+    for trozo in trozos:
+        resumen.update(trozo)
+        yield trozo
+
+
+def decodificar_respuesta(response, campos=None, resumen=None):
+    """
+    JSON del cuerpo de una respuesta de requests. Para leer el cuerpo
+    conforme llega, la petición se debe hacer con stream=True.
+
+    Args:
+        response (requests.Response): Respuesta del backend
+        campos (list): Campos que se conservan de cada elemento, o None
+            para decodificar el documento completo
+        resumen: hashlib.sha1 al que se agregan los bytes del cuerpo, para
+            versionar juntas varias páginas; por defecto uno nuevo
+
+    Returns:
+        El documento decodificado; si es una lista, como Coleccion con la
+        versión del resumen
+
+    Raises:
+        requests.exceptions.JSONDecodeError: Si el cuerpo no es JSON válido
+            (una RequestException, igual que con response.json())
+    """
+    if resumen is None:
+        resumen = hashlib.sha1()
+    try:
+        if campos is None:
+            contenido = response.content
+            resumen.update(contenido)
+            datos = loads(contenido)
+        else:
+            datos = decodificar_por_trozos(_resumir(response.iter_content(TROZO), resumen), campos)
+    except json.JSONDecodeError as e:
+        # orjson.JSONDecodeError también es un json.JSONDecodeError
+        raise requests.exceptions.JSONDecodeError(e.msg, e.doc, e.pos, response=response) from e
+    except ValueError as e:
+        raise requests.exceptions.JSONDecodeError(str(e), '', 0, response=response) from e
+    return con_version(datos, version(resumen))
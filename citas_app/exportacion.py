@@ -0,0 +1,100 @@
+"""
+Exportación de citas filtradas a CSV y XLSX.
+
+El CSV se genera como un iterador de bloques de texto: cada cita se
+enriquece y se escribe justo antes de enviarse, así que la memoria no
+depende del número de filas y el primer byte sale en cuanto se conocen
+las citas filtradas.
+
+XLSX es un ZIP y no se puede enviar mientras se escribe; se genera con
+openpyxl en modo `write_only` (memoria constante) en un archivo temporal
+que después se envía por bloques. openpyxl es opcional: sin él solo está
+disponible CSV.
+"""
+import csv
+import logging
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+logger = logging.getLogger(__name__)
+
+# (encabezado, campo de la cita enriquecida)
+COLUMNAS = [
+    ('ID', 'id'),
+    ('Fecha', 'fecha_formateada'),
+    ('Hora', 'hora_formateada'),
+    ('Atleta', 'atleta_nombre'),
+    ('Profesional', 'profesional_nombre'),
+    ('Especialidad', 'profesional_especialidad'),
+    ('Área', 'area_nombre'),
+    ('Consultorio', 'consultorio_nombre'),
+    ('Estado', 'estado'),
+]
+
+FILAS_POR_BLOQUE = 500
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def formatos_disponibles():
+    return ['csv', 'xlsx'] if Workbook is not None else ['csv']
+
+
+def fila(cita):
+    return ['' if cita.get(campo) is None else cita.get(campo) for _, campo in COLUMNAS]
+
+
+class _Bufer:
+    """
+    Destino de csv.writer que devuelve la línea escrita en lugar de
+    guardarla.
+    """
+
+    def write(self, valor):
+        return valor
+
+
+def csv_por_bloques(citas):
+    """
+    Genera el CSV en bloques de FILAS_POR_BLOQUE filas.
+
+    Args:
+        citas (iterable): Citas enriquecidas; puede ser un generador
+
+    Yields:
+        str: Texto del bloque
+    """
+    escritor = csv.writer(_Bufer())
+    # BOM para que Excel detecte UTF-8 al abrir el archivo
+    bloque = ['\ufeff' + escritor.writerow([encabezado for encabezado, _ in COLUMNAS])]
+    for cita in citas:
+        bloque.append(escritor.writerow(fila(cita)))
+        if len(bloque) >= FILAS_POR_BLOQUE:
+            yield ''.join(bloque)
+            bloque = []
+    if bloque:
+        yield ''.join(bloque)
+
+
+def escribir_xlsx(citas, destino):
+    """
+    Escribe las citas en un libro XLSX de una hoja.
+
+    Args:
+        citas (iterable): Citas enriquecidas; puede ser un generador
+        destino (file): Archivo binario
+    """
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Citas')
+    hoja.append([encabezado for encabezado, _ in COLUMNAS])
+    for cita in citas:
+        hoja.append(fila(cita))
+    libro.save(destino)
+    destino.seek(0)
+    return destino
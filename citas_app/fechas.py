@@ -0,0 +1,127 @@
+"""
+Parseo de las marcas de tiempo que devuelve el backend de citas.
+
+Las funciones están memorizadas: una misma cadena se parsea una sola vez
+por proceso y cualquier consumidor posterior (estadísticas, filtrado,
+enriquecimiento) reutiliza el resultado. El caso habitual, ISO-8601 con
+`Z` u offset, se resuelve con una expresión regular y construyendo el
+datetime directamente; el resto pasa por la lista de formatos de siempre.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+CACHE_MAX = 131072
+
+# Lista de formatos posibles, en el orden en que se prueban
+FORMATOS = [
+    '%Y-%m-%dT%H:%M:%S.%f%z',     # Con zona horaria: 2025-08-13T16:52:14.298714-06:00
+    '%Y-%m-%dT%H:%M:%S%z',        # Sin microsegundos, con zona: 2025-08-13T16:52:14-06:00
+    '%Y-%m-%dT%H:%M:%S.%fZ',      # Con Z: 2025-08-13T16:52:14.298714Z
+    '%Y-%m-%dT%H:%M:%SZ',         # Sin microsegundos, con Z: 2025-08-13T16:52:14Z
+    '%Y-%m-%dT%H:%M:%S.%f',       # Sin zona horaria: 2025-08-13T16:52:14.298714
+    '%Y-%m-%dT%H:%M:%S'           # Básico: 2025-08-13T16:52:14
+]
+
+# Formato con el que el backend serializa `creado_el`
+FORMATO_CREADO_EL = '%Y-%m-%dT%H:%M:%S.%fZ'
+
+_ISO = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})'
+    r'(?:\.(\d{1,6}))?'
+    r'(Z|[+-]\d{2}:?\d{2})?',
+    re.ASCII
+)
+_CREADO_EL = re.compile(
+    r'(\d{4})-(\d{2})-(\d{2})T(\d{2}):(\d{2}):(\d{2})\.(\d{1,6})Z',
+    re.ASCII
+)
+
+
+@lru_cache(maxsize=64)
+def _zona(offset):
+    if offset == 'Z':
+        return timezone.utc
+    signo = -1 if offset[0] == '-' else 1
+    horas, minutos = int(offset[1:3]), int(offset[-2:])
+    return timezone(signo * timedelta(hours=horas, minutes=minutos))
+
+
+def _microsegundos(fraccion):
+    return int(fraccion.ljust(6, '0')) if fraccion else 0
+
+
+def parse_fecha_formatos(date_string):
+    """
+    Parseo probando cada formato de FORMATOS y, si ninguno aplica,
+    datetime.fromisoformat. Es el camino lento; se usa como respaldo.
+    """
+    if not date_string:
+        return None
+
+    for fmt in FORMATOS:
+        try:
+            return datetime.strptime(date_string, fmt)
+        except ValueError:
+            continue
+
+    # Si ningún formato funciona, intentar con fromisoformat
+    try:
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00'))
+    except ValueError:
+        logger.warning(f"No se pudo parsear la fecha: {date_string}")
+        return None
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def parse_fecha(date_string):
+    """
+    Parsea una fecha en cualquiera de los formatos aceptados por el backend.
+
+    Devuelve un datetime con zona horaria si la cadena la incluye (`Z` u
+    offset) y sin ella en caso contrario, o None si no se puede parsear.
+    """
+    if not date_string:
+        return None
+
+    m = _ISO.fullmatch(date_string)
+    if m:
+        year, month, day, hour, minute, second, fraccion, offset = m.groups()
+        try:
+            return datetime(
+                int(year), int(month), int(day),
+                int(hour), int(minute), int(second),
+                _microsegundos(fraccion),
+                _zona(offset) if offset else None
+            )
+        except ValueError:
+            pass
+
+    return parse_fecha_formatos(date_string)
+
+
+@lru_cache(maxsize=CACHE_MAX)
+def parse_creado_el(date_string):
+    """
+    Parsea `creado_el` con el formato estricto FORMATO_CREADO_EL y
+    devuelve un datetime sin zona horaria.
+
+    Raises:
+        ValueError: Si la cadena no tiene ese formato
+    """
+    m = _CREADO_EL.fullmatch(date_string)
+    if m:
+        year, month, day, hour, minute, second, fraccion = m.groups()
+        try:
+            return datetime(
+                int(year), int(month), int(day),
+                int(hour), int(minute), int(second),
+                _microsegundos(fraccion)
+            )
+        except ValueError:
+            pass
+
+    return datetime.strptime(date_string, FORMATO_CREADO_EL)
@@ -0,0 +1,99 @@
+"""
+Índices en memoria sobre las citas normalizadas para el filtrado de reportes.
+
+Se construyen una vez por snapshot de citas: un arreglo ordenado por
+`creado_el` para resolver rangos de fechas con bisect y, por cada
+dimensión (atleta, área, consultorio, profesional), listas de posiciones
+por ID. Un reporte se resuelve con un corte por fechas y la intersección
+de esas listas en lugar de recorrer todas las citas.
+"""
+from bisect import bisect_left, bisect_right
+import logging
+import threading
+
+from .normalizacion import id_vacio
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONES = ['atleta_id', 'area_id', 'consultorio_id', 'profesional_id']
+
+_ultimo_indice = (None, None)
+_indice_lock = threading.Lock()
+
+
+class IndiceCitas:
+    """
+    Índice de fechas y de IDs sobre una lista de CitaNormalizada.
+
+    Las citas sin `creado_el` válido no se indexan, igual que el filtrado
+    por fechas las descarta.
+    """
+
+    def __init__(self, citas):
+        posiciones = [i for i, cita in enumerate(citas) if cita.creado_el is not None]
+        posiciones.sort(key=lambda i: citas[i].creado_el)
+
+        self.citas = [citas[i] for i in posiciones]
+        self.orden_original = posiciones
+        self.fechas = [cita.creado_el for cita in self.citas]
+
+        self.por_dimension = {dimension: {} for dimension in DIMENSIONES}
+        for posicion, cita in enumerate(self.citas):
+            for dimension in DIMENSIONES:
+                clave = getattr(cita, dimension)
+                if not id_vacio(clave):
+                    self.por_dimension[dimension].setdefault(clave, []).append(posicion)
+
+        descartadas = len(citas) - len(self.citas)
+        if descartadas:
+            logger.warning("%d citas sin fecha de creación válida quedan fuera del índice", descartadas)
+
+    def consultar(self, fecha_inicio, fecha_fin, criterios=()):
+        """
+        Citas con `creado_el` entre ambas fechas (inclusive) que cumplen
+        todos los criterios, en el orden original de la lista.
+
+        Args:
+            fecha_inicio, fecha_fin (datetime): Rango de fechas
+            criterios (list): Tuplas (dimensión, clave de ID)
+        """
+        inicio = bisect_left(self.fechas, fecha_inicio)
+        fin = bisect_right(self.fechas, fecha_fin)
+        if inicio >= fin:
+            return []
+
+        if not criterios:
+            posiciones = range(inicio, fin)
+        else:
+            # Las posiciones están ordenadas por fecha: cada lista se recorta
+            # al rango con bisect y la más corta guía la intersección
+            listas = []
+            for dimension, clave in criterios:
+                lista = self.por_dimension[dimension].get(clave, [])
+                listas.append(lista[bisect_left(lista, inicio):bisect_left(lista, fin)])
+            listas.sort(key=len)
+
+            posiciones = set(listas[0])
+            for lista in listas[1:]:
+                if not posiciones:
+                    break
+                posiciones.intersection_update(lista)
+
+        resultado = sorted(posiciones, key=self.orden_original.__getitem__)
+        return [self.citas[posicion] for posicion in resultado]
+
+
+def indice_citas(citas):
+    """
+    Índice de una lista de citas normalizadas. Solo se reconstruye cuando
+    cambia la lista (es decir, cuando cambia el snapshot de citas).
+    """
+    global _ultimo_indice
+    origen, indice = _ultimo_indice
+    if origen is citas:
+        return indice
+
+    indice = IndiceCitas(citas)
+    with _indice_lock:
+        _ultimo_indice = (citas, indice)
+    return indice
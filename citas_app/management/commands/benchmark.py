@@ -0,0 +1,90 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from citas_app.benchmarks import BENCHMARKS
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = 'Ejecuta los micro-benchmarks de citas_app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nombres', nargs='*', help=f"Benchmarks a ejecutar ({', '.join(BENCHMARKS)})")
+        parser.add_argument('--n', type=int, help='Número de elementos por caso')
+        parser.add_argument('--repeticiones', type=int, help='Repeticiones por caso (por defecto, las de cada benchmark)')
+        parser.add_argument('--json', metavar='ARCHIVO', help='Guarda los resultados en un archivo JSON')
+        parser.add_argument('--comparar', metavar='ARCHIVO', help='JSON de una ejecución anterior con el cual comparar cada caso')
+
+    def handle(self, *args, **options):
+        nombres = options['nombres'] or list(BENCHMARKS)
+        desconocidos = [nombre for nombre in nombres if nombre not in BENCHMARKS]
+        if desconocidos:
+            raise CommandError(f"Benchmarks desconocidos: {', '.join(desconocidos)}")
+
+        anteriores = {}
+        if options['comparar']:
+            try:
+                with open(options['comparar'], encoding='utf-8') as archivo:
+                    anterior = json.load(archivo)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer {options['comparar']}: {e}")
+            anteriores = {
+                (nombre, fila['caso'], fila['n']): fila
+                for nombre, filas in anterior['benchmarks'].items()
+                for fila in filas
+            }
+
+        resultados = {}
+        for nombre in nombres:
+            kwargs = {}
+            if options['repeticiones']:
+                kwargs['repeticiones'] = options['repeticiones']
+            if options['n']:
+                kwargs['n'] = options['n']
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'== {nombre}'))
+            resultados[nombre] = BENCHMARKS[nombre](**kwargs)
+            for fila in resultados[nombre]:
+                linea = (
+                    f"{fila['caso']:<40} n={fila['n']:<9} "
+                    f"{fila['segundos']:>10.4f} s  {fila['us_por_elemento']:>9.3f} us/elem"
+                )
+                if 'p95_ms' in fila:
+                    linea += (
+                        f"  p50={fila['p50_ms']:.1f} p95={fila['p95_ms']:.1f} p99={fila['p99_ms']:.1f} ms"
+                        f"  {fila['peticiones_por_segundo']:>8.2f} req/s"
+                    )
+                if 'memoria_mb' in fila:
+                    linea += f"  {fila['memoria_mb']:>9.2f} MB"
+                anterior = anteriores.get((nombre, fila['caso'], fila['n']))
+                if anterior and anterior['segundos']:
+                    cambio = (fila['segundos'] / anterior['segundos'] - 1) * 100
+                    linea += f"  {cambio:+.1f}% vs {anterior['segundos']:.4f} s"
+                self.stdout.write(linea)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as archivo:
+                json.dump({
+                    'fecha': timezone.now().isoformat(),
+                    'commit': _commit(),
+                    'python': platform.python_version(),
+                    'plataforma': platform.platform(),
+                    'n': options['n'],
+                    'repeticiones': options['repeticiones'],
+                    'benchmarks': resultados,
+                }, archivo, ensure_ascii=False, indent=2)
+            self.stdout.write(f"Resultados guardados en {options['json']}")
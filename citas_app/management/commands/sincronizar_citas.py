@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from citas_app.almacen_local import sincronizar
+from citas_app.cliente_api import ErrorServicioExterno
+
+
+class Command(BaseCommand):
+    help = 'Copia las citas y los catálogos del backend en las tablas locales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=int, default=30, help='Segundos por petición al backend')
+
+    def handle(self, *args, **options):
+        try:
+            resultado = sincronizar(timeout=options['timeout'])
+        except ErrorServicioExterno as e:
+            raise CommandError(f"No se pudo descargar {e.coleccion}: {e}")
+
+        for nombre, elementos in resultado.items():
+            self.stdout.write(f"{nombre:<15} {elementos:>9}")
+        self.stdout.write(self.style.SUCCESS('Tablas locales sincronizadas'))
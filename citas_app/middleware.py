@@ -0,0 +1,52 @@
+import json
+import logging
+import time
+
+from . import telemetria
+
+logger = logging.getLogger('citas_app.telemetria')
+
+
+class TelemetriaMiddleware:
+    """
+    Registra los tiempos por etapa de cada petición (ver telemetria) y los
+    envía en la cabecera `Server-Timing` y en una línea de log JSON. El
+    tiempo total se acumula además en el histograma `vista.<nombre>`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        tiempos, token = telemetria.iniciar_peticion()
+        inicio = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            telemetria.terminar_peticion(token)
+        total_ms = (time.perf_counter() - inicio) * 1000
+
+        vista = self._nombre_vista(request)
+        if vista:
+            telemetria.observar(f'vista.{vista}', total_ms)
+
+        etapas = dict(tiempos.etapas)
+        response['Server-Timing'] = ', '.join(
+            [f'{nombre};dur={ms:.1f}' for nombre, ms in etapas.items()]
+            + [f'total;dur={total_ms:.1f}']
+        )
+        logger.info(json.dumps({
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'total_ms': round(total_ms, 1),
+            'etapas_ms': {nombre: round(ms, 1) for nombre, ms in etapas.items()},
+        }))
+        return response
+
+    def _nombre_vista(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        return getattr(match.func, 'view_class', match.func).__name__
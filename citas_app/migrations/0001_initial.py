@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 02:15
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoReporte',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('completado', 'Completado'), ('error', 'Error')], db_index=True, default='pendiente', max_length=20)),
+                ('filtros', models.JSONField()),
+                ('archivo', models.CharField(blank=True, max_length=500)),
+                ('nombre_archivo', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('creado_el', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('iniciado_el', models.DateTimeField(blank=True, null=True)),
+                ('terminado_el', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['-creado_el'],
+            },
+        ),
+    ]
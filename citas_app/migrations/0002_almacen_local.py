@@ -0,0 +1,94 @@
+# Generated by Django 5.2 on 2026-10-17 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Area',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(db_index=True, max_length=64, null=True)),
+                ('orden', models.PositiveIntegerField()),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'ordering': ['orden'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Atleta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(db_index=True, max_length=64, null=True)),
+                ('orden', models.PositiveIntegerField()),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'ordering': ['orden'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Consultorio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(db_index=True, max_length=64, null=True)),
+                ('orden', models.PositiveIntegerField()),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'ordering': ['orden'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='ProfesionalSalud',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(db_index=True, max_length=64, null=True)),
+                ('orden', models.PositiveIntegerField()),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'ordering': ['orden'],
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='Sincronizacion',
+            fields=[
+                ('coleccion', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('version', models.CharField(max_length=64)),
+                ('elementos', models.PositiveIntegerField()),
+                ('sincronizado_el', models.DateTimeField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Cita',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('id_externo', models.CharField(max_length=64, null=True)),
+                ('orden', models.PositiveIntegerField()),
+                ('creado_el', models.DateTimeField(null=True)),
+                ('mes', models.IntegerField(null=True)),
+                ('estado_clave', models.CharField(blank=True, max_length=50)),
+                ('atleta_id', models.CharField(max_length=64, null=True)),
+                ('area_id', models.CharField(max_length=64, null=True)),
+                ('consultorio_id', models.CharField(max_length=64, null=True)),
+                ('profesional_id', models.CharField(max_length=64, null=True)),
+                ('datos', models.JSONField()),
+            ],
+            options={
+                'ordering': ['orden'],
+                'indexes': [models.Index(fields=['creado_el'], name='citas_app_c_creado__e76b32_idx'), models.Index(fields=['mes'], name='citas_app_c_mes_7099e3_idx'), models.Index(fields=['area_id'], name='citas_app_c_area_id_0f87e0_idx'), models.Index(fields=['profesional_id'], name='citas_app_c_profesi_169399_idx'), models.Index(fields=['atleta_id'], name='citas_app_c_atleta__24512b_idx'), models.Index(fields=['consultorio_id'], name='citas_app_c_consult_51cd42_idx'), models.Index(fields=['estado_clave'], name='citas_app_c_estado__51b4cd_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2 on 2026-10-17 03:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('citas_app', '0002_almacen_local'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='area',
+            name='id_externo',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='atleta',
+            name='id_externo',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='area_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='atleta_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='consultorio_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='estado_clave',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='id_externo',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='cita',
+            name='profesional_id',
+            field=models.TextField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='consultorio',
+            name='id_externo',
+            field=models.TextField(db_index=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='profesionalsalud',
+            name='id_externo',
+            field=models.TextField(db_index=True, null=True),
+        ),
+    ]
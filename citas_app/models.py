@@ -1,3 +1,124 @@
+import uuid
+
 from django.db import models
 
-# Create your models here.
+
+class TrabajoReporte(models.Model):
+    """
+    Reporte PDF generado en segundo plano. El archivo se guarda en
+    settings.REPORTES_DIR y se descarga una vez completado.
+    """
+    PENDIENTE = 'pendiente'
+    PROCESANDO = 'procesando'
+    COMPLETADO = 'completado'
+    ERROR = 'error'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (PROCESANDO, 'Procesando'),
+        (COMPLETADO, 'Completado'),
+        (ERROR, 'Error'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE, db_index=True)
+    filtros = models.JSONField()
+    archivo = models.CharField(max_length=500, blank=True)
+    nombre_archivo = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    creado_el = models.DateTimeField(auto_now_add=True, db_index=True)
+    iniciado_el = models.DateTimeField(null=True, blank=True)
+    terminado_el = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-creado_el']
+
+    def __str__(self):
+        return f"Reporte {self.id} ({self.estado})"
+
+
+class ElementoCatalogo(models.Model):
+    """
+    Elemento de un catálogo del backend copiado en la base de datos local.
+    `datos` guarda el JSON original y `orden` la posición en que lo devolvió
+    el backend, para responder igual que con la descarga directa.
+    """
+    id_externo = models.TextField(null=True, db_index=True)
+    orden = models.PositiveIntegerField()
+    datos = models.JSONField()
+
+    class Meta:
+        abstract = True
+        ordering = ['orden']
+
+    def __str__(self):
+        return f"{self.id_externo} {self.datos.get('nombre', '')}"
+
+
+class Atleta(ElementoCatalogo):
+    pass
+
+
+class Area(ElementoCatalogo):
+    pass
+
+
+class Consultorio(ElementoCatalogo):
+    pass
+
+
+class ProfesionalSalud(ElementoCatalogo):
+    pass
+
+
+class Cita(models.Model):
+    """
+    Cita del backend copiada en la base de datos local, con las columnas
+    normalizadas (ver normalizacion.CitaNormalizada) por las que filtran
+    los reportes y agrupan las estadísticas.
+
+    Los IDs se guardan como texto: dos IDs son el mismo si coincide su
+    `str()`. `mes` es year * 12 + month - 1 de la fecha de la cita, en la
+    zona horaria con que la envió el backend. Los IDs y el estado son
+    TextField porque el backend no acota su longitud: con un límite, un
+    solo valor demasiado largo haría fallar toda la sincronización en
+    PostgreSQL.
+    """
+    id_externo = models.TextField(null=True)
+    orden = models.PositiveIntegerField()
+    creado_el = models.DateTimeField(null=True)
+    mes = models.IntegerField(null=True)
+    estado_clave = models.TextField(blank=True)
+    atleta_id = models.TextField(null=True)
+    area_id = models.TextField(null=True)
+    consultorio_id = models.TextField(null=True)
+    profesional_id = models.TextField(null=True)
+    datos = models.JSONField()
+
+    class Meta:
+        ordering = ['orden']
+        indexes = [
+            models.Index(fields=['creado_el']),
+            models.Index(fields=['mes']),
+            models.Index(fields=['area_id']),
+            models.Index(fields=['profesional_id']),
+            models.Index(fields=['atleta_id']),
+            models.Index(fields=['consultorio_id']),
+            models.Index(fields=['estado_clave']),
+        ]
+
+    def __str__(self):
+        return f"Cita {self.id_externo} ({self.estado_clave})"
+
+
+class Sincronizacion(models.Model):
+    """
+    Versión de cada colección copiada en las tablas locales en la última
+    sincronización.
+    """
+    coleccion = models.CharField(max_length=50, primary_key=True)
+    version = models.CharField(max_length=64)
+    elementos = models.PositiveIntegerField()
+    sincronizado_el = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.coleccion} ({self.sincronizado_el})"
@@ -0,0 +1,161 @@
+"""
+Normalización de las citas que devuelve el backend.
+
+Cada cita se convierte una sola vez en un CitaNormalizada: los IDs de
+atleta, área, consultorio y profesional se resuelven a partir de los
+distintos nombres de campo que puede usar el backend, las fechas se parsean
+(en su propia etapa de telemetria, 'fechas') y el estado se interna.
+Filtrado, enriquecimiento y estadísticas trabajan sobre estos registros en
+lugar de volver a inspeccionar cada diccionario.
+"""
+import logging
+import sys
+import threading
+
+from . import telemetria
+from .fechas import parse_creado_el, parse_fecha
+
+logger = logging.getLogger(__name__)
+
+# Campos en los que puede venir cada ID, en orden de preferencia
+CAMPOS_ATLETA = ['atleta_id', 'atleta', 'id_atleta', 'paciente_id', 'paciente']
+CAMPOS_AREA = ['area_id', 'area', 'id_area']
+CAMPOS_CONSULTORIO = ['consultorio_id', 'consultorio', 'id_consultorio']
+CAMPOS_PROFESIONAL = ['profesional_salud_id', 'profesional_salud', 'profesional_id', 'profesional', 'id_profesional']
+
+# Campos de una cita que usa el servicio
+CAMPOS_CITA = ['id', 'fecha', 'creado_el', 'estado'] + CAMPOS_ATLETA + CAMPOS_AREA + CAMPOS_CONSULTORIO + CAMPOS_PROFESIONAL
+
+_ultima_normalizacion = (None, None)
+_normalizacion_lock = threading.Lock()
+
+
+def clave_id(valor):
+    """
+    Clave comparable de un ID: entero si su representación de texto es un
+    entero canónico ('7', 7) y texto en cualquier otro caso ('007', 'a1').
+
+    Dos valores tienen la misma clave si y solo si `str()` de ambos
+    coincide, así que comparar claves equivale a comparar `str(id)` sin
+    construir cadenas en cada comparación.
+    """
+    if valor is None:
+        return None
+    if type(valor) is int:
+        return valor
+    texto = str(valor)
+    try:
+        numero = int(texto)
+    except ValueError:
+        return texto
+    return numero if str(numero) == texto else texto
+
+
+def id_vacio(clave):
+    return clave is None or clave == ''
+
+
+def resolver_id(cita, campos):
+    """
+    Clave del primer campo presente y no nulo de `campos`, aceptando tanto
+    IDs directos como diccionarios con `id`.
+    """
+    for campo in campos:
+        valor = cita.get(campo)
+        if valor is None:
+            continue
+        if isinstance(valor, dict) and 'id' in valor:
+            return clave_id(valor['id'])
+        return clave_id(valor)
+    return None
+
+
+def fechas_cita(cita):
+    """
+    Fechas parseadas de una cita: `fecha` (o, si falta, `creado_el`) con el
+    parseo flexible y `creado_el` con el formato estricto.
+
+    Returns:
+        tuple: (fecha, creado_el), cada una datetime o None
+    """
+    fecha = cita.get('fecha', cita.get('creado_el', ''))
+    fecha = parse_fecha(fecha) if isinstance(fecha, str) else None
+    try:
+        creado_el = parse_creado_el(cita['creado_el'])
+    except (KeyError, TypeError, ValueError):
+        creado_el = None
+    return fecha, creado_el
+
+
+def _intern(valor):
+    return sys.intern(valor) if isinstance(valor, str) else valor
+
+
+class CitaNormalizada:
+    """
+    Representación compacta de una cita.
+
+    Attributes:
+        id: ID de la cita tal como lo envía el backend
+        fecha: Fecha de la cita (`fecha` o, si falta, `creado_el`), con o sin zona
+        creado_el: `creado_el` parseado con el formato estricto, sin zona, o None
+        estado: Estado tal como lo envía el backend
+        estado_clave: Estado en minúsculas, para agrupar
+        atleta_id, area_id, consultorio_id, profesional_id: Claves de clave_id()
+        datos: Diccionario original de la cita
+    """
+
+    __slots__ = (
+        'id', 'fecha', 'creado_el', 'estado', 'estado_clave',
+        'atleta_id', 'area_id', 'consultorio_id', 'profesional_id', 'datos'
+    )
+
+    def __init__(self, cita, fechas=None):
+        """
+        Args:
+            cita (dict): Cita del backend
+            fechas (tuple): Resultado de fechas_cita(cita), si ya se calculó
+        """
+        self.datos = cita
+        self.id = cita.get('id')
+        self.fecha, self.creado_el = fechas_cita(cita) if fechas is None else fechas
+
+        estado = cita.get('estado', '')
+        self.estado = _intern(estado)
+        self.estado_clave = _intern(estado.lower()) if isinstance(estado, str) else ''
+
+        self.atleta_id = resolver_id(cita, CAMPOS_ATLETA)
+        self.area_id = resolver_id(cita, CAMPOS_AREA)
+        self.consultorio_id = resolver_id(cita, CAMPOS_CONSULTORIO)
+        self.profesional_id = resolver_id(cita, CAMPOS_PROFESIONAL)
+
+
+def normalizar_citas(citas):
+    """
+    Normaliza una lista de citas del backend.
+
+    Si se recibe la misma lista que en la llamada anterior (por ejemplo, el
+    payload reutilizado desde la caché) o una lista que ya trae sus citas
+    normalizadas (el snapshot de citas), se devuelven esos registros sin
+    volver a procesarla.
+
+    Returns:
+        list: Lista de CitaNormalizada
+    """
+    global _ultima_normalizacion
+    normalizadas = getattr(citas, 'normalizadas', None)
+    if normalizadas is not None:
+        return normalizadas
+
+    origen, normalizadas = _ultima_normalizacion
+    if origen is citas:
+        return normalizadas
+
+    # Las fechas se parsean en su propia etapa para medirlas por separado
+    with telemetria.etapa('fechas'):
+        fechas_parseadas = [fechas_cita(cita) for cita in citas]
+    with telemetria.etapa('normalizar'):
+        normalizadas = [CitaNormalizada(cita, fechas) for cita, fechas in zip(citas, fechas_parseadas)]
+    with _normalizacion_lock:
+        _ultima_normalizacion = (citas, normalizadas)
+    return normalizadas
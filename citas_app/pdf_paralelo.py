@@ -0,0 +1,145 @@
+"""
+Renderizado en paralelo de reportes PDF grandes.
+
+`doc.build` de ReportLab usa un solo núcleo. Para reportes con muchas
+filas, el detalle se reparte en rangos consecutivos de filas: el proceso
+de la petición renderiza el encabezado, el resumen y el primer rango,
+mientras un pool de procesos renderiza el resto. Las partes se unen con
+pypdf en el orden original; cada parte empieza en una página nueva.
+
+Los workers solo usan ReportLab (no Django), así que el pool se crea con
+el método `spawn` y no hereda los hilos ni las conexiones del proceso.
+Si pypdf no está instalado, REPORTES_PROCESOS es 0 o el reporte no llega
+a dos partes de REPORTES_PARALELO_MIN_FILAS filas, se renderiza en serie.
+"""
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor
+import io
+import logging
+import multiprocessing
+import threading
+
+from django.conf import settings
+
+from .plantilla_pdf import documento, elementos_pie
+from .tablas_pdf import detalle_filas
+
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def renderizar_detalle(filas, filas_por_tabla, umbral_canvas, con_pie):
+    """
+    PDF con solo un rango de filas del detalle (y el pie si es la última
+    parte). Se ejecuta en los procesos del pool.
+
+    Returns:
+        bytes: Contenido del PDF
+    """
+    salida = io.BytesIO()
+    elementos = detalle_filas(filas, filas_por_tabla, umbral_canvas)
+    if con_pie:
+        elementos.extend(elementos_pie())
+    documento(salida).build(elementos)
+    return salida.getvalue()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.REPORTES_PROCESOS,
+                    mp_context=multiprocessing.get_context('spawn')
+                )
+    return _executor
+
+
+def rangos(n_filas):
+    """
+    Rangos (inicio, fin) de filas en que se reparte el detalle: uno para el
+    proceso de la petición y uno por cada worker. Lista vacía si el
+    reporte debe renderizarse en serie.
+    """
+    if PdfWriter is None or settings.REPORTES_PROCESOS <= 0:
+        return []
+    # Cada parte tiene al menos REPORTES_PARALELO_MIN_FILAS filas (y al
+    # menos una)
+    partes = min(settings.REPORTES_PROCESOS + 1, n_filas // max(settings.REPORTES_PARALELO_MIN_FILAS, 1))
+    if partes < 2:
+        return []
+
+    tamaño, resto = divmod(n_filas, partes)
+    resultado = []
+    inicio = 0
+    for i in range(partes):
+        fin = inicio + tamaño + (1 if i < resto else 0)
+        resultado.append((inicio, fin))
+        inicio = fin
+    return resultado
+
+
+def _descartar_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iniciar_partes(filas, rangos_filas, filas_por_tabla, umbral_canvas):
+    """
+    Envía al pool todos los rangos menos el primero.
+
+    Returns:
+        list: Tuplas (executor, future o None, argumentos de
+        renderizar_detalle), en orden
+    """
+    ultimo = len(rangos_filas) - 1
+    partes = [
+        (filas[inicio:fin], filas_por_tabla, umbral_canvas, i == ultimo)
+        for i, (inicio, fin) in enumerate(rangos_filas)
+        if i > 0
+    ]
+    executor = _get_executor()
+    try:
+        return [
+            (executor, executor.submit(renderizar_detalle, *argumentos), argumentos)
+            for argumentos in partes
+        ]
+    except BrokenExecutor as e:
+        logger.warning("Pool de procesos de reportes no disponible, se renderiza en serie: %s", str(e))
+        _descartar_executor(executor)
+        return [(executor, None, argumentos) for argumentos in partes]
+
+
+def _contenido(executor, futuro, argumentos):
+    """
+    Bytes de una parte. Si el pool se rompió (por ejemplo, un worker
+    terminado por falta de memoria) la parte se renderiza en este proceso.
+    """
+    if futuro is not None:
+        try:
+            return futuro.result()
+        except BrokenExecutor as e:
+            logger.warning("Parte de reporte renderizada en serie tras fallar el pool: %s", str(e))
+            _descartar_executor(executor)
+    return renderizar_detalle(*argumentos)
+
+
+def unir(primera, partes, destino):
+    """
+    Escribe en `destino` la primera parte seguida de las partes del pool.
+    """
+    escritor = PdfWriter()
+    escritor.append(primera)
+    for executor, futuro, argumentos in partes:
+        escritor.append(io.BytesIO(_contenido(executor, futuro, argumentos)))
+    escritor.write(destino)
@@ -0,0 +1,99 @@
+"""
+Plantilla de los reportes PDF de citas.
+
+Estilos de párrafo, colores, estilos de tabla y los párrafos de texto fijo
+se construyen una sola vez al importar el módulo; cada reporte solo crea
+los elementos que dependen de los datos.
+
+Los estilos (ParagraphStyle, TableStyle, colores) solo se leen al
+renderizar, así que se comparten entre hilos. Los flowables no: ReportLab
+les asigna tamaño y canvas mientras los dibuja. Por eso `fijo()` devuelve
+una copia superficial del prototipo, que comparte el texto ya parseado y
+guarda su propio layout.
+"""
+import copy
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, TableStyle
+
+# Estilos de párrafo
+ESTILOS = getSampleStyleSheet()
+ESTILO_TITULO = ESTILOS['Heading1']
+ESTILO_SUBTITULO = ESTILOS['Heading2']
+ESTILO_NORMAL = ESTILOS['Normal']
+ESTILO_PEQUEÑO = ESTILOS['BodyText']
+
+# Colores
+COLOR_ENCABEZADO = colors.HexColor('#3B82F6')
+COLOR_FONDO_RESUMEN = colors.HexColor('#EFF6FF')
+COLOR_REJILLA_RESUMEN = colors.HexColor('#BFDBFE')
+COLOR_REJILLA = colors.HexColor('#E5E7EB')
+
+# Tabla "Resumen Estadístico"
+ENCABEZADOS_RESUMEN = ["Total", "Completadas", "Pendientes", "Canceladas", "Confirmadas"]
+ANCHOS_RESUMEN = [1.0*inch, 1.0*inch, 1.0*inch, 1.0*inch, 1.0*inch]
+ESTILO_RESUMEN = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), COLOR_ENCABEZADO),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 10),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), COLOR_FONDO_RESUMEN),
+    ('GRID', (0, 0), (-1, -1), 1, COLOR_REJILLA_RESUMEN),
+])
+
+# Tabla "Detalle de Citas"
+ENCABEZADOS_DETALLE = ["Fecha", "Hora", "Atleta", "Profesional", "Consultorio", "Estado"]
+ANCHOS_DETALLE = [0.8*inch, 0.7*inch, 1.5*inch, 1.5*inch, 1.2*inch, 0.9*inch]
+ESTILO_DETALLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), COLOR_ENCABEZADO),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+    ('GRID', (0, 0), (-1, -1), 1, COLOR_REJILLA),
+    ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+])
+
+PIE = "Este reporte fue generado automáticamente por el Sistema de Gestión de Citas Médicas."
+
+_PROTOTIPOS = {
+    'titulo': Paragraph("Reporte de Citas Médicas", ESTILO_TITULO),
+    'filtros': Paragraph("Filtros Aplicados:", ESTILO_SUBTITULO),
+    'resumen': Paragraph("Resumen Estadístico:", ESTILO_SUBTITULO),
+    'detalle': Paragraph("Detalle de Citas:", ESTILO_SUBTITULO),
+    'sin_citas': Paragraph("No se encontraron citas que cumplan con los criterios de filtrado.", ESTILO_NORMAL),
+    'pie': Paragraph(PIE, ESTILO_PEQUEÑO),
+}
+
+
+def fijo(nombre):
+    """
+    Copia de uno de los párrafos de texto fijo, lista para añadirse a un
+    documento.
+    """
+    return copy.copy(_PROTOTIPOS[nombre])
+
+
+def documento(destino):
+    """
+    SimpleDocTemplate con el tamaño de página y márgenes de los reportes.
+    """
+    return SimpleDocTemplate(
+        destino,
+        pagesize=letter,
+        rightMargin=30,
+        leftMargin=30,
+        topMargin=30,
+        bottomMargin=30
+    )
+
+
+def elementos_pie():
+    return [Spacer(1, 0.25*inch), fijo('pie')]
@@ -1,6 +1,35 @@
+from django.urls import reverse
 from rest_framework import serializers
 
+from .models import TrabajoReporte
+
 class CitaSerializer(serializers.Serializer):
     estado = serializers.CharField()
     creado_el = serializers.DateTimeField()
-    # Agrega otros campos que necesites
\ No newline at end of file
+    # Agrega otros campos que necesites
+
+
+class TrabajoReporteSerializer(serializers.ModelSerializer):
+    estado_url = serializers.SerializerMethodField()
+    descarga_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = TrabajoReporte
+        fields = [
+            'id', 'estado', 'filtros', 'error',
+            'creado_el', 'iniciado_el', 'terminado_el',
+            'estado_url', 'descarga_url'
+        ]
+
+    def _url(self, nombre, trabajo):
+        url = reverse(nombre, args=[trabajo.id])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_estado_url(self, trabajo):
+        return self._url('estado-reporte', trabajo)
+
+    def get_descarga_url(self, trabajo):
+        if trabajo.estado != TrabajoReporte.COMPLETADO:
+            return None
+        return self._url('descargar-reporte', trabajo)
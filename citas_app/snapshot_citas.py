@@ -0,0 +1,240 @@
+"""
+Snapshot local de citas sincronizado de forma incremental.
+
+Con settings.CITAS_SNAPSHOT_INTERVALO > 0 cada proceso mantiene en memoria
+todas las citas y un hilo en segundo plano las actualiza pidiendo al
+backend solo las citas cuyo settings.CITAS_SNAPSHOT_CAMPO es igual o
+posterior a la marca de la última sincronización. Los cambios se combinan
+por ID con el snapshot anterior y solo las citas nuevas o modificadas se
+vuelven a normalizar. Las vistas leen el snapshot publicado sin esperar
+al backend.
+
+Las eliminaciones (y, si el campo es `creado_el`, las modificaciones) no
+aparecen en los cambios, así que cada settings.CITAS_SNAPSHOT_COMPLETA
+segundos se recarga la colección completa. Si el backend ignora el
+parámetro y devuelve citas anteriores a la marca, la respuesta se toma
+como la colección completa.
+"""
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+from . import acumulados
+from .cliente_api import descargar_citas, obtener_coleccion, registrar_metrica, version_datos
+from .normalizacion import CitaNormalizada, clave_id
+
+logger = logging.getLogger(__name__)
+
+_hilo = None
+_hilo_lock = threading.Lock()
+
+
+class CitasSnapshot(list):
+    """
+    Lista de citas tal como las devuelve el backend, con su `version` y las
+    citas ya normalizadas (`normalizadas`, en el mismo orden), que
+    normalizar_citas reutiliza. No se modifica una vez publicada.
+    """
+
+    def __init__(self, citas, normalizadas, version):
+        super().__init__(citas)
+        self.normalizadas = normalizadas
+        self.version = version
+
+
+def _clave(cita, posicion):
+    clave = clave_id(cita.get('id'))
+    # Las citas sin ID no se pueden combinar con cambios posteriores; solo
+    # entran con las cargas completas
+    return ('sin_id', posicion) if clave is None else clave
+
+
+def _marca(citas, anterior=None):
+    """
+    Mayor valor de settings.CITAS_SNAPSHOT_CAMPO entre las citas. Las
+    fechas ISO del backend tienen el mismo formato, así que se comparan
+    como texto.
+    """
+    marca = anterior
+    for cita in citas:
+        valor = cita.get(settings.CITAS_SNAPSHOT_CAMPO)
+        if isinstance(valor, str) and (marca is None or valor > marca):
+            marca = valor
+    return marca
+
+
+class Snapshot:
+    """
+    Estado del snapshot de un proceso. Las sincronizaciones se serializan
+    con un lock; las lecturas solo toman la referencia publicada.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._por_id = {}
+        self.citas = None
+        self.marca = None
+        self.sincronizado_el = None
+        self.completo_el = None
+
+    def _publicar(self, version):
+        entradas = list(self._por_id.values())
+        self.citas = CitasSnapshot(
+            [cita for cita, _ in entradas],
+            [normalizada for _, normalizada in entradas],
+            version
+        )
+
+    def _cargar_completo(self, citas):
+        self._por_id = {
+            _clave(cita, posicion): (cita, CitaNormalizada(cita))
+            for posicion, cita in enumerate(citas)
+        }
+        self.marca = _marca(citas)
+        self.completo_el = time.time()
+        self._publicar(version_datos(citas))
+        registrar_metrica('snapshot_completos')
+        logger.info("Snapshot de citas cargado completo: %d citas", len(self.citas))
+
+    def _aplicar_cambios(self, cambios, version_cambios):
+        quitadas = []
+        agregadas = []
+        for cita in cambios:
+            # Los cambios llegan siempre con ID (ver _sincronizar)
+            clave = clave_id(cita.get('id'))
+            anterior = self._por_id.get(clave)
+            if anterior is not None:
+                quitadas.append(anterior[1])
+            normalizada = CitaNormalizada(cita)
+            agregadas.append(normalizada)
+            self._por_id[clave] = (cita, normalizada)
+        self.marca = _marca(cambios, self.marca)
+        version = hashlib.sha1(
+            f'{self.citas.version}:{version_cambios}'.encode('utf-8')
+        ).hexdigest()[:16]
+        anteriores = self.citas.normalizadas
+        self._publicar(version)
+        # Los acumulados por mes se actualizan solo con las citas cambiadas
+        acumulados.aplicar_cambios(anteriores, self.citas.normalizadas, quitadas, agregadas)
+        registrar_metrica('snapshot_cambios', len(cambios))
+        logger.info("Snapshot de citas actualizado con %d cambios", len(cambios))
+
+    def _requiere_completo(self):
+        if self.citas is None or self.marca is None:
+            return True
+        return time.time() - self.completo_el >= settings.CITAS_SNAPSHOT_COMPLETA
+
+    def sincronizar(self, completo=False):
+        """
+        Descarga los cambios desde la última marca (o la colección completa
+        si toca) y publica el nuevo snapshot.
+
+        Raises:
+            ErrorServicioExterno: Si falla la descarga
+        """
+        with self._lock:
+            self._sincronizar(completo)
+
+    def _sincronizar(self, completo):
+        if completo or self._requiere_completo():
+            self._cargar_completo(obtener_coleccion('citas'))
+        else:
+            cambios = descargar_citas({settings.API_CITAS_PARAM_CAMBIOS: self.marca})
+            if any(
+                isinstance(cita.get(settings.CITAS_SNAPSHOT_CAMPO), str)
+                and cita[settings.CITAS_SNAPSHOT_CAMPO] < self.marca
+                for cita in cambios
+            ):
+                logger.warning(
+                    "El backend ignora %s; la respuesta se usa como colección completa",
+                    settings.API_CITAS_PARAM_CAMBIOS
+                )
+                self._cargar_completo(cambios)
+            else:
+                version_cambios = version_datos(cambios)
+                # La marca es inclusiva: las citas de la marca anterior
+                # vuelven a llegar aunque no hayan cambiado. Las citas sin
+                # ID se agregarían de nuevo en cada sincronización, así que
+                # se dejan para la próxima carga completa
+                nuevas = []
+                sin_id = 0
+                for cita in cambios:
+                    clave = clave_id(cita.get('id'))
+                    if clave is None:
+                        sin_id += 1
+                    elif self._por_id.get(clave, (None,))[0] != cita:
+                        nuevas.append(cita)
+                if sin_id:
+                    logger.warning("Se omiten %d cambios de citas sin ID hasta la próxima carga completa", sin_id)
+                if nuevas:
+                    self._aplicar_cambios(nuevas, version_cambios)
+        self.sincronizado_el = time.time()
+
+    def obtener(self):
+        """
+        Citas del snapshot publicado; la primera vez se cargan aquí.
+
+        Returns:
+            CitasSnapshot: Lista de citas
+        """
+        if self.citas is None:
+            with self._lock:
+                if self.citas is None:
+                    self._sincronizar(completo=True)
+        return self.citas
+
+    def estado(self):
+        citas = self.citas
+        return {
+            'citas': len(citas) if citas is not None else 0,
+            'version': citas.version if citas is not None else None,
+            'marca': self.marca,
+            'sincronizado_el': self.sincronizado_el,
+            'completo_el': self.completo_el,
+        }
+
+
+_snapshot = Snapshot()
+
+
+def _refrescar():
+    while True:
+        time.sleep(settings.CITAS_SNAPSHOT_INTERVALO)
+        try:
+            _snapshot.sincronizar()
+        except Exception as e:
+            # Se sigue sirviendo el último snapshot hasta el próximo intento
+            logger.warning("No se pudo sincronizar el snapshot de citas: %s", str(e))
+
+
+def _iniciar_hilo():
+    """
+    Arranca el hilo de sincronización de este proceso. Se crea de forma
+    perezosa para que cada worker de gunicorn tenga el suyo tras el fork.
+    """
+    global _hilo
+    if _hilo is None:
+        with _hilo_lock:
+            if _hilo is None:
+                _hilo = threading.Thread(target=_refrescar, name='snapshot-citas', daemon=True)
+                _hilo.start()
+
+
+def obtener_citas():
+    """
+    Citas del snapshot local, iniciando la sincronización en segundo plano
+    si aún no está en marcha.
+    """
+    _iniciar_hilo()
+    return _snapshot.obtener()
+
+
+def estado():
+    """
+    Tamaño, versión, marca y momento (epoch) de la última sincronización y
+    de la última carga completa del snapshot de este proceso.
+    """
+    return _snapshot.estado()
@@ -0,0 +1,165 @@
+"""
+Tabla "Detalle de Citas" de los reportes PDF.
+
+Una sola Table de ReportLab con todas las citas se vuelve muy costosa en
+reportes grandes: cada vez que se parte entre páginas se vuelve a medir y
+copiar el resto de la tabla. Por eso el detalle se divide en tablas de
+settings.REPORTES_FILAS_POR_TABLA filas, cada una con su encabezado.
+
+A partir de settings.REPORTES_CANVAS_UMBRAL filas se usa TablaDetalleCanvas,
+que dibuja las filas directamente en el canvas con la misma geometría que
+la Table (filas de altura fija, texto centrado en una línea), sin crear
+celdas ni estilos por fila.
+"""
+from functools import lru_cache
+
+from reportlab.lib import colors
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.platypus import Flowable, Table
+
+from .plantilla_pdf import (
+    ANCHOS_DETALLE, COLOR_ENCABEZADO, COLOR_REJILLA, ENCABEZADOS_DETALLE, ESTILO_DETALLE
+)
+
+# Geometría de las filas de una Table con ESTILO_DETALLE: altura de la fila
+# y posición de la línea base del texto desde el borde inferior
+ALTO_ENCABEZADO = 27
+BASE_ENCABEZADO = 16
+ALTO_FILA = 18
+BASE_FILA = 7
+TAMAÑO_FUENTE = 8
+
+
+@lru_cache(maxsize=65536)
+def _ancho(texto):
+    # Nombres, fechas, horas y estados se repiten mucho entre filas
+    return stringWidth(texto, 'Helvetica', TAMAÑO_FUENTE)
+
+
+def filas_detalle(citas):
+    """
+    Filas de la tabla de detalle a partir de las citas enriquecidas.
+    """
+    return [
+        [
+            cita.get('fecha_formateada', 'No especificada'),
+            cita.get('hora_formateada', 'No especificada'),
+            cita.get('atleta_nombre', 'No especificado'),
+            cita.get('profesional_nombre', 'No especificado'),
+            cita.get('consultorio_nombre', 'No especificado'),
+            cita.get('estado', 'Desconocido')
+        ]
+        for cita in citas
+    ]
+
+
+def tablas_detalle(filas, filas_por_tabla):
+    """
+    Tablas de como máximo `filas_por_tabla` filas, cada una con el
+    encabezado, que juntas muestran todas las filas.
+
+    Returns:
+        list: Flowables para añadir al documento
+    """
+    filas_por_tabla = max(filas_por_tabla, 1)
+    tablas = []
+    for inicio in range(0, len(filas), filas_por_tabla):
+        tabla = Table(
+            [ENCABEZADOS_DETALLE] + filas[inicio:inicio + filas_por_tabla],
+            colWidths=ANCHOS_DETALLE,
+            repeatRows=1
+        )
+        tabla.setStyle(ESTILO_DETALLE)
+        tablas.append(tabla)
+    return tablas
+
+
+class TablaDetalleCanvas(Flowable):
+    """
+    Tabla de detalle dibujada directamente en el canvas.
+
+    Al partirse entre páginas solo se calcula cuántas filas caben; las
+    partes comparten la lista de filas y se distinguen por el rango
+    [inicio, fin).
+    """
+
+    def __init__(self, filas, inicio=0, fin=None):
+        super().__init__()
+        self.filas = filas
+        self.inicio = inicio
+        self.fin = len(filas) if fin is None else fin
+        self.hAlign = 'CENTER'
+        self.width = sum(ANCHOS_DETALLE)
+
+    def _alto(self, n_filas):
+        return ALTO_ENCABEZADO + n_filas * ALTO_FILA
+
+    def wrap(self, availWidth, availHeight):
+        self.height = self._alto(self.fin - self.inicio)
+        return self.width, self.height
+
+    def split(self, availWidth, availHeight):
+        caben = int((availHeight - ALTO_ENCABEZADO) // ALTO_FILA)
+        if caben <= 0:
+            return []
+        if self.inicio + caben >= self.fin:
+            return [self]
+        corte = self.inicio + caben
+        return [
+            TablaDetalleCanvas(self.filas, self.inicio, corte),
+            TablaDetalleCanvas(self.filas, corte, self.fin),
+        ]
+
+    def draw(self):
+        canv = self.canv
+        centros = []
+        x = 0
+        for ancho in ANCHOS_DETALLE:
+            centros.append(x + ancho / 2.0)
+            x += ancho
+        alto = self._alto(self.fin - self.inicio)
+
+        # Encabezado
+        y = alto - ALTO_ENCABEZADO
+        canv.setFillColor(COLOR_ENCABEZADO)
+        canv.rect(0, y, self.width, ALTO_ENCABEZADO, stroke=0, fill=1)
+        canv.setFillColor(colors.whitesmoke)
+        canv.setFont('Helvetica-Bold', TAMAÑO_FUENTE)
+        for centro, texto in zip(centros, ENCABEZADOS_DETALLE):
+            canv.drawCentredString(centro, y + BASE_ENCABEZADO, texto)
+
+        # Filas: un solo objeto de texto para toda la parte, en lugar de uno
+        # por celda como drawCentredString
+        texto_pdf = canv.beginText()
+        texto_pdf.setFont('Helvetica', TAMAÑO_FUENTE)
+        texto_pdf.setFillColor(colors.black)
+        for fila in self.filas[self.inicio:self.fin]:
+            y -= ALTO_FILA
+            for centro, texto in zip(centros, fila):
+                texto = '' if texto is None else str(texto)
+                texto_pdf.setTextOrigin(centro - _ancho(texto) / 2.0, y + BASE_FILA)
+                texto_pdf.textLine(texto)
+        canv.drawText(texto_pdf)
+
+        # Rejilla
+        canv.setStrokeColor(COLOR_REJILLA)
+        canv.setLineWidth(1)
+        lineas = [(0, alto, self.width, alto)]
+        for i in range(self.fin - self.inicio + 1):
+            y_linea = i * ALTO_FILA
+            lineas.append((0, y_linea, self.width, y_linea))
+        x = 0
+        for ancho in [0] + ANCHOS_DETALLE:
+            x += ancho
+            lineas.append((x, 0, x, alto))
+        canv.lines(lineas)
+
+
+def detalle_filas(filas, filas_por_tabla, umbral_canvas=0):
+    """
+    Flowables de la tabla de detalle: tablas por bloques o, si hay más de
+    `umbral_canvas` filas (y el umbral no es 0), una TablaDetalleCanvas.
+    """
+    if umbral_canvas and len(filas) > umbral_canvas:
+        return [TablaDetalleCanvas(filas)]
+    return tablas_detalle(filas, filas_por_tabla)
@@ -0,0 +1,153 @@
+"""
+Respuesta precalculada del tablero de estadísticas.
+
+Con settings.ESTADISTICAS_INTERVALO > 0 cada proceso guarda la última
+respuesta de EstadisticasCitasView y un hilo en segundo plano la vuelve a
+calcular cada ESTADISTICAS_INTERVALO segundos, así que una petición solo
+lee la respuesta guardada y no espera al backend. Si un cálculo en segundo
+plano falla se sigue sirviendo la respuesta anterior; el momento en que
+se calculó se informa en la respuesta. La primera petición del proceso, y
+las que piden una respuesta nueva, calculan en el momento, salvo que ya
+haya un cálculo en curso: entonces esperan su resultado.
+
+Una respuesta nueva (forzada) tampoco sale de las cachés de descargas:
+antes de calcularla se revalidan las colecciones con el backend. Con las
+tablas locales o el snapshot de citas activos se usan sus datos tal cual,
+que ya se sincronizan en segundo plano.
+
+Está desactivado por defecto: cada proceso consultaría el backend cada
+ESTADISTICAS_INTERVALO segundos aunque no reciba peticiones.
+"""
+from datetime import datetime
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import almacen_local, telemetria
+from .agregaciones import crear_agregador
+from .agregaciones_orm import AgregadorCitasORM
+from .cliente_api import obtener_colecciones, revalidar_colecciones
+from .models import Cita
+from .normalizacion import normalizar_citas
+
+logger = logging.getLogger(__name__)
+
+COLECCIONES = ['citas', 'profesionales', 'atletas', 'areas']
+
+# (respuesta, momento en que se calculó)
+_respuesta = None
+_calculo_lock = threading.Lock()
+_hilo = None
+_hilo_lock = threading.Lock()
+
+
+def calcular():
+    """
+    Calcula la respuesta del tablero desde las tablas locales o el backend.
+
+    Raises:
+        requests.exceptions.RequestException: Si falla la descarga
+    """
+    ahora = datetime.now()
+    if almacen_local.activo():
+        # 1-2. Contadores con consultas agregadas sobre las tablas locales
+        with telemetria.etapa('agregar'):
+            agregador = AgregadorCitasORM(ahora.month, ahora.year).agregar(Cita.objects.all())
+        todos_profesionales = almacen_local.catalogo('profesionales')
+        todos_atletas = almacen_local.catalogo('atletas')
+        todas_areas = almacen_local.catalogo('areas')
+    else:
+        # 1. Obtener citas, profesionales, atletas y áreas en paralelo
+        logger.info(f"Consultando citas en: {settings.API_CITAS}")
+        colecciones = obtener_colecciones(COLECCIONES)
+        todas_citas = colecciones['citas']
+        todos_profesionales = colecciones['profesionales']
+        todos_atletas = colecciones['atletas']
+        todas_areas = colecciones['areas']
+
+        # 2. Acumular contadores en una sola pasada sobre las citas
+        agregador = crear_agregador(ahora.month, ahora.year)
+        normalizadas = normalizar_citas(todas_citas)
+        with telemetria.etapa('agregar'):
+            agregador.agregar(normalizadas)
+
+    return agregador.construir_respuesta(
+        todos_profesionales,
+        todos_atletas,
+        todas_areas
+    )
+
+
+def _calcular(forzar):
+    # Las tablas locales se sincronizan por su cuenta; las descargas se
+    # revalidan con el backend para no leer las cachés
+    if forzar and not almacen_local.activo():
+        revalidar_colecciones(COLECCIONES)
+    return calcular()
+
+
+def _actualizar(forzar=False):
+    global _respuesta
+    _respuesta = (_calcular(forzar), timezone.now())
+    return _respuesta
+
+
+def _refrescar():
+    while True:
+        time.sleep(settings.ESTADISTICAS_INTERVALO)
+        try:
+            with _calculo_lock:
+                _actualizar()
+        except Exception as e:
+            logger.warning("No se pudo actualizar el tablero precalculado: %s", str(e))
+
+
+def _iniciar_hilo():
+    """
+    Arranca el hilo de actualización de este proceso. Se crea de forma
+    perezosa para que cada worker de gunicorn tenga el suyo tras el fork.
+    """
+    global _hilo
+    if _hilo is None:
+        with _hilo_lock:
+            if _hilo is None:
+                _hilo = threading.Thread(target=_refrescar, name='tablero', daemon=True)
+                _hilo.start()
+
+
+def obtener(forzar=False):
+    """
+    Respuesta del tablero: la precalculada o, si no hay, se pide una nueva
+    o el precálculo está desactivado, una calculada en el momento. Con
+    `forzar` los datos se revalidan con el backend en lugar de leerse de
+    las cachés de descargas.
+
+    Returns:
+        tuple: (respuesta, datetime en que se calculó)
+    """
+    if settings.ESTADISTICAS_INTERVALO <= 0:
+        return _calcular(forzar), timezone.now()
+
+    _iniciar_hilo()
+    respuesta = _respuesta
+    if respuesta is not None and not forzar:
+        return respuesta
+
+    with _calculo_lock:
+        # Si mientras se esperaba el lock terminó otro cálculo (del hilo o de
+        # otra petición), se usa ese en lugar de repetirlo
+        if _respuesta is not respuesta and _respuesta is not None:
+            return _respuesta
+        return _actualizar(forzar)
+
+
+def descartar():
+    """
+    Descarta la respuesta precalculada; la próxima petición la calcula.
+    """
+    global _respuesta
+    with _calculo_lock:
+        _respuesta = None
@@ -0,0 +1,163 @@
+"""
+Tiempos por etapa de cada petición.
+
+Las etapas del camino caliente (descarga de cada colección del backend,
+decodificación del JSON, parseo de fechas, normalización, filtrado,
+enriquecimiento, agregación y generación del PDF) se miden con `etapa()`.
+Cada duración se suma a un histograma del proceso y, si hay una petición
+en curso, a los tiempos de esa petición, que TelemetriaMiddleware envía
+en la cabecera `Server-Timing` y en una línea de log JSON.
+
+La petición en curso se guarda en una ContextVar. Las tareas enviadas a un
+pool de hilos solo la ven si se ejecutan con `en_contexto()`.
+"""
+from bisect import bisect_left
+from contextlib import contextmanager
+import contextvars
+import threading
+import time
+
+# Límites superiores de los buckets de los histogramas, en milisegundos
+LIMITES_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+_peticion = contextvars.ContextVar('telemetria_peticion', default=None)
+
+_histogramas = {}
+_histogramas_lock = threading.Lock()
+
+
+class Histograma:
+    """
+    Conteo de duraciones por bucket de LIMITES_MS (más uno para las que
+    superan el último límite), con su número, su suma y su máximo.
+    """
+
+    def __init__(self):
+        self.buckets = [0] * (len(LIMITES_MS) + 1)
+        self.n = 0
+        self.suma_ms = 0.0
+        self.max_ms = 0.0
+
+    def observar(self, ms):
+        self.buckets[bisect_left(LIMITES_MS, ms)] += 1
+        self.n += 1
+        self.suma_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentil(self, p):
+        """
+        Estimación del percentil `p` (0-100): interpolación lineal dentro
+        del bucket que lo contiene, sin pasar de la mayor duración
+        observada. None si no hay observaciones.
+        """
+        if not self.n:
+            return None
+        objetivo = self.n * p / 100.0
+        acumulado = 0
+        inferior = 0.0
+        superiores = LIMITES_MS + (max(self.max_ms, LIMITES_MS[-1]),)
+        for superior, cuenta in zip(superiores, self.buckets):
+            if cuenta and acumulado + cuenta >= objetivo:
+                valor = inferior + (superior - inferior) * (objetivo - acumulado) / cuenta
+                return round(min(valor, self.max_ms), 3)
+            acumulado += cuenta
+            inferior = superior
+        return round(self.max_ms, 3)
+
+    def resumen(self):
+        return {
+            'n': self.n,
+            'media_ms': round(self.suma_ms / self.n, 3) if self.n else None,
+            'max_ms': round(self.max_ms, 3) if self.n else None,
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'buckets': {
+                f'<={limite}': cuenta
+                for limite, cuenta in zip(LIMITES_MS, self.buckets)
+            } | {f'>{LIMITES_MS[-1]}': self.buckets[-1]},
+        }
+
+
+class TiemposPeticion:
+    """
+    Duraciones de las etapas de una petición, sumadas por nombre y en el
+    orden en que aparecieron. Las pueden registrar varios hilos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.etapas = {}
+
+    def sumar(self, nombre, ms):
+        with self._lock:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + ms
+
+
+def observar(nombre, ms):
+    """
+    Registra una duración en el histograma `nombre` y en la petición en
+    curso, si la hay.
+    """
+    with _histogramas_lock:
+        histograma = _histogramas.get(nombre)
+        if histograma is None:
+            histograma = _histogramas[nombre] = Histograma()
+        histograma.observar(ms)
+    tiempos = _peticion.get()
+    if tiempos is not None:
+        tiempos.sumar(nombre, ms)
+
+
+@contextmanager
+def etapa(nombre):
+    """
+    Mide el bloque como la etapa `nombre`.
+    """
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar(nombre, (time.perf_counter() - inicio) * 1000)
+
+
+def iniciar_peticion():
+    """
+    Empieza a registrar los tiempos de una petición en este contexto.
+
+    Returns:
+        tuple: (TiemposPeticion, token para terminar_peticion)
+    """
+    tiempos = TiemposPeticion()
+    return tiempos, _peticion.set(tiempos)
+
+
+def terminar_peticion(token):
+    _peticion.reset(token)
+
+
+def en_contexto(funcion):
+    """
+    Envuelve `funcion` para ejecutarla en otro hilo con el contexto actual,
+    de modo que sus etapas cuenten para la petición en curso.
+    """
+    contexto = contextvars.copy_context()
+
+    def ejecutar(*args, **kwargs):
+        return contexto.run(funcion, *args, **kwargs)
+
+    return ejecutar
+
+
+def histogramas():
+    """
+    Resumen de los histogramas del proceso, por nombre de etapa.
+    """
+    with _histogramas_lock:
+        return {nombre: histograma.resumen() for nombre, histograma in sorted(_histogramas.items())}
+
+
+def reiniciar():
+    with _histogramas_lock:
+        _histogramas.clear()
@@ -1,3 +1,1105 @@
-from django.test import TestCase
+import csv
+from datetime import datetime, timedelta
+import io
+import json
+import os
+import random
+import tempfile
+import threading
+from unittest import mock, skipIf
 
-# Create your tests here.
+import requests
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import (
+    acumulados, almacen_local, cache_local, cache_reportes, cliente_api, decodificacion, exportacion, pdf_paralelo,
+    snapshot_citas, tablas_pdf, tablero, telemetria, trabajos
+)
+from .acumulados import AgregadorCitasAcumulados
+from .agregaciones import AgregadorCitas, crear_agregador
+from .agregaciones_orm import AgregadorCitasORM
+from .almacen_local import _fila_cita
+from .backend_simulado import BackendSimulado
+from .benchmarks import colecciones_sinteticas
+from .indices import DIMENSIONES, IndiceCitas
+from .models import Atleta, Cita, TrabajoReporte
+from .normalizacion import CitaNormalizada, clave_id, normalizar_citas
+from .views import GenerarReportePDFView
+
+try:
+    from .agregaciones_numpy import AgregadorCitasNumpy
+except ImportError:
+    AgregadorCitasNumpy = None
+
+MES, AÑO = 3, 2025
+
+PROFESIONALES = [{'id': 1, 'nombre': 'Ana', 'apPaterno': 'Ruiz'}, {'id': 2, 'nombre': 'Luis', 'apPaterno': 'Paz'}]
+ATLETAS = [{'id': 10, 'nombre': 'Eva', 'apPaterno': 'Sol'}, {'id': 11, 'nombre': 'Iván', 'apPaterno': 'Mar'}]
+AREAS = [{'id': 5, 'nombre': 'Fisioterapia'}, {'id': 6, 'nombre': 'Nutrición'}]
+
+
+def _cita(id, **campos):
+    return dict({'id': id, 'fecha': '2025-03-10T10:00:00Z', 'creado_el': '2025-03-01T09:00:00.000000Z', 'estado': 'Pendiente'}, **campos)
+
+
+class ResolucionAliasEstadisticasTests(SimpleTestCase):
+    """
+    Las estadísticas resuelven los IDs con la misma regla que el filtrado
+    y el enriquecimiento: el primer alias no nulo, empezando por el campo
+    *_id canónico.
+    """
+
+    def _estadisticas(self, citas):
+        agregador = AgregadorCitas(MES, AÑO)
+        agregador.agregar(normalizar_citas(citas))
+        return agregador.construir_respuesta(PROFESIONALES, ATLETAS, AREAS)
+
+    def test_alias_cuentan_en_todos_los_campos(self):
+        datos = self._estadisticas([
+            _cita(1, profesional_salud_id=1, atleta_id=10, area_id=5),
+            _cita(2, profesional_salud=2, atleta=11, area=6),
+            _cita(3, profesional_id={'id': 2}, paciente_id=11, id_area=6),
+            _cita(4, profesional_salud_id=None, profesional=1, atleta_id=None, id_atleta=10, area_id=None, area={'id': 5}),
+        ])
+
+        self.assertEqual({p['id']: p['total'] for p in datos['profesionales_data']}, {'1': 2, '2': 2})
+        self.assertEqual({a['id']: a['total'] for a in datos['top_atletas']}, {'10': 2, '11': 2})
+        self.assertEqual({a['id']: (a['total'], a['pendiente']) for a in datos['areas_data']}, {'5': (2, 2), '6': (2, 2)})
+
+        marzo = next(m for m in datos['monthly_data_by_profesional'] if m['mes_numero'] == MES and m['ano'] == AÑO)
+        self.assertEqual({p['profesional_id']: p['count'] for p in marzo['profesionales']}, {1: 2, 2: 2})
+        marzo = next(m for m in datos['monthly_data_by_area'] if m['mes_numero'] == MES and m['ano'] == AÑO)
+        self.assertEqual({a['area_id']: a['count'] for a in marzo['areas']}, {5: 2, 6: 2})
+
+    def test_ids_equivalen_por_su_texto(self):
+        datos = self._estadisticas([
+            _cita(1, profesional_salud_id='1', atleta_id='10', area_id=5),
+            _cita(2, profesional_salud_id='01', atleta_id=10.0, area_id='5'),
+        ])
+
+        self.assertEqual({p['id']: p['total'] for p in datos['profesionales_data']}, {'1': 1, '2': 0})
+        self.assertEqual({a['id']: a['total'] for a in datos['top_atletas']}, {'10': 1, '11': 0})
+        self.assertEqual({a['id']: a['total'] for a in datos['areas_data']}, {'5': 2, '6': 0})
+
+
+def _sin_fecha(id, **campos):
+    cita = _cita(id, **campos)
+    del cita['fecha']
+    return cita
+
+
+# Citas con alias nulos, IDs en distintos formatos, fechas mal formadas o
+# ausentes y citas fuera de la ventana de meses
+CITAS_BACKENDS = [
+    _cita(1, profesional_salud_id=1, atleta_id=10, area_id=5, estado='Completada'),
+    _cita(2, profesional_salud_id=None, profesional_salud=2, atleta=None, paciente=11, area_id=None, id_area=6, estado='cancelada'),
+    _cita(3, fecha='no es una fecha', profesional_salud_id=1, atleta_id=10, area_id=5),
+    _cita(4, fecha=None, profesional_salud_id=2, atleta_id=11, area_id=6),
+    _sin_fecha(5, creado_el='2025-02-11T08:00:00.000000Z', profesional_salud_id='2', atleta_id='11', area={'id': 6}),
+    _sin_fecha(6, creado_el='11/02/2025', profesional_salud_id=1, atleta_id=10, area_id=5),
+    _cita(7, fecha='2025-03-31T23:30:00-06:00', profesional_id={'id': '1'}, atleta_id=10, area_id='5', estado='Confirmada'),
+    _cita(8, fecha='2024-03-15T10:00:00Z', profesional_salud_id=1, atleta_id=10, area_id=5),
+    _cita(9, estado=None, profesional_salud_id='01', atleta_id='007', area_id=99),
+    _cita(None, creado_el='mal', profesional_salud_id=None, atleta_id=None, area_id=None),
+    _cita(11, fecha='2024-12-02T10:00:00', profesional=2, id_atleta=11, area=5, estado='Pendiente'),
+]
+
+
+class EquivalenciaBackendsEstadisticasTests(TestCase):
+    """
+    Todos los backends de estadísticas dan la misma respuesta que
+    AgregadorCitas sobre las mismas citas.
+    """
+
+    def _respuesta(self, agregador, citas):
+        return agregador(MES, AÑO).agregar(citas).construir_respuesta(PROFESIONALES, ATLETAS, AREAS)
+
+    def test_backends_equivalentes(self):
+        citas = list(CITAS_BACKENDS)
+        normalizadas = normalizar_citas(citas)
+        referencia = self._respuesta(AgregadorCitas, normalizadas)
+        self.assertEqual(referencia['total_citas'], 5)
+        Cita.objects.bulk_create(_fila_cita(orden, cita) for orden, cita in enumerate(citas))
+
+        backends = [
+            ('acumulados', AgregadorCitasAcumulados, normalizadas),
+            ('orm', AgregadorCitasORM, Cita.objects.all()),
+        ]
+        if AgregadorCitasNumpy is not None:
+            backends.append(('numpy', AgregadorCitasNumpy, normalizadas))
+
+        for nombre, agregador, entrada in backends:
+            with self.subTest(backend=nombre):
+                self.assertEqual(self._respuesta(agregador, entrada), referencia)
+
+    @skipIf(AgregadorCitasNumpy is None, 'NumPy no está instalado')
+    def test_numpy_sin_citas(self):
+        self.assertEqual(self._respuesta(AgregadorCitasNumpy, []), self._respuesta(AgregadorCitas, []))
+
+    def test_acumulados_tras_aplicar_cambios(self):
+        anteriores = [CitaNormalizada(cita) for cita in CITAS_BACKENDS]
+        acumulados.acumulados_citas(anteriores)
+
+        # Cita 1 modificada, cita 3 eliminada y una cita nueva sin fecha válida
+        modificada = CitaNormalizada(dict(CITAS_BACKENDS[0], estado='Cancelada', area_id=6, atleta_id=11))
+        nueva = CitaNormalizada(_cita(12, fecha='31-03-2025', profesional_salud_id=2, atleta_id=10, area_id=5))
+        nuevas = [modificada] + [c for c in anteriores[1:] if c.id != 3] + [nueva]
+        acumulados.aplicar_cambios(anteriores, nuevas, [anteriores[0], anteriores[2]], [modificada, nueva])
+
+        self.assertIs(acumulados._ultimos[0], nuevas)
+        self.assertEqual(
+            self._respuesta(AgregadorCitasAcumulados, nuevas),
+            self._respuesta(AgregadorCitas, nuevas)
+        )
+
+    def test_con_cambios_no_modifica_los_publicados(self):
+        citas = [CitaNormalizada(cita) for cita in CITAS_BACKENDS]
+        publicados = acumulados.AcumuladosCitas(citas)
+        por_atleta = dict(publicados.por_atleta)
+        marzo = publicados.meses[(AÑO, MES)]
+        total_marzo = marzo.total
+
+        nuevos = publicados.con_cambios([citas[0]], [])
+        self.assertEqual(dict(publicados.por_atleta), por_atleta)
+        self.assertIs(publicados.meses[(AÑO, MES)], marzo)
+        self.assertEqual(marzo.total, total_marzo)
+        self.assertEqual(nuevos.meses[(AÑO, MES)].total, total_marzo - 1)
+
+    def test_backend_por_defecto(self):
+        casos = [
+            ({'CITAS_SNAPSHOT_INTERVALO': 0}, AgregadorCitas),
+            ({'CITAS_SNAPSHOT_INTERVALO': 60}, AgregadorCitasAcumulados),
+            ({'CITAS_SNAPSHOT_INTERVALO': 60, 'ESTADISTICAS_BACKEND': 'python'}, AgregadorCitas),
+        ]
+        for ajustes, esperado in casos:
+            with self.subTest(**ajustes), override_settings(**dict({'ESTADISTICAS_BACKEND': ''}, **ajustes)):
+                self.assertIs(type(crear_agregador(MES, AÑO)), esperado)
+
+
+@override_settings(CITAS_SNAPSHOT_CAMPO='creado_el', API_CITAS_PARAM_CAMBIOS='desde', CITAS_SNAPSHOT_COMPLETA=900)
+class SnapshotCitasTests(SimpleTestCase):
+    """
+    Sincronización incremental de snapshot_citas con el backend y el reloj
+    controlados por el test.
+    """
+
+    def setUp(self):
+        self.ahora = 1000.0
+        self.coleccion = [
+            _cita(1, creado_el='2025-03-01T09:00:00Z', profesional_salud_id=1, atleta_id=10, area_id=5),
+            _cita(2, creado_el='2025-03-02T09:00:00Z', profesional_salud_id=2, atleta_id=11, area_id=6),
+        ]
+        self.cambios = []
+        parches = [
+            mock.patch.object(snapshot_citas, 'time', mock.Mock(time=lambda: self.ahora)),
+            mock.patch.object(snapshot_citas, 'obtener_coleccion', side_effect=lambda nombre: list(self.coleccion)),
+            mock.patch.object(snapshot_citas, 'descargar_citas', side_effect=lambda parametros: list(self.cambios)),
+        ]
+        self.completas, self.incrementales = [parche.start() for parche in parches][1:]
+        for parche in parches:
+            self.addCleanup(parche.stop)
+        self.snapshot = snapshot_citas.Snapshot()
+        self.snapshot.sincronizar()
+
+    def _ids(self):
+        return [cita['id'] for cita in self.snapshot.citas]
+
+    def test_cambio_reemplaza_por_id(self):
+        version = self.snapshot.citas.version
+        modificada = dict(self.coleccion[1], estado='Completada')
+        nueva = _cita(3, creado_el='2025-03-05T09:00:00Z')
+        self.cambios = [modificada, nueva]
+        self.snapshot.sincronizar()
+
+        self.incrementales.assert_called_once_with({'desde': '2025-03-02T09:00:00Z'})
+        self.assertEqual(self._ids(), [1, 2, 3])
+        self.assertEqual(self.snapshot.citas[1], modificada)
+        self.assertEqual(self.snapshot.citas.normalizadas[1].estado_clave, 'completada')
+        self.assertEqual(self.snapshot.marca, '2025-03-05T09:00:00Z')
+        self.assertNotEqual(self.snapshot.citas.version, version)
+        self.assertEqual(self.completas.call_count, 1)
+
+    def test_cambios_sin_id_se_omiten(self):
+        publicadas = self.snapshot.citas
+        self.cambios = [self.coleccion[1], _cita(None, creado_el='2025-03-05T09:00:00Z')]
+        self.snapshot.sincronizar()
+
+        # La cita de la marca llega sin cambios y la sin ID se omite: no
+        # se publica un snapshot nuevo
+        self.assertIs(self.snapshot.citas, publicadas)
+        self.assertEqual(self.snapshot.marca, '2025-03-02T09:00:00Z')
+
+    def test_recarga_completa_periodica(self):
+        self.coleccion = self.coleccion[1:]
+        self.ahora += 899
+        self.snapshot.sincronizar()
+        self.assertEqual(self._ids(), [1, 2])
+
+        # Pasado CITAS_SNAPSHOT_COMPLETA se recarga y se reflejan las eliminaciones
+        self.ahora += 1
+        self.snapshot.sincronizar()
+        self.assertEqual(self.completas.call_count, 2)
+        self.assertEqual(self._ids(), [2])
+        self.assertEqual(self.snapshot.completo_el, self.ahora)
+
+    def test_backend_ignora_la_marca(self):
+        self.cambios = self.coleccion[:1]
+        self.snapshot.sincronizar()
+        self.assertEqual(self._ids(), [1])
+        self.assertEqual(self.snapshot.completo_el, self.ahora)
+
+    def test_acumulados_con_los_cambios(self):
+        anteriores = self.snapshot.citas.normalizadas
+        acumulados.acumulados_citas(anteriores)
+        self.cambios = [
+            dict(self.coleccion[0], creado_el='2025-03-03T09:00:00Z', area_id=6),
+            _cita(3, creado_el='2025-03-05T09:00:00Z', atleta_id=10),
+        ]
+
+        with mock.patch.object(acumulados, 'aplicar_cambios', wraps=acumulados.aplicar_cambios) as aplicar:
+            self.snapshot.sincronizar()
+        nuevas = self.snapshot.citas.normalizadas
+        aplicar.assert_called_once_with(anteriores, nuevas, [anteriores[0]], [nuevas[0], nuevas[2]])
+
+        self.assertIs(acumulados._ultimos[0], nuevas)
+        self.assertEqual(
+            AgregadorCitasAcumulados(MES, AÑO).agregar(nuevas).construir_respuesta(PROFESIONALES, ATLETAS, AREAS),
+            AgregadorCitas(MES, AÑO).agregar(nuevas).construir_respuesta(PROFESIONALES, ATLETAS, AREAS)
+        )
+
+
+class IndiceCitasTests(SimpleTestCase):
+    """
+    IndiceCitas.consultar devuelve lo mismo que recorrer todas las citas.
+    """
+
+    def setUp(self):
+        aleatorio = random.Random(7)
+        inicio = datetime(2025, 1, 1)
+        citas = []
+        for i in range(400):
+            cita = {'id': i, 'estado': 'Pendiente'}
+            if i % 37 == 0:
+                cita['creado_el'] = 'sin fecha'
+            else:
+                # Pocas fechas distintas, para que haya empates
+                creado = inicio + timedelta(hours=aleatorio.randrange(24 * 90))
+                cita['creado_el'] = creado.strftime('%Y-%m-%dT%H:00:00.000000Z')
+            cita['atleta_id'] = aleatorio.choice([1, 2, 3, '3', None])
+            cita['area'] = aleatorio.choice([{'id': 5}, 6, None])
+            cita['consultorio_id'] = aleatorio.choice([7, 8])
+            cita['profesional_salud_id'] = aleatorio.choice([1, 2, '02'])
+            citas.append(cita)
+        self.citas = [CitaNormalizada(cita) for cita in citas]
+        self.indice = IndiceCitas(self.citas)
+
+    def _lineal(self, fecha_inicio, fecha_fin, criterios):
+        return [
+            cita for cita in self.citas
+            if cita.creado_el is not None
+            and fecha_inicio <= cita.creado_el <= fecha_fin
+            and all(getattr(cita, dimension) == clave for dimension, clave in criterios)
+        ]
+
+    def test_consultar_igual_que_recorrido_lineal(self):
+        rangos = [
+            (datetime(2025, 1, 1), datetime(2025, 12, 31)),
+            (datetime(2025, 2, 1), datetime(2025, 2, 14, 23, 59, 59)),
+            (datetime(2025, 1, 10, 5), datetime(2025, 1, 10, 5)),
+            (datetime(2025, 3, 1), datetime(2025, 2, 1)),
+            (datetime(2024, 1, 1), datetime(2024, 12, 31)),
+        ]
+        filtros = [
+            {},
+            {'atleta_id': '3'},
+            {'area_id': 5, 'profesional_id': 1},
+            {'atleta_id': 2, 'area_id': '6', 'consultorio_id': 8, 'profesional_id': '02'},
+            {'profesional_id': 2, 'consultorio_id': 99},
+        ]
+        for fecha_inicio, fecha_fin in rangos:
+            for filtro in filtros:
+                criterios = [(dimension, clave_id(filtro[dimension])) for dimension in DIMENSIONES if dimension in filtro]
+                with self.subTest(desde=fecha_inicio, hasta=fecha_fin, filtros=filtro):
+                    self.assertEqual(
+                        self.indice.consultar(fecha_inicio, fecha_fin, criterios),
+                        self._lineal(fecha_inicio, fecha_fin, criterios)
+                    )
+
+
+class CacheTTLTests(SimpleTestCase):
+    """
+    Expiración, ventana stale, desalojo LRU e invalidación de CacheTTL con
+    un reloj controlado por el test.
+    """
+
+    def setUp(self):
+        self.ahora = 1000.0
+        reloj = mock.patch.object(cache_local, 'time', mock.Mock(monotonic=lambda: self.ahora))
+        reloj.start()
+        self.addCleanup(reloj.stop)
+
+    def test_expiracion(self):
+        cache = cache_local.CacheTTL(ttl=10, max_entradas=5)
+        cargar = mock.Mock(side_effect=['v1', 'v2'])
+        self.assertEqual(cache.obtener('a', cargar), 'v1')
+        self.ahora += 9.9
+        self.assertEqual(cache.obtener('a', cargar), 'v1')
+        self.assertEqual(cache.consultar('a'), 'v1')
+        self.ahora += 0.1
+        self.assertIsNone(cache.consultar('a'))
+        self.assertEqual(cache.obtener('a', cargar), 'v2')
+        self.assertEqual(cargar.call_count, 2)
+
+    def test_stale_while_revalidate(self):
+        cache = cache_local.CacheTTL(ttl=10, max_entradas=5, stale=30)
+        cache.guardar('a', 'viejo')
+        self.ahora += 15
+
+        liberar = threading.Event()
+        refrescos = []
+
+        def cargar():
+            refrescos.append(threading.current_thread())
+            liberar.wait(5)
+            return 'nuevo'
+
+        # Mientras el refresco está en curso se sigue sirviendo el valor viejo
+        self.assertEqual(cache.obtener('a', cargar), 'viejo')
+        self.assertEqual(cache.obtener('a', cargar), 'viejo')
+        self.assertEqual(cache.consultar('a'), 'viejo')
+        liberar.set()
+        for hilo in threading.enumerate():
+            if hilo.name == 'refresco-a':
+                hilo.join(5)
+
+        self.assertEqual(len(refrescos), 1)
+        self.assertIsNot(refrescos[0], threading.current_thread())
+        self.assertEqual(cache.obtener('a', cargar), 'nuevo')
+
+        # Fuera de la ventana stale se carga de forma síncrona
+        self.ahora += 45
+        self.assertIsNone(cache.consultar('a'))
+        self.assertEqual(cache.obtener('a', lambda: 'sincrono'), 'sincrono')
+
+    def test_desalojo_lru(self):
+        cache = cache_local.CacheTTL(ttl=10, max_entradas=2)
+        cache.guardar('a', 1)
+        cache.guardar('b', 2)
+        self.assertEqual(cache.consultar('a'), 1)
+        cache.guardar('c', 3)
+        self.assertEqual(list(cache._datos), ['a', 'c'])
+        self.assertIsNone(cache.consultar('b'))
+
+    def test_invalidar(self):
+        cache = cache_local.CacheTTL(ttl=10, max_entradas=5)
+        for clave in 'abc':
+            cache.guardar(clave, clave)
+        cache.invalidar('a')
+        self.assertEqual([cache.consultar(clave) for clave in 'abc'], [None, 'b', 'c'])
+        cache.invalidar()
+        self.assertEqual([cache.consultar(clave) for clave in 'abc'], [None, None, None])
+
+    def test_inactiva(self):
+        cache = cache_local.CacheTTL(ttl=0, max_entradas=5)
+        cargar = mock.Mock(return_value='v')
+        cache.obtener('a', cargar)
+        cache.obtener('a', cargar)
+        self.assertEqual(cargar.call_count, 2)
+        self.assertIsNone(cache.consultar('a'))
+
+class CacheReportesTests(SimpleTestCase):
+    """
+    Claves y límite de tamaño de cache_reportes.
+    """
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        self.directorio = directorio.name
+        ajustes = override_settings(REPORTES_CACHE_DIR=directorio.name, REPORTES_CACHE_MAX_BYTES=2500)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def test_clave(self):
+        filtros = {'fecha_inicio': '2025-03-01', 'fecha_fin': '2025-03-31', 'area_id': 'todos'}
+        versiones = {'citas': 'v1', 'areas': 'v1'}
+        base = cache_reportes.clave(filtros, versiones)
+
+        # Filtros equivalentes dan la misma clave
+        self.assertEqual(cache_reportes.clave({'fecha_inicio': '2025-03-01', 'fecha_fin': '2025-03-31'}, versiones), base)
+        self.assertEqual(cache_reportes.clave(dict(filtros, asincrono='1'), dict(reversed(versiones.items()))), base)
+
+        distintas = [
+            cache_reportes.clave(dict(filtros, fecha_fin='2025-03-30'), versiones),
+            cache_reportes.clave(dict(filtros, area_id='2'), versiones),
+            cache_reportes.clave(dict(filtros, profesional_id=2), versiones),
+            cache_reportes.clave(filtros, dict(versiones, citas='v2')),
+        ]
+        with mock.patch.object(cache_reportes, 'VERSION_FORMATO', cache_reportes.VERSION_FORMATO + 1):
+            distintas.append(cache_reportes.clave(filtros, versiones))
+        self.assertNotIn(base, distintas)
+        self.assertEqual(len(set(distintas)), len(distintas))
+
+    def test_limite_de_tamaño(self):
+        for i in range(2):
+            cache_reportes.guardar(f'r{i}', io.BytesIO(bytes(1000)))
+            os.utime(os.path.join(self.directorio, f'r{i}.pdf'), (1000 + i, 1000 + i))
+        # Leer r0 lo convierte en el usado más recientemente
+        cache_reportes.abrir('r0').close()
+        cache_reportes.guardar('r2', io.BytesIO(bytes(1000)))
+
+        restantes = sorted(os.listdir(self.directorio))
+        self.assertEqual(restantes, ['r0.pdf', 'r2.pdf'])
+        self.assertLessEqual(sum(os.path.getsize(os.path.join(self.directorio, r)) for r in restantes), 2500)
+        self.assertIsNone(cache_reportes.abrir('r1'))
+
+    def test_etag_debil_sin_cache(self):
+        self.assertEqual(cache_reportes.etag('abc'), '"abc"')
+        with override_settings(REPORTES_CACHE_MAX_BYTES=0):
+            self.assertEqual(cache_reportes.etag('abc'), 'W/"abc"')
+
+class AlmacenLocalTests(TestCase):
+    """
+    almacen_local.sincronizar guarda los valores del backend completos,
+    sin importar su longitud.
+    """
+
+    def test_valores_largos(self):
+        colecciones = colecciones_sinteticas(50, semilla=5)
+        largo = 'x' * 300
+        colecciones['citas'][0].update(id=largo, atleta_id=largo, estado='Reprogramada ' + largo)
+        colecciones['atletas'].append({'id': largo, 'nombre': 'Largo', 'apPaterno': 'Id'})
+
+        with BackendSimulado(colecciones) as backend, override_settings(API_CACHE_TTL={}, **backend.ajustes()):
+            cliente_api.invalidar_catalogos()
+            resultado = almacen_local.sincronizar()
+        self.assertEqual(resultado['citas'], 50)
+
+        cita = Cita.objects.get(id_externo=largo)
+        self.assertEqual(cita.atleta_id, largo)
+        self.assertEqual(cita.estado_clave, CitaNormalizada(colecciones['citas'][0]).estado_clave)
+        self.assertTrue(Atleta.objects.filter(id_externo=largo).exists())
+
+        ahora = datetime.now()
+        normalizadas = normalizar_citas(colecciones['citas'])
+        self.assertEqual(
+            AgregadorCitasORM(ahora.month, ahora.year).agregar(Cita.objects.all()).construir_respuesta(
+                colecciones['profesionales'], colecciones['atletas'], colecciones['areas']
+            ),
+            AgregadorCitas(ahora.month, ahora.year).agregar(normalizadas).construir_respuesta(
+                colecciones['profesionales'], colecciones['atletas'], colecciones['areas']
+            )
+        )
+
+
+def _documento_json():
+    """
+    Colección con textos no ASCII y escapes, números grandes, negativos y
+    con exponente, valores anidados y nulos.
+    """
+    elementos = [
+        {
+            'id': i,
+            'nombre': ['Ñandú', 'comillas "y" \\ barra', 'emoji \U0001F600', 'línea\nnueva'][i % 4],
+            'monto': [2.5, -0.1, 1e-7, 2 ** 53 + 1, 0][i % 5],
+            'area': {'id': i % 3, 'nombre': None},
+            'etiquetas': ['a', [], {}] if i % 2 else [],
+            'activo': i % 3 == 0,
+            'notas': None,
+        }
+        for i in range(60)
+    ]
+    return json.dumps(elementos, ensure_ascii=False).encode('utf-8')
+
+
+class _Cuerpo(io.BytesIO):
+    """
+    Cuerpo de una respuesta que registra si se devolvió su conexión.
+    """
+    liberado = False
+
+    def release_conn(self):
+        self.liberado = True
+
+
+def _respuesta(cuerpo, estado=200):
+    response = requests.Response()
+    response.status_code = estado
+    response.url = 'http://backend/api/citas/'
+    response.raw = _Cuerpo(cuerpo)
+    return response
+
+
+class TablaDetalleCanvasTests(SimpleTestCase):
+    """
+    TablaDetalleCanvas.split reparte las filas entre páginas sin huecos ni
+    solapamientos y sin pasarse del alto disponible.
+    """
+
+    def _paginas(self, n_filas, filas_por_pagina):
+        alto = tablas_pdf.ALTO_ENCABEZADO + filas_por_pagina * tablas_pdf.ALTO_FILA
+        tabla = tablas_pdf.TablaDetalleCanvas([['x'] * 6] * n_filas)
+        paginas = []
+        while True:
+            partes = tabla.split(0, alto)
+            if partes == [tabla]:
+                paginas.append(tabla)
+                break
+            self.assertEqual(len(partes), 2)
+            paginas.append(partes[0])
+            tabla = partes[1]
+        for pagina in paginas:
+            self.assertLessEqual(pagina.wrap(0, alto)[1], alto)
+        return [(pagina.inicio, pagina.fin) for pagina in paginas]
+
+    def test_particiones(self):
+        casos = [
+            (0, 10, [(0, 0)]),
+            (1, 10, [(0, 1)]),
+            (10, 10, [(0, 10)]),
+            (11, 10, [(0, 10), (10, 11)]),
+            (30, 10, [(0, 10), (10, 20), (20, 30)]),
+            (5, 1, [(0, 1), (1, 2), (2, 3), (3, 4), (4, 5)]),
+        ]
+        for n_filas, filas_por_pagina, esperado in casos:
+            with self.subTest(filas=n_filas, por_pagina=filas_por_pagina):
+                self.assertEqual(self._paginas(n_filas, filas_por_pagina), esperado)
+
+    def test_sin_espacio_para_una_fila(self):
+        tabla = tablas_pdf.TablaDetalleCanvas([['x'] * 6] * 3)
+        self.assertEqual(tabla.split(0, tablas_pdf.ALTO_ENCABEZADO + tablas_pdf.ALTO_FILA - 1), [])
+
+
+class RangosParaleloTests(SimpleTestCase):
+    """
+    pdf_paralelo.rangos reparte las filas en rangos consecutivos, no vacíos
+    y sin solapamientos.
+    """
+
+    def _rangos(self, n_filas, procesos, minimo):
+        with override_settings(REPORTES_PROCESOS=procesos, REPORTES_PARALELO_MIN_FILAS=minimo):
+            return pdf_paralelo.rangos(n_filas)
+
+    def test_cobertura(self):
+        casos = [(10, 3, 1), (3, 8, 1), (2, 8, 1), (10000, 3, 5000), (10001, 3, 5000), (7, 2, 0), (100, 4, 30)]
+        for n_filas, procesos, minimo in casos:
+            with self.subTest(filas=n_filas, procesos=procesos, minimo=minimo):
+                rangos = self._rangos(n_filas, procesos, minimo)
+                self.assertGreaterEqual(len(rangos), 2)
+                self.assertLessEqual(len(rangos), procesos + 1)
+                self.assertEqual(rangos[0][0], 0)
+                self.assertEqual(rangos[-1][1], n_filas)
+                for (_, fin), (inicio, _) in zip(rangos, rangos[1:]):
+                    self.assertEqual(fin, inicio)
+                self.assertTrue(all(fin > inicio for inicio, fin in rangos))
+                self.assertTrue(all(fin - inicio >= minimo for inicio, fin in rangos))
+
+    def test_en_serie(self):
+        casos = [(0, 3, 1), (1, 3, 1), (0, 3, 0), (9999, 3, 5000), (10000, 0, 5000)]
+        for n_filas, procesos, minimo in casos:
+            with self.subTest(filas=n_filas, procesos=procesos, minimo=minimo):
+                self.assertEqual(self._rangos(n_filas, procesos, minimo), [])
+
+    def test_sin_pypdf(self):
+        with mock.patch.object(pdf_paralelo, 'PdfWriter', None):
+            self.assertEqual(self._rangos(10000, 3, 1), [])
+
+
+class DecodificacionTests(SimpleTestCase):
+
+    def test_loads_igual_que_json(self):
+        documento = _documento_json()
+        self.assertEqual(decodificacion.loads(documento), json.loads(documento))
+        self.assertEqual(decodificacion.loads(documento.decode('utf-8')), json.loads(documento))
+
+    @skipIf(decodificacion.orjson is None, 'orjson no está instalado')
+    def test_orjson_igual_que_json(self):
+        documento = _documento_json()
+        self.assertEqual(decodificacion.orjson.loads(documento), json.loads(documento))
+
+    def test_proyeccion_por_trozos(self):
+        documento = _documento_json()
+        campos = ['id', 'area', 'notas']
+        esperado = [{campo: elemento[campo] for campo in campos} for elemento in json.loads(documento)]
+        # Trozos de 1, 2 y 3 bytes cortan caracteres UTF-8, números y textos
+        for tamaño in [1, 2, 3, 7, 64, len(documento)]:
+            trozos = [documento[i:i + tamaño] for i in range(0, len(documento), tamaño)]
+            with self.subTest(tamaño=tamaño):
+                self.assertEqual(decodificacion.decodificar_por_trozos(trozos, campos), esperado)
+
+    def test_proyeccion_de_pagina(self):
+        pagina = {'count': 2, 'next': None, 'results': [{'id': 1, 'notas': 'x', 'area': 5}, {'id': 2}]}
+        datos = decodificacion.decodificar_por_trozos([json.dumps(pagina).encode('utf-8')], ['id', 'area'])
+        self.assertEqual(datos, {'count': 2, 'next': None, 'results': [{'id': 1, 'area': 5}, {'id': 2}]})
+
+    def test_version_del_cuerpo(self):
+        documento = _documento_json()
+        completo = decodificacion.decodificar_respuesta(_respuesta(documento))
+        proyectado = decodificacion.decodificar_respuesta(_respuesta(documento), ['id'])
+        self.assertIsInstance(completo, decodificacion.Coleccion)
+        self.assertEqual(completo.version, proyectado.version)
+        self.assertNotEqual(
+            completo.version,
+            decodificacion.decodificar_respuesta(_respuesta(documento.replace(b'"id": 1,', b'"id": 100,'))).version
+        )
+
+    def test_documento_invalido(self):
+        for campos in [None, ['id']]:
+            with self.subTest(campos=campos):
+                with self.assertRaises(requests.exceptions.JSONDecodeError):
+                    decodificacion.decodificar_respuesta(_respuesta(b'[{"id": 1}, {"id"'), campos)
+
+    def test_contenido_tras_el_documento(self):
+        documentos = [b'[{"id": 1}] x', b'[{"id": 1}]]', b'[] []', b'[{"id": 1}],', b'[1, 2]3']
+        for documento in documentos:
+            with self.assertRaises(json.JSONDecodeError):
+                json.loads(documento)
+            for tamaño in [1, len(documento)]:
+                trozos = [documento[i:i + tamaño] for i in range(0, len(documento), tamaño)]
+                with self.subTest(documento=documento, tamaño=tamaño):
+                    with self.assertRaises(json.JSONDecodeError):
+                        decodificacion.decodificar_por_trozos(trozos, ['id'])
+
+        # Los espacios al final sí se aceptan, como en json.loads
+        for documento in [b'[{"id": 1, "x": 2}] \n', b'[]\r\n ']:
+            with self.subTest(documento=documento):
+                self.assertEqual(
+                    decodificacion.decodificar_por_trozos([documento], ['id']),
+                    [{'id': elemento['id']} for elemento in json.loads(documento)]
+                )
+
+
+@override_settings(API_CITAS_PAGINA=0, API_CITAS_PROYECCION=True, API_CACHE_TTL={})
+class RespuestasCerradasTests(SimpleTestCase):
+    """
+    Las respuestas en streaming se cierran aunque falle la petición o la
+    decodificación, para liberar la conexión.
+    """
+
+    def _descargar(self, response, descarga):
+        with mock.patch.object(cliente_api, '_get', return_value=response):
+            with self.assertRaises(cliente_api.ErrorServicioExterno):
+                descarga()
+        self.assertTrue(response.raw.liberado)
+
+    def test_error_http(self):
+        self._descargar(_respuesta(b'{"detail": "error"}', 503), lambda: cliente_api.descargar_citas({'desde': 'x'}))
+        self._descargar(_respuesta(b'{"detail": "error"}', 503), lambda: cliente_api.obtener_coleccion('citas'))
+
+    def test_json_invalido(self):
+        self._descargar(_respuesta(b'[{"id": 1},'), lambda: cliente_api.descargar_citas({'desde': 'x'}))
+        self._descargar(_respuesta(b'[{"id": 1},'), lambda: cliente_api.obtener_coleccion('citas'))
+
+    @override_settings(API_CITAS_PAGINA=10)
+    def test_error_en_paginas(self):
+        self._descargar(_respuesta(b'{"detail": "error"}', 500), lambda: cliente_api.obtener_coleccion('citas'))
+
+
+# Sin cachés, snapshot, tablas locales ni tablero precalculado: cada
+# petición llega al backend simulado
+AJUSTES_VISTAS = {
+    'CITAS_SNAPSHOT_INTERVALO': 0, 'CITAS_ALMACEN_LOCAL': False, 'ESTADISTICAS_INTERVALO': 0,
+    'API_CACHE_TTL': {}, 'CATALOGOS_CACHE_TTL': 0, 'REPORTES_CACHE_MAX_BYTES': 0,
+}
+
+
+class ConBackendSimulado:
+    """
+    Levanta backend_simulado con citas sintéticas y dirige el servicio a él.
+    """
+
+    def setUp(self):
+        cliente_api.invalidar_catalogos()
+        tablero.descartar()
+        self.backend = BackendSimulado(colecciones_sinteticas(300, semilla=3))
+        self.backend.__enter__()
+        self.addCleanup(self.backend.__exit__, None, None, None)
+        ajustes = override_settings(**self.backend.ajustes())
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+    def _rango(self, dias=60):
+        hoy = datetime.now().date()
+        return {'fecha_inicio': (hoy - timedelta(days=dias)).isoformat(), 'fecha_fin': hoy.isoformat()}
+
+
+@override_settings(**AJUSTES_VISTAS)
+class VistasBackendSimuladoTests(ConBackendSimulado, TestCase):
+    """
+    Vistas a través del stack completo de Django contra backend_simulado.
+    """
+
+    def test_estadisticas(self):
+        response = self.client.get(reverse('estadisticas-citas'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['monthly_data']), 12)
+        self.assertEqual(self.backend.peticiones['citas'], 1)
+
+    def test_reporte_pdf_y_revalidacion(self):
+        params = self._rango()
+
+        response = self.client.get(reverse('generar-reporte-pdf'), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF-'))
+        etag = response['ETag']
+
+        # Los mismos datos descargados de nuevo dan el mismo ETag
+        response = self.client.get(reverse('generar-reporte-pdf'), params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        # Un POST siempre genera el reporte
+        response = self.client.post(reverse('generar-reporte-pdf'), params, content_type='application/json', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.backend.peticiones['citas'], 3)
+
+    def test_reporte_desde_cache(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        params = self._rango()
+
+        with override_settings(REPORTES_CACHE_DIR=directorio.name, REPORTES_CACHE_MAX_BYTES=10 ** 7):
+            response = self.client.get(reverse('generar-reporte-pdf'), params)
+            contenido = b''.join(response.streaming_content)
+            etag = response['ETag']
+            self.assertFalse(etag.startswith('W/'))
+
+            # El reporte guardado se sirve con los mismos bytes
+            response = self.client.get(reverse('generar-reporte-pdf'), params)
+            self.assertEqual(b''.join(response.streaming_content), contenido)
+            self.assertEqual(response['ETag'], etag)
+
+            for metodo in [self.client.get, self.client.head]:
+                with self.subTest(metodo=metodo.__name__):
+                    response = metodo(reverse('generar-reporte-pdf'), params, HTTP_IF_NONE_MATCH=f'W/{etag}')
+                    self.assertEqual(response.status_code, 304)
+                    self.assertEqual(response['ETag'], etag)
+
+
+@override_settings(**AJUSTES_VISTAS)
+class ExportarCitasTests(ConBackendSimulado, TestCase):
+    """
+    ExportarCitasView devuelve las mismas filas, en el mismo orden, que el
+    reporte PDF con los mismos filtros.
+    """
+
+    def _filas_reporte(self, filtros):
+        citas = GenerarReportePDFView()._obtener_citas_reporte(filtros)
+        return [exportacion.fila(cita) for cita in citas]
+
+    def test_csv(self):
+        filtros = dict(self._rango(), area_id='2')
+        response = self.client.get(reverse('exportar-citas'), filtros)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], exportacion.CONTENT_TYPES['csv'])
+        self.assertIn(f"citas_{filtros['fecha_inicio']}_{filtros['fecha_fin']}.csv", response['Content-Disposition'])
+
+        contenido = b''.join(response.streaming_content).decode('utf-8')
+        self.assertTrue(contenido.startswith('\ufeff'))
+        filas = list(csv.reader(io.StringIO(contenido[1:])))
+        self.assertEqual(filas[0], [encabezado for encabezado, _ in exportacion.COLUMNAS])
+
+        esperadas = [[str(valor) for valor in fila] for fila in self._filas_reporte(filtros)]
+        self.assertGreater(len(esperadas), 0)
+        self.assertEqual(filas[1:], esperadas)
+
+    @skipIf('xlsx' not in exportacion.formatos_disponibles(), 'openpyxl no está instalado')
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        filtros = dict(self._rango(), formato='xlsx')
+        response = self.client.post(reverse('exportar-citas'), filtros, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], exportacion.CONTENT_TYPES['xlsx'])
+
+        hoja = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['Citas']
+        filas = [['' if valor is None else valor for valor in fila] for fila in hoja.values]
+        self.assertEqual(filas[0], [encabezado for encabezado, _ in exportacion.COLUMNAS])
+        self.assertEqual(filas[1:], self._filas_reporte(filtros))
+
+    def test_formato_desconocido(self):
+        response = self.client.get(reverse('exportar-citas'), dict(self._rango(), formato='pdf'))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['formatos'], exportacion.formatos_disponibles())
+
+    def test_fechas_invalidas(self):
+        for fechas in [
+            {'fecha_inicio': '2024-13-01', 'fecha_fin': '2024-12-31'},
+            {'fecha_inicio': '01/02/2024', 'fecha_fin': '2024-12-31'},
+            {'fecha_fin': '2024-12-31'},
+        ]:
+            with self.subTest(fechas=fechas):
+                for ruta in ['exportar-citas', 'generar-reporte-pdf']:
+                    response = self.client.get(reverse(ruta), fechas)
+                    self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.backend.peticiones['citas'], 0)
+
+
+@override_settings(API_CITAS_FILTROS=True, API_CITAS_FILTROS_ID=True, API_CITAS_FILTROS_REINTENTO=30, **AJUSTES_VISTAS)
+class FiltrosCitasBackendTests(ConBackendSimulado, TestCase):
+    """
+    Contra un backend que ignora los filtros de citas (backend_simulado
+    siempre responde la colección completa) se vuelve a la descarga
+    completa y los filtros se reintentan pasado API_CITAS_FILTROS_REINTENTO.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.ahora = 1000.0
+        for parche in [
+            mock.patch.object(cliente_api, 'time', mock.Mock(monotonic=lambda: self.ahora)),
+            mock.patch.object(cliente_api, '_filtros_ignorados_el', None),
+        ]:
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _citas(self):
+        antes = self.backend.peticiones['citas']
+        citas = cliente_api.obtener_citas(dict(self._rango(), area_id='2'))
+        return citas, self.backend.peticiones['citas'] - antes
+
+    def test_vuelta_a_la_descarga_completa(self):
+        completas = len(self.backend.colecciones['citas'])
+
+        citas, peticiones = self._citas()
+        self.assertEqual((len(citas), peticiones), (completas, 2))
+        self.assertTrue(cliente_api._filtros_ignorados())
+
+        # Mientras tanto se pide directamente la colección completa
+        self.ahora += 29 * 60
+        citas, peticiones = self._citas()
+        self.assertEqual((len(citas), peticiones), (completas, 1))
+
+        # Pasado el plazo se vuelven a probar los filtros
+        self.ahora += 60
+        self.assertFalse(cliente_api._filtros_ignorados())
+        citas, peticiones = self._citas()
+        self.assertEqual((len(citas), peticiones), (completas, 2))
+
+    def test_reporte_con_filtros_ignorados(self):
+        filtros = dict(self._rango(), area_id='2')
+        response = self.client.get(reverse('exportar-citas'), filtros)
+        self.assertEqual(response.status_code, 200)
+        filas = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode('utf-8')[1:])))[1:]
+
+        with override_settings(API_CITAS_FILTROS=False):
+            citas = GenerarReportePDFView()._obtener_citas_reporte(filtros)
+        esperadas = [[str(valor) for valor in exportacion.fila(cita)] for cita in citas]
+        self.assertGreater(len(esperadas), 0)
+        self.assertEqual(filas, esperadas)
+
+
+@override_settings(**dict(
+    AJUSTES_VISTAS,
+    ESTADISTICAS_INTERVALO=3600,
+    API_CACHE_TTL={nombre: 300 for nombre in tablero.COLECCIONES},
+    CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'upstream': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tablero-tests'},
+    },
+))
+class TableroTests(ConBackendSimulado, TestCase):
+    """
+    Tablero precalculado: las respuestas forzadas revalidan las descargas
+    y las peticiones simultáneas comparten un mismo cálculo.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for parche in [
+            mock.patch.object(tablero, '_iniciar_hilo'),
+            mock.patch.object(cliente_api, '_cache_catalogos', cache_local.CacheTTL(ttl=300, max_entradas=10)),
+        ]:
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _peticiones(self):
+        return [self.backend.peticiones[nombre] for nombre in tablero.COLECCIONES]
+
+    def test_forzar_revalida_las_descargas(self):
+        self.assertEqual(self.client.get(reverse('estadisticas-citas')).status_code, 200)
+        self.assertEqual(self._peticiones(), [1, 1, 1, 1])
+
+        # Sin forzar, un nuevo cálculo sale de las cachés de descargas
+        tablero.descartar()
+        self.assertEqual(self.client.get(reverse('estadisticas-citas')).status_code, 200)
+        self.assertEqual(self._peticiones(), [1, 1, 1, 1])
+
+        response = self.client.get(reverse('estadisticas-citas'), {'fresh': '1'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._peticiones(), [2, 2, 2, 2])
+
+        # Las descargas revalidadas vuelven a quedar en caché
+        self.assertEqual(self.client.get(reverse('estadisticas-citas'), {'fresh': '0'}).status_code, 200)
+        self.assertEqual(self._peticiones(), [2, 2, 2, 2])
+
+    def test_calculo_en_curso_compartido(self):
+        calculando = threading.Event()
+        liberar = threading.Event()
+        esperando = threading.Event()
+        calculos = []
+
+        def calcular():
+            calculos.append(threading.current_thread())
+            calculando.set()
+            liberar.wait(5)
+            return {'calculo': len(calculos)}
+
+        class LockObservado:
+            # Avisa cuando la segunda petición ya espera el cálculo en curso
+            def __init__(self):
+                self._lock = threading.Lock()
+
+            def __enter__(self):
+                if self._lock.locked():
+                    esperando.set()
+                return self._lock.__enter__()
+
+            def __exit__(self, *exc):
+                return self._lock.__exit__(*exc)
+
+        resultados = {}
+
+        def pedir(nombre):
+            resultados[nombre] = tablero.obtener(forzar=True)
+
+        with mock.patch.object(tablero, 'calcular', calcular), \
+                mock.patch.object(tablero, '_calculo_lock', LockObservado()):
+            primera = threading.Thread(target=pedir, args=['primera'])
+            primera.start()
+            self.assertTrue(calculando.wait(5))
+            segunda = threading.Thread(target=pedir, args=['segunda'])
+            segunda.start()
+            self.assertTrue(esperando.wait(5))
+            liberar.set()
+            primera.join(5)
+            segunda.join(5)
+
+        self.assertEqual(len(calculos), 1)
+        self.assertIs(resultados['primera'], resultados['segunda'])
+        self.assertEqual(resultados['primera'][0], {'calculo': 1})
+
+
+@override_settings(**AJUSTES_VISTAS)
+class TrabajosReporteTests(ConBackendSimulado, TestCase):
+    """
+    Ciclo de vida de un reporte asíncrono, procesado en el hilo del test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajustes = override_settings(REPORTES_DIR=directorio.name)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        # Sin pool de workers (procesaría los trabajos en otro hilo) ni
+        # cierre de la conexión de la transacción del test
+        for parche in [mock.patch('citas_app.views.iniciar_cola'), mock.patch.object(trabajos, 'connection')]:
+            parche.start()
+            self.addCleanup(parche.stop)
+
+    def _estado(self, trabajo):
+        return self.client.get(reverse('estado-reporte', args=[trabajo.id]))
+
+    def _descargar(self, trabajo):
+        return self.client.get(reverse('descargar-reporte', args=[trabajo.id]))
+
+    def test_ciclo_completo(self):
+        trabajo = TrabajoReporte.objects.create(filtros=self._rango())
+        response = self._estado(trabajo)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['estado'], TrabajoReporte.PENDIENTE)
+        self.assertIsNone(response.json()['descarga_url'])
+        self.assertEqual(self._descargar(trabajo).status_code, 409)
+
+        trabajos.procesar_trabajo(trabajo.id)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoReporte.COMPLETADO)
+        self.assertIsNotNone(trabajo.iniciado_el)
+        self.assertIsNotNone(trabajo.terminado_el)
+        self.assertTrue(self._estado(trabajo).json()['descarga_url'].endswith(reverse('descargar-reporte', args=[trabajo.id])))
+
+        response = self._descargar(trabajo)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(trabajo.nombre_archivo, response['Content-Disposition'])
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF-'))
+
+        # Un trabajo ya reclamado no se vuelve a procesar
+        peticiones = self.backend.peticiones['citas']
+        trabajos.procesar_trabajo(trabajo.id)
+        self.assertEqual(self.backend.peticiones['citas'], peticiones)
+
+        os.remove(trabajo.archivo)
+        self.assertEqual(self._descargar(trabajo).status_code, 410)
+
+    def test_trabajo_inexistente(self):
+        trabajo = TrabajoReporte(filtros={})
+        self.assertEqual(self._estado(trabajo).status_code, 404)
+        self.assertEqual(self._descargar(trabajo).status_code, 404)
+
+    def test_error_al_generar(self):
+        trabajo = TrabajoReporte.objects.create(filtros={'fecha_inicio': '2025-01-01'})
+        trabajos.procesar_trabajo(trabajo.id)
+        trabajo.refresh_from_db()
+        self.assertEqual(trabajo.estado, TrabajoReporte.ERROR)
+        self.assertTrue(trabajo.error)
+        self.assertEqual(self._descargar(trabajo).status_code, 409)
+
+    @override_settings(REPORTES_TIMEOUT_MINUTOS=30)
+    def test_marcar_interrumpidos(self):
+        ahora = timezone.now()
+        vencido = TrabajoReporte.objects.create(
+            filtros=self._rango(), estado=TrabajoReporte.PROCESANDO, iniciado_el=ahora - timedelta(minutes=31)
+        )
+        reciente = TrabajoReporte.objects.create(
+            filtros=self._rango(), estado=TrabajoReporte.PROCESANDO, iniciado_el=ahora - timedelta(minutes=5)
+        )
+        self.assertEqual(trabajos.marcar_interrumpidos(), 1)
+        self.assertEqual(self._estado(vencido).json()['estado'], TrabajoReporte.ERROR)
+        self.assertEqual(self._estado(reciente).json()['estado'], TrabajoReporte.PROCESANDO)
+
+    def test_resultado_de_un_trabajo_interrumpido(self):
+        trabajo = TrabajoReporte.objects.create(filtros=self._rango())
+        original = GenerarReportePDFView._obtener_citas_reporte
+
+        def interrumpir(vista, filtros, datos=None):
+            # marcar_interrumpidos lo da por fallido mientras se genera
+            TrabajoReporte.objects.filter(pk=trabajo.pk).update(estado=TrabajoReporte.ERROR, error='interrumpido')
+            return original(vista, filtros, datos)
+
+        with mock.patch.object(GenerarReportePDFView, '_obtener_citas_reporte', interrumpir):
+            trabajos.procesar_trabajo(trabajo.id)
+
+        trabajo.refresh_from_db()
+        self.assertEqual((trabajo.estado, trabajo.error, trabajo.archivo), (TrabajoReporte.ERROR, 'interrumpido', ''))
+        self.assertEqual(os.listdir(trabajos.settings.REPORTES_DIR), [])
+
+
+class TelemetriaTests(SimpleTestCase):
+
+    def test_percentiles_interpolados(self):
+        histograma = telemetria.Histograma()
+        for ms in [2, 4, 20]:
+            histograma.observar(ms)
+        # 1.5 de las 2 observaciones del bucket (1, 5]
+        self.assertEqual(histograma.percentil(50), 4.0)
+        # El bucket (10, 25] se recorta a la mayor duración observada
+        self.assertEqual(histograma.percentil(100), 20.0)
+        self.assertEqual(histograma.percentil(0), 1.0)
+
+        histograma.observar(40000)
+        self.assertEqual(histograma.percentil(100), 40000.0)
+        self.assertIsNone(telemetria.Histograma().percentil(50))
+
+    def test_fechas_en_su_propia_etapa(self):
+        tiempos, token = telemetria.iniciar_peticion()
+        try:
+            normalizar_citas([_cita(1), _cita(2, fecha='no es una fecha')])
+        finally:
+            telemetria.terminar_peticion(token)
+        self.assertEqual(list(tiempos.etapas), ['fechas', 'normalizar'])
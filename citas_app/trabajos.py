@@ -0,0 +1,175 @@
+"""
+Cola local de reportes PDF asíncronos.
+
+Los trabajos se registran en la tabla TrabajoReporte y un pool de hilos
+del propio proceso genera los PDF en settings.REPORTES_DIR. No requiere
+servicios externos: el estado vive en la base de datos del proyecto y los
+archivos en disco.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import telemetria
+from .models import TrabajoReporte
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.REPORTES_WORKERS,
+                    thread_name_prefix='reportes'
+                )
+                recuperar_trabajos_pendientes(_executor)
+    return _executor
+
+
+def iniciar_cola():
+    """
+    Crea el pool de workers de este proceso si aún no existe, recuperando
+    los trabajos que quedaron sin terminar.
+    """
+    _get_executor()
+
+
+def marcar_interrumpidos():
+    """
+    Marca con error los trabajos que llevan en proceso más de
+    settings.REPORTES_TIMEOUT_MINUTOS: el worker que los reclamó se
+    reinició o terminó sin llegar a guardar el resultado.
+
+    Returns:
+        int: Trabajos marcados
+    """
+    ahora = timezone.now()
+    marcados = TrabajoReporte.objects.filter(
+        estado=TrabajoReporte.PROCESANDO,
+        iniciado_el__lt=ahora - timedelta(minutes=settings.REPORTES_TIMEOUT_MINUTOS)
+    ).update(
+        estado=TrabajoReporte.ERROR,
+        error='El reporte se interrumpió antes de terminar; vuelva a solicitarlo',
+        terminado_el=ahora
+    )
+    if marcados:
+        logger.warning("Marcados %d reportes interrumpidos", marcados)
+    return marcados
+
+
+def recuperar_trabajos_pendientes(executor):
+    """
+    Vuelve a encolar los trabajos que quedaron pendientes, por ejemplo tras
+    reiniciar el worker, y marca con error los que quedaron a medio
+    procesar. Cada trabajo se reclama de forma atómica al procesarlo, así
+    que encolarlo más de una vez no lo duplica.
+    """
+    marcar_interrumpidos()
+    pendientes = list(
+        TrabajoReporte.objects.filter(estado=TrabajoReporte.PENDIENTE).values_list('id', flat=True)
+    )
+    for trabajo_id in pendientes:
+        executor.submit(procesar_trabajo, trabajo_id)
+    if pendientes:
+        logger.info("Reencolados %d reportes pendientes", len(pendientes))
+
+
+def limpiar_reportes_vencidos():
+    """
+    Elimina los trabajos (y sus archivos) más antiguos que
+    settings.REPORTES_RETENCION_HORAS.
+    """
+    limite = timezone.now() - timedelta(hours=settings.REPORTES_RETENCION_HORAS)
+    vencidos = TrabajoReporte.objects.filter(creado_el__lt=limite)
+    for archivo in vencidos.exclude(archivo='').values_list('archivo', flat=True):
+        _eliminar_archivo(archivo)
+    vencidos.delete()
+
+
+def _eliminar_archivo(archivo):
+    if not archivo:
+        return
+    try:
+        os.remove(archivo)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning("No se pudo eliminar el reporte %s: %s", archivo, str(e))
+
+
+def encolar_reporte(filtros):
+    """
+    Registra un trabajo de reporte y lo envía al pool de workers.
+
+    Returns:
+        TrabajoReporte: Trabajo recién creado, en estado pendiente
+    """
+    limpiar_reportes_vencidos()
+    trabajo = TrabajoReporte.objects.create(filtros=filtros)
+    _get_executor().submit(procesar_trabajo, trabajo.id)
+    logger.info("Reporte %s encolado con filtros: %s", trabajo.id, filtros)
+    return trabajo
+
+
+def procesar_trabajo(trabajo_id):
+    """
+    Genera el PDF de un trabajo pendiente y actualiza su estado.
+    """
+    # Importación diferida: views importa este módulo
+    from rest_framework.response import Response
+    from .views import GenerarReportePDFView
+
+    try:
+        reclamado = TrabajoReporte.objects.filter(
+            pk=trabajo_id, estado=TrabajoReporte.PENDIENTE
+        ).update(estado=TrabajoReporte.PROCESANDO, iniciado_el=timezone.now())
+        if not reclamado:
+            return
+
+        trabajo = TrabajoReporte.objects.get(pk=trabajo_id)
+        vista = GenerarReportePDFView()
+        archivo = ''
+        try:
+            citas = vista._obtener_citas_reporte(trabajo.filtros)
+            if isinstance(citas, Response):
+                raise RuntimeError(citas.data.get('error', 'Error al obtener las citas'))
+
+            os.makedirs(settings.REPORTES_DIR, exist_ok=True)
+            archivo = os.path.join(settings.REPORTES_DIR, f'{trabajo.id}.pdf')
+            with open(archivo, 'wb') as destino, telemetria.etapa('pdf'):
+                vista._generar_pdf(citas, trabajo.filtros, destino)
+
+            resultado = {
+                'estado': TrabajoReporte.COMPLETADO,
+                'archivo': archivo,
+                'nombre_archivo': vista._nombre_archivo(trabajo.filtros),
+            }
+        except Exception as e:
+            logger.error("Error al generar el reporte %s: %s", trabajo.id, str(e), exc_info=True)
+            _eliminar_archivo(archivo)
+            resultado = {'estado': TrabajoReporte.ERROR, 'error': str(e)}
+
+        # Solo si el trabajo sigue en proceso: marcar_interrumpidos pudo
+        # darlo por fallido mientras se generaba
+        guardado = TrabajoReporte.objects.filter(
+            pk=trabajo.pk, estado=TrabajoReporte.PROCESANDO
+        ).update(terminado_el=timezone.now(), **resultado)
+        if not guardado:
+            logger.warning("El reporte %s ya no estaba en proceso; se descarta su resultado", trabajo.id)
+            _eliminar_archivo(archivo)
+        elif resultado['estado'] == TrabajoReporte.COMPLETADO:
+            logger.info("Reporte %s generado en %s", trabajo.id, archivo)
+    finally:
+        connection.close()
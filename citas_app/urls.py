@@ -5,4 +5,8 @@ urlpatterns = [
     path('api/estadisticas-citas/', EstadisticasCitasView.as_view(), name='estadisticas-citas'),
     path('api/filtros-citas/', FiltrosCitasView.as_view(), name='filtros-citas'),
     path('api/generar-reporte-pdf/', GenerarReportePDFView.as_view(), name='generar-reporte-pdf'),
-]
\ No newline at end of file
+    path('api/exportar-citas/', ExportarCitasView.as_view(), name='exportar-citas'),
+    path('api/metricas/', MetricasView.as_view(), name='metricas'),
+    path('api/reportes/<uuid:trabajo_id>/', EstadoReporteView.as_view(), name='estado-reporte'),
+    path('api/reportes/<uuid:trabajo_id>/descargar/', DescargarReporteView.as_view(), name='descargar-reporte'),
+]
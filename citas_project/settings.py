@@ -4,6 +4,7 @@ Django settings for citas_project project.
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -30,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero, para que el tiempo total incluya al resto de middlewares
+    'citas_app.middleware.TelemetriaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -107,6 +110,21 @@ TIME_ZONE = 'America/Mexico_City'
 USE_I18N = True
 USE_TZ = True
 
+# Caché: `upstream` guarda las respuestas del backend principal y se comparte
+# entre los workers de gunicorn (por defecto en archivos locales)
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'upstream': {
+        'BACKEND': os.environ.get('UPSTREAM_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('UPSTREAM_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'citas_upstream_cache')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('UPSTREAM_CACHE_MAX_ENTRIES', '300')),
+        },
+    },
+}
+
 # Static files
 STATIC_URL = 'static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
@@ -116,6 +134,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # CORS Configuration
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', 'http://localhost:5173').split(',')
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'False') == 'True'
+# Cabeceras que el frontend puede leer (momento en que se calculó el
+# tablero precalculado y tiempos por etapa)
+CORS_EXPOSE_HEADERS = ['X-Generated-At', 'Server-Timing']
 
 # API Configuration - URLs dinámicas basadas en entorno
 BACKEND_HOST = os.environ.get('BACKEND_HOST', 'localhost')
@@ -126,4 +147,114 @@ BACKEND_PROTOCOL = os.environ.get('BACKEND_PROTOCOL', 'http')
 API_CITAS = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Modulos/Citas/'
 API_PROFESIONALES = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Catalogos/Profesionales-Salud/'
 API_ATLETAS = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Catalogos/Atletas/'
-API_AREAS = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Catalogos/Areas/'
\ No newline at end of file
+API_AREAS = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Catalogos/Areas/'
+API_CONSULTORIOS = f'{BACKEND_PROTOCOL}://{BACKEND_HOST}:{BACKEND_PORT}/Catalogos/Consultorios/'
+
+# Número máximo de peticiones simultáneas al backend principal
+API_MAX_CONCURRENCIA = int(os.environ.get('API_MAX_CONCURRENCIA', '5'))
+
+# Pool de conexiones HTTP hacia el backend principal
+API_POOL_SIZE = int(os.environ.get('API_POOL_SIZE', '10'))
+API_REINTENTOS = int(os.environ.get('API_REINTENTOS', '2'))
+API_BACKOFF = float(os.environ.get('API_BACKOFF', '0.3'))
+
+# Caché en memoria de catálogos (atletas, áreas, consultorios, profesionales)
+CATALOGOS_CACHE_TTL = int(os.environ.get('CATALOGOS_CACHE_TTL', '300'))  # segundos
+CATALOGOS_CACHE_STALE = int(os.environ.get('CATALOGOS_CACHE_STALE', '600'))  # segundos
+CATALOGOS_CACHE_MAX = int(os.environ.get('CATALOGOS_CACHE_MAX', '16'))
+
+# Vigencia en segundos de cada colección en la caché compartida (0 = sin caché)
+API_CACHE_TTL = {
+    'citas': int(os.environ.get('API_CACHE_TTL_CITAS', '30')),
+    'profesionales': int(os.environ.get('API_CACHE_TTL_PROFESIONALES', '300')),
+    'atletas': int(os.environ.get('API_CACHE_TTL_ATLETAS', '300')),
+    'areas': int(os.environ.get('API_CACHE_TTL_AREAS', '900')),
+    'consultorios': int(os.environ.get('API_CACHE_TTL_CONSULTORIOS', '900')),
+}
+
+# Segundos que una entrada caducada se conserva para revalidarla con
+# If-None-Match / If-Modified-Since en lugar de descargarla completa
+API_CACHE_REVALIDACION = int(os.environ.get('API_CACHE_REVALIDACION', '86400'))
+
+# Payloads decodificados de la caché compartida que conserva cada proceso
+# (uno por colección y combinación de parámetros)
+API_CACHE_DECODIFICADOS = int(os.environ.get('API_CACHE_DECODIFICADOS', '16'))
+
+# Filtros que el backend acepta en API_CITAS. Con API_CITAS_FILTROS los
+# reportes piden solo el rango de `creado_el` (parámetros
+# API_CITAS_PARAM_DESDE/HASTA, fechas YYYY-MM-DD inclusivas) y con
+# API_CITAS_FILTROS_ID también los IDs filtrados (atleta_id, area_id,
+# consultorio_id, profesional_id). Si el backend los ignora se vuelve a la
+# descarga completa y no se envían durante API_CITAS_FILTROS_REINTENTO
+# minutos
+API_CITAS_FILTROS = os.environ.get('API_CITAS_FILTROS', 'False') == 'True'
+API_CITAS_FILTROS_ID = os.environ.get('API_CITAS_FILTROS_ID', 'False') == 'True'
+API_CITAS_FILTROS_REINTENTO = int(os.environ.get('API_CITAS_FILTROS_REINTENTO', '30'))
+API_CITAS_PARAM_DESDE = os.environ.get('API_CITAS_PARAM_DESDE', 'fecha_inicio')
+API_CITAS_PARAM_HASTA = os.environ.get('API_CITAS_PARAM_HASTA', 'fecha_fin')
+
+# Citas por página al descargarlas del backend (0 = sin paginar)
+API_CITAS_PAGINA = int(os.environ.get('API_CITAS_PAGINA', '0'))
+
+# Decodificar las citas conforme llegan conservando solo los campos que
+# usa el servicio (normalizacion.CAMPOS_CITA y CITAS_SNAPSHOT_CAMPO).
+# Reduce la memoria de cada descarga y el tamaño de las cachés; las tablas
+# locales guardan entonces solo esos campos de cada cita
+API_CITAS_PROYECCION = os.environ.get('API_CITAS_PROYECCION', 'False') == 'True'
+
+# Snapshot local de citas sincronizado en segundo plano cada
+# CITAS_SNAPSHOT_INTERVALO segundos (0 = descargar las citas en cada
+# petición). Cada sincronización pide solo las citas con
+# CITAS_SNAPSHOT_CAMPO igual o posterior a la última marca (parámetro
+# API_CITAS_PARAM_CAMBIOS); cada CITAS_SNAPSHOT_COMPLETA segundos se
+# recarga la colección completa para reflejar eliminaciones
+CITAS_SNAPSHOT_INTERVALO = int(os.environ.get('CITAS_SNAPSHOT_INTERVALO', '0'))
+CITAS_SNAPSHOT_CAMPO = os.environ.get('CITAS_SNAPSHOT_CAMPO', 'creado_el')
+CITAS_SNAPSHOT_COMPLETA = int(os.environ.get('CITAS_SNAPSHOT_COMPLETA', '900'))
+API_CITAS_PARAM_CAMBIOS = os.environ.get('API_CITAS_PARAM_CAMBIOS', 'desde')
+
+# Leer citas y catálogos de las tablas locales (sincronizadas con
+# `python manage.py sincronizar_citas`) en lugar del backend principal
+CITAS_ALMACEN_LOCAL = os.environ.get('CITAS_ALMACEN_LOCAL', 'False') == 'True'
+
+# Segundos entre actualizaciones en segundo plano de la respuesta
+# precalculada del tablero de estadísticas (0 = calcularla en cada petición)
+ESTADISTICAS_INTERVALO = int(os.environ.get('ESTADISTICAS_INTERVALO', '0'))
+
+# IPs que pueden consultar /api/metricas/ (tiempos por etapa del proceso)
+METRICAS_IPS = os.environ.get('METRICAS_IPS', '127.0.0.1,::1').split(',')
+
+# Backend de cálculo de estadísticas: 'acumulados' (contadores por mes que
+# se reutilizan mientras no cambien las citas), 'python' o 'numpy'
+# (columnar, requiere NumPy). Vacío: 'acumulados' si el snapshot de citas
+# está activo (CITAS_SNAPSHOT_INTERVALO > 0) y 'python' si no, porque sin
+# snapshot cada descarga trae una lista nueva y los acumulados se
+# recalcularían completos en cada petición
+ESTADISTICAS_BACKEND = os.environ.get('ESTADISTICAS_BACKEND', '')
+
+# Reportes PDF asíncronos: directorio de archivos, workers del pool local y
+# horas que se conservan los reportes terminados
+REPORTES_DIR = os.environ.get('REPORTES_DIR', os.path.join(tempfile.gettempdir(), 'citas_reportes'))
+REPORTES_WORKERS = int(os.environ.get('REPORTES_WORKERS', '2'))
+REPORTES_RETENCION_HORAS = int(os.environ.get('REPORTES_RETENCION_HORAS', '24'))
+
+# Minutos tras los cuales un reporte que sigue en proceso se da por
+# interrumpido (el worker que lo tomaba se reinició) y se marca con error
+REPORTES_TIMEOUT_MINUTOS = int(os.environ.get('REPORTES_TIMEOUT_MINUTOS', '30'))
+
+# Bytes de un PDF que se mantienen en memoria antes de pasar a disco
+REPORTES_PDF_MEMORIA_MAX = int(os.environ.get('REPORTES_PDF_MEMORIA_MAX', str(2 * 1024 * 1024)))
+
+# Caché en disco de reportes PDF ya generados (0 = sin caché)
+REPORTES_CACHE_DIR = os.environ.get('REPORTES_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'citas_reportes_cache'))
+REPORTES_CACHE_MAX_BYTES = int(os.environ.get('REPORTES_CACHE_MAX_BYTES', str(200 * 1024 * 1024)))
+
+# Filas por tabla en el detalle de los reportes PDF y número de filas a
+# partir del cual el detalle se dibuja directamente en el canvas (0 = nunca)
+REPORTES_FILAS_POR_TABLA = int(os.environ.get('REPORTES_FILAS_POR_TABLA', '200'))
+REPORTES_CANVAS_UMBRAL = int(os.environ.get('REPORTES_CANVAS_UMBRAL', '10000'))
+
+# Procesos para renderizar en paralelo el detalle de reportes PDF grandes
+# (0 = siempre en serie; requiere pypdf) y filas mínimas por parte
+REPORTES_PROCESOS = int(os.environ.get('REPORTES_PROCESOS', str(min(os.cpu_count() or 1, 4))))
+REPORTES_PARALELO_MIN_FILAS = int(os.environ.get('REPORTES_PARALELO_MIN_FILAS', '5000'))